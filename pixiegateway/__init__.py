@@ -35,12 +35,19 @@ class PixieGatewayTemplatePersonality(LoggingConfigurable):
             app_log.info(spec)
         self.managed_client_pool = ManagedClientPool.instance(self.parent.kernel_manager)
         self.notebook_mgr = NotebookMgr()
+        if self.parent.dev_mode:
+            handlers.watch_templates()
+        from pixiegateway.chartThumbnail import ThumbnailQueue
+        ThumbnailQueue.instance().start()
 
     def shutdown(self):
         """During a proper shutdown of the kernel gateway, this will be called so that
         any held resources may be properly released."""
         self.managed_client_pool.shutdown()
         SessionManager.instance().shutdown()
+        from pixiegateway.chartThumbnail import Thumbnail
+        if Thumbnail.initialized():
+            Thumbnail.instance().shutdown()
 
     def create_request_handlers(self):
         """Returns a list of zero or more tuples of handler path, Tornado handler class
@@ -54,16 +61,21 @@ class PixieGatewayTemplatePersonality(LoggingConfigurable):
             (r"/pixiedustLog", handlers.PixieDustLogHandler),
             (r"/pixiedust.js", handlers.PixieDustHandler, {'loadjs':True}),
             (r"/pixiedust.css", handlers.PixieDustHandler, {'loadjs':False}),
+            (r"/bundle/([\w-]+)\.([0-9a-f]+)\.(js|css)", handlers.AssetBundleHandler),
             (r"/executeCode/(.*)", handlers.ExecuteCodeHandler),
+            (r"/outputBlob/([0-9a-f]+(?:-w\d+)?)", handlers.OutputBlobHandler),
             (r"/pixieapp/(.*)", handlers.PixieAppHandler),
             (r"/admin(?:/(?P<tab_id>(?:.*))?)?", handlers.AdminHandler),
             (r"/admincommand(?:/(?P<command>(?:.*))?)?", handlers.AdminCommandHandler),
             (r"/pixieapps", handlers.PixieAppListHandler),
             (r"/publish/(?P<name>(?:.*))", handlers.PixieAppPublishHandler),
+            (r"/workerSync/(?P<command>publish|delete)/(?P<name>(?:.*))", handlers.WorkerSyncHandler),
             (r"/chart(?:/(?P<chart_id>(?:.*))?)?", handlers.ChartShareHandler),
             (r"/embed(?:/(?P<chart_id>[^/]*)(?:/(?P<width>\d+))?(?:/(?P<height>\d+))?)?", handlers.ChartEmbedHandler),
             (r"/oembed/chart", handlers.OEmbedChartHandler),
             (r"/stats(?:/(?P<command>(?:.*))?)?", handlers.StatsHandler),
+            (r"/charts/export", handlers.ChartsExportHandler),
+            (r"/charts/import", handlers.ChartsImportHandler),
             (r"/charts(?:/(?P<page_num>[^/]*)(?:/(?P<page_size>\d+))?)?", handlers.ChartsHandler)
         ]
 
@@ -0,0 +1,140 @@
+# -------------------------------------------------------------------------------
+# Copyright IBM Corp. 2017
+# 
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+# http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -------------------------------------------------------------------------------
+import hashlib
+import io
+import os
+import re
+from collections import namedtuple
+from traitlets.config.configurable import SingletonConfigurable
+from traitlets import Bool, default
+from tornado.log import app_log
+from .pixieGatewayApp import PixieGatewayApp
+from .utils import gzip_compress
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+#Strings are kept as is, comments are dropped and whitespace is collapsed
+CSS_TOKENS_REGEX = re.compile(
+    r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(/\*.*?\*/)|\s*([{};,>])\s*|(\s+)', re.DOTALL
+)
+
+def minify_css(css):
+    "Conservative css minifier, uses rcssmin when installed"
+    try:
+        from rcssmin import cssmin
+        return cssmin(css)
+    except ImportError:
+        pass
+    def replace(match):
+        string, _comment, separator, whitespace = match.groups()
+        if string is not None:
+            return string
+        if separator is not None:
+            return separator
+        return " " if whitespace is not None else ""
+    return CSS_TOKENS_REGEX.sub(replace, css).strip()
+
+def minify_js(js):
+    "Minify the javascript with rjsmin when installed, returned untouched otherwise"
+    try:
+        from rjsmin import jsmin
+    except ImportError:
+        return js
+    return jsmin(js)
+
+def brotli_compress(data):
+    "Return the brotli compressed data, None if brotli is not installed"
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data)
+
+Bundle = namedtuple("Bundle", ["fingerprint", "content_type", "content", "gzipped_content", "brotli_content"])
+
+class AssetBundle(SingletonConfigurable):
+    """
+    Concatenate the static assets of the PixieApp and admin pages into fingerprinted, minified and precompressed
+    bundles. The pixiedust templates only depend on the pixiedust version so the bundles are built once, the first
+    time they are requested, and their url changes whenever their content does
+    """
+
+    #bundle name -> sources, "pixiedust:" sources are pixiedust templates, others are files of the static directory
+    BUNDLES = {
+        "pixieapp.js": ["requirejs/require.js", "pixiedust:pixiedust.js"],
+        "pixiedust.js": ["pixiedust:pixiedust.js"],
+        "pixiedust.css": ["pixiedust:pixiedust.css"],
+        "codemirror.js": ["codemirror/codemirror.js", "codemirror/python/python.js", "codemirror/addon/display/placeholder.js"],
+        "codemirror.css": ["codemirror/codemirror.css"]
+    }
+
+    minify = Bool(True, config=True, help="Minify the bundles")
+
+    @default('minify')
+    def minify_default(self):
+        return os.getenv("PG_ASSET_BUNDLE_MINIFY", "true").lower() == "true"
+
+    def __init__(self, **kwargs):
+        kwargs['parent'] = PixieGatewayApp.instance()
+        super(AssetBundle, self).__init__(**kwargs)
+        self.bundles = {}
+
+    @staticmethod
+    def render_pixiedust_template(template_name):
+        from pixiedust.display.display import Display
+        class PixieDustDisplay(Display):
+            def doRender(self, handlerId):
+                pass
+        disp = PixieDustDisplay({"gateway":"true"}, None)
+        disp.callerText = "display(None)"
+        return disp.renderTemplate(template_name)
+
+    def read_source(self, source):
+        if source.startswith("pixiedust:"):
+            return AssetBundle.render_pixiedust_template(source[len("pixiedust:"):])
+        with io.open(os.path.join(STATIC_DIR, source), encoding="utf-8") as source_file:
+            return source_file.read()
+
+    def build(self, name):
+        is_js = name.endswith(".js")
+        sources = [self.read_source(source) for source in AssetBundle.BUNDLES[name]]
+        #guard against sources that don't end with a semicolon
+        content = ("\n;\n" if is_js else "\n").join(sources)
+        if self.minify:
+            content = minify_js(content) if is_js else minify_css(content)
+        content = content.encode("utf-8")
+        bundle = Bundle(
+            fingerprint=hashlib.sha1(content).hexdigest()[:12],
+            content_type="text/javascript; charset=UTF-8" if is_js else "text/css; charset=UTF-8",
+            content=content,
+            gzipped_content=gzip_compress(content, 9),
+            brotli_content=brotli_compress(content)
+        )
+        app_log.debug("Built asset bundle %s: %s bytes, %s gzipped", name, len(content), len(bundle.gzipped_content))
+        return bundle
+
+    def get_bundle(self, name):
+        "Return the Bundle of the given name, raises KeyError for unknown bundles"
+        if name not in AssetBundle.BUNDLES:
+            raise KeyError(name)
+        if name not in self.bundles:
+            self.bundles[name] = self.build(name)
+        return self.bundles[name]
+
+    def get_url(self, name):
+        "Fingerprinted url of the bundle, e.g. /bundle/pixieapp.0123456789ab.js"
+        base_name, ext = name.rsplit(".", 1)
+        return "/bundle/{}.{}.{}".format(base_name, self.get_bundle(name).fingerprint, ext)
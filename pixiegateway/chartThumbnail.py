@@ -17,27 +17,83 @@ import tempfile
 import sys
 import base64
 import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from tornado import template, gen
+from tornado.concurrent import run_on_executor
+from tornado.log import app_log
 from traitlets.config.configurable import SingletonConfigurable
+from traitlets import Integer, Bool, default
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.chrome import service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
+from pixiedust.utils import storage
 import pixiegateway
 from .pixieGatewayApp import PixieGatewayApp
-from .chartsManager import SingletonChartStorage
+from .chartsManager import ChartCache, SingletonChartStorage
+from .thumbnailStore import ThumbnailStore, downscale_png
+from .utils import SingleFlight
+
+EMBEDDED_PNG_REGEX = re.compile(r'<img[^>]*\ssrc=["\']data:image/png;base64,(?P<data>[^"\']+)["\']')
+
+def extract_embedded_png(chart_model, max_width, max_height):
+    "Thumbnail extractor for charts that embed their rendering as a base64 png, e.g. matplotlib"
+    match = EMBEDDED_PNG_REGEX.search(chart_model.get('CONTENT') or "")
+    if match is None:
+        return None
+    return downscale_png(base64.b64decode(match.group('data')), max_width, max_height)
 
 class Thumbnail(SingletonConfigurable):
+    """
+    Generate chart thumbnails into the ThumbnailStore. Charts whose renderer has a registered extractor are
+    processed in-process, the others use a fixed size pool of reusable headless browser sessions.
+    Renders are queued on a bounded executor and concurrent requests for the same chart share the same render
+    """
+
+    #renderer id -> function(chart_model, max_width, max_height) returning the png bytes or None to use the browser
+    extractors = {
+        "matplotlib": extract_embedded_png
+    }
+
+    pool_size = Integer(2, config=True, help="Number of headless browser sessions used to render thumbnails")
+    max_pending = Integer(50, config=True, help="Max number of thumbnail renders queued or in progress")
+    render_timeout = Integer(5, config=True, help="Max number of seconds to wait for a chart to signal it is ready")
+    max_width = Integer(800, config=True, help="Max width of the thumbnails extracted without a browser")
+    max_height = Integer(800, config=True, help="Max height of the thumbnails extracted without a browser")
+
+    @default('pool_size')
+    def pool_size_default(self):
+        return int(os.getenv("PG_THUMBNAIL_POOL_SIZE", 2))
+
+    @default('max_pending')
+    def max_pending_default(self):
+        return int(os.getenv("PG_THUMBNAIL_MAX_PENDING", 50))
+
+    @default('render_timeout')
+    def render_timeout_default(self):
+        return int(os.getenv("PG_THUMBNAIL_RENDER_TIMEOUT", 5))
 
     def __init__(self, **kwargs):
         kwargs['parent'] = PixieGatewayApp.instance()
         self.exception = None
         self.chart_template = None
         self.service = None
-        self.initialize()
+        self.service_lock = threading.Lock()
         super(Thumbnail, self).__init__(**kwargs)
+        #one thread per browser session, the executor queue acts as the render queue
+        self.executor = ThreadPoolExecutor(max_workers=max(1, self.pool_size))
+        #in-process extractions don't need to wait for a browser session
+        self.extract_executor = ThreadPoolExecutor(max_workers=2)
+        self.idle_drivers = []
+        self.drivers_lock = threading.Lock()
+        self.pending_renders = SingleFlight()
 
     def initialize(self):
+        "Start the ChromeDriver service, called the first time a chart needs the browser"
         print("Initializing ChromeDriver Service")
         self.chrome_options = Options()
         self.chrome_options.add_argument("--headless")
@@ -63,32 +119,208 @@ class Thumbnail(SingletonConfigurable):
         except Exception as exc:
             self.exception = exc
 
+    def shutdown(self):
+        with self.drivers_lock:
+            drivers, self.idle_drivers = self.idle_drivers, []
+        for driver in drivers:
+            self._quit_driver(driver)
+        self.executor.shutdown(wait=False)
+        self.extract_executor.shutdown(wait=False)
+        if self.service is not None:
+            self.service.stop()
+
+    def generate_thumbnail(self, chart_id):
+        """
+        Return a Future resolving to True once the thumbnail of the chart is saved in the ThumbnailStore,
+        False if the chart doesn't exist. Concurrent calls for the same chart share the same render
+        """
+        if chart_id not in self.pending_renders and len(self.pending_renders) >= self.max_pending:
+            raise Exception("Too many thumbnails pending, please try again later")
+        return self.pending_renders.do(chart_id, lambda: self._generate(chart_id))
+
+    @gen.coroutine
+    def _generate(self, chart_id):
+        #thumbnails saved with the chart by previous versions are moved to the store instead of rendered again
+        b64_thumbnail = yield gen.maybe_future(SingletonChartStorage.instance().get_chart_thumbnail(chart_id))
+        if b64_thumbnail is not None:
+            png = base64.b64decode(b64_thumbnail)
+        else:
+            chart_model = yield ChartCache.instance().get_chart(chart_id)
+            if chart_model is None:
+                raise gen.Return(False)
+            png = yield self.render(chart_model)
+        yield ThumbnailStore.instance().save(chart_id, png)
+        raise gen.Return(True)
+
     @gen.coroutine
-    def get_screenshot_as_png(self, chart_model):
+    def render(self, chart_model):
+        "Render the chart and return the png bytes"
+        png = None
+        extractor = self.extractors.get(chart_model.get('RENDERERID'))
+        if extractor is not None:
+            png = yield self.extract(extractor, chart_model)
+        if png is None:
+            b64_thumbnail = yield self.get_screenshot_as_base64(chart_model)
+            png = base64.b64decode(b64_thumbnail)
+        raise gen.Return(png)
+
+    def _acquire_driver(self):
+        with self.drivers_lock:
+            if len(self.idle_drivers) > 0:
+                return self.idle_drivers.pop()
+        app_log.info("Starting a new headless browser session for thumbnails")
+        return webdriver.Remote(self.service.service_url, self.chrome_options.to_capabilities())
+
+    def _release_driver(self, driver):
+        with self.drivers_lock:
+            self.idle_drivers.append(driver)
+
+    def _quit_driver(self, driver):
+        try:
+            driver.quit()
+        except Exception as exc:
+            app_log.warning("Unable to quit browser session: %s", exc)
+
+    @run_on_executor(executor='extract_executor')
+    def extract(self, extractor, chart_model):
+        return extractor(chart_model, self.max_width, self.max_height)
+
+    @run_on_executor
+    def get_screenshot_as_base64(self, chart_model):
+        with self.service_lock:
+            if self.service is None and self.exception is None:
+                self.initialize()
         if self.exception is not None:
             raise self.exception  # pylint: disable=E0702
-
-        driver = webdriver.Remote( self.service.service_url, self.chrome_options.to_capabilities())
+        driver = self._acquire_driver()
         try:
             script = self.chart_template.generate(chart_model=chart_model)
-            with tempfile.NamedTemporaryFile(delete=True) as f:
+            driver.set_window_size(800, 600)
+            with tempfile.NamedTemporaryFile(suffix=".html", delete=True) as f:
                 f.write(script)
+                f.flush()
                 driver.get("file://" + f.name)
-            try:
-                #wait some time for the chart to be fully loaded, import especially for mapbox
-                WebDriverWait(driver, 5).until(lambda x: False)
-            except:
-                pass
-            size = driver.execute_script("return document.body.getBoundingClientRect()")
-            driver.set_window_size(size['width'],size['height'] + 20)
-            ret_value = yield self.save_thumbnail_to_model(driver, chart_model)
-            raise gen.Return(ret_value)
+                try:
+                    #wait for the page to signal the chart is fully rendered, important especially for mapbox
+                    WebDriverWait(driver, self.render_timeout, poll_frequency=0.1).until(
+                        lambda d: d.execute_script("return window.pdThumbnailReady === true")
+                    )
+                except TimeoutException:
+                    app_log.debug("Chart %s not ready after %s seconds", chart_model['CHARTID'], self.render_timeout)
+                size = driver.execute_script("return document.body.getBoundingClientRect()")
+                driver.set_window_size(size['width'], size['height'] + 20)
+                b64_thumbnail = driver.get_screenshot_as_base64()
+            driver.get("about:blank")
+        except Exception:
+            #don't reuse a session in an unknown state
+            self._quit_driver(driver)
+            raise
+        self._release_driver(driver)
+        return b64_thumbnail
+
+class ThumbnailQueue(SingletonConfigurable):
+    """
+    Queue of thumbnails generated in the background when a chart is shared so that the first viewer gets a ready image.
+    Jobs are persisted in the PixieGateway database and survive restarts, thumbnails are generated in batches
+    """
+    JOBS_TBL_NAME = "THUMBNAIL_JOBS"
+
+    enabled = Bool(True, config=True, help="Generate the thumbnails in the background when a chart is shared")
+    batch_size = Integer(10, config=True, help="Max number of thumbnails generated concurrently")
+
+    @default('enabled')
+    def enabled_default(self):
+        return os.getenv("PG_EAGER_THUMBNAILS", "true").lower() == "true"
+
+    @default('batch_size')
+    def batch_size_default(self):
+        return int(os.getenv("PG_THUMBNAIL_BATCH_SIZE", 10))
+
+    def __init__(self, **kwargs):
+        kwargs['parent'] = PixieGatewayApp.instance()
+        super(ThumbnailQueue, self).__init__(**kwargs)
+        self.worker_id = PixieGatewayApp.instance().worker_id or 0
+        self.processing = False
+        #single thread owning the connection to the jobs table
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.connection = None
+
+    def _get_connection(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(storage.SQLITE_DB_NAME_PATH)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            with self.connection:
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS {0} (CHARTID TEXT NOT NULL PRIMARY KEY, WORKER INTEGER, DATE DATETIME NOT NULL)".format(
+                        ThumbnailQueue.JOBS_TBL_NAME
+                    )
+                )
+        return self.connection
+
+    @run_on_executor
+    def _add_job(self, chart_id):
+        with self._get_connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO {0} (CHARTID, WORKER, DATE) VALUES (?, ?, CURRENT_TIMESTAMP)".format(
+                    ThumbnailQueue.JOBS_TBL_NAME
+                ), (chart_id, self.worker_id)
+            )
+
+    @run_on_executor
+    def _claim_all_jobs(self):
+        with self._get_connection() as connection:
+            connection.execute("UPDATE {0} SET WORKER = ?".format(ThumbnailQueue.JOBS_TBL_NAME), (self.worker_id,))
+
+    @run_on_executor
+    def _next_jobs(self):
+        return [row[0] for row in self._get_connection().execute(
+            "SELECT CHARTID FROM {0} WHERE WORKER = ? ORDER BY DATE LIMIT ?".format(ThumbnailQueue.JOBS_TBL_NAME),
+            (self.worker_id, max(1, self.batch_size))
+        ).fetchall()]
+
+    @run_on_executor
+    def _remove_jobs(self, chart_ids):
+        with self._get_connection() as connection:
+            connection.executemany(
+                "DELETE FROM {0} WHERE CHARTID = ?".format(ThumbnailQueue.JOBS_TBL_NAME),
+                [(chart_id,) for chart_id in chart_ids]
+            )
+
+    @gen.coroutine
+    def start(self):
+        "Resume the jobs left pending by a previous run, only the first worker does it"
+        if self.enabled and self.worker_id == 0:
+            yield self._claim_all_jobs()
+            yield self.process()
+
+    @gen.coroutine
+    def enqueue(self, chart_id):
+        if self.enabled:
+            yield self._add_job(chart_id)
+            self.process()
+
+    @gen.coroutine
+    def process(self):
+        if self.processing:
+            return
+        self.processing = True
+        try:
+            while True:
+                chart_ids = yield self._next_jobs()
+                if len(chart_ids) == 0:
+                    break
+                yield [self._generate(chart_id) for chart_id in chart_ids]
+                yield self._remove_jobs(chart_ids)
+        except Exception as exc:
+            app_log.error("Unexpected error while processing the thumbnail jobs: %s", exc)
         finally:
-            driver.quit()
+            self.processing = False
 
     @gen.coroutine
-    def save_thumbnail_to_model(self, driver, chart_model):
-        b64_thumbnail = driver.get_screenshot_as_base64()
-        chart_model["THUMBNAIL"] = b64_thumbnail
-        yield gen.maybe_future(SingletonChartStorage.instance().update_chart(chart_model))
-        raise gen.Return(base64.b64decode(b64_thumbnail))
+    def _generate(self, chart_id):
+        try:
+            if not ThumbnailStore.instance().exists(chart_id):
+                yield Thumbnail.instance().generate_thumbnail(chart_id)
+        except Exception as exc:
+            #the thumbnail will be generated on demand instead
+            app_log.error("Unable to generate the thumbnail for chart %s: %s", chart_id, exc)
@@ -15,21 +15,221 @@
 # -------------------------------------------------------------------------------
 import uuid
 import base64
+import hashlib
+import json
 import os
+import re
+import sqlite3
+import threading
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 import time
-import datetime
-import requests
+import calendar
 from six import with_metaclass, iteritems, string_types
+from pixiedust.utils import storage
 from pixiedust.utils.storage import Storage
 from traitlets.config.configurable import SingletonConfigurable
-from traitlets import Unicode, default, Integer
+from traitlets import Unicode, default, Integer, Float
 from tornado import gen
-from tornado.escape import json_decode, json_encode
+from tornado.concurrent import run_on_executor
+from tornado.escape import json_decode, json_encode, url_escape
 from tornado.util import import_object
 from tornado.log import app_log
-from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest, HTTPError
 from .pixieGatewayApp import PixieGatewayApp
+from .utils import LRUCache, SingleFlight, gzip_compress, gzip_decompress
+from .thumbnailStore import ThumbnailStore
+from .exceptions import SearchNotSupportedError
+
+CHARTS_TBL_NAME = "CHARTS"
+CHARTS_STATS_TBL_NAME = "CHARTS_STATS"
+CHART_CONTENTS_TBL_NAME = "CHART_CONTENTS"
+CHARTS_FTS_TBL_NAME = "CHARTS_FTS"
+
+CHARTS_SCHEMA = '''
+    CHARTID        TEXT  NOT NULL PRIMARY KEY,
+    AUTHOR         TEXT  NOT NULL,
+    DATE           DATETIME  NOT NULL,
+    DESCRIPTION    TEXT,
+    CONTENT        BLOB,
+    RENDERERID     TEXT,
+    THUMBNAIL      BLOB,
+    CONTENTHASH    TEXT
+'''
+
+#Index used for keyset pagination and a count maintained by triggers so that listings don't scan the table
+CHARTS_DDL = [
+    "CREATE INDEX IF NOT EXISTS {0}_DATE_IDX ON {0} (DATE DESC, CHARTID DESC)".format(CHARTS_TBL_NAME),
+    "CREATE TABLE IF NOT EXISTS {0} (NAME TEXT NOT NULL PRIMARY KEY, VALUE INTEGER NOT NULL)".format(CHARTS_STATS_TBL_NAME),
+    "INSERT OR IGNORE INTO {1} (NAME, VALUE) SELECT 'count', COUNT(CHARTID) FROM {0}".format(
+        CHARTS_TBL_NAME, CHARTS_STATS_TBL_NAME
+    ),
+    """CREATE TRIGGER IF NOT EXISTS {0}_INSERT_COUNT AFTER INSERT ON {0}
+       BEGIN UPDATE {1} SET VALUE = VALUE + 1 WHERE NAME = 'count'; END""".format(CHARTS_TBL_NAME, CHARTS_STATS_TBL_NAME),
+    """CREATE TRIGGER IF NOT EXISTS {0}_DELETE_COUNT AFTER DELETE ON {0}
+       BEGIN UPDATE {1} SET VALUE = VALUE - 1 WHERE NAME = 'count'; END""".format(CHARTS_TBL_NAME, CHARTS_STATS_TBL_NAME),
+    #Gzipped chart contents shared by the charts with the same content hash, deleted with the last chart using them
+    """CREATE TABLE IF NOT EXISTS {0} (
+       HASH TEXT NOT NULL PRIMARY KEY, CONTENT BLOB NOT NULL, REFCOUNT INTEGER NOT NULL)""".format(CHART_CONTENTS_TBL_NAME),
+    """CREATE TRIGGER IF NOT EXISTS {0}_INSERT_CONTENT AFTER INSERT ON {0} WHEN NEW.CONTENTHASH IS NOT NULL
+       BEGIN UPDATE {1} SET REFCOUNT = REFCOUNT + 1 WHERE HASH = NEW.CONTENTHASH; END""".format(
+           CHARTS_TBL_NAME, CHART_CONTENTS_TBL_NAME
+       ),
+    """CREATE TRIGGER IF NOT EXISTS {0}_DELETE_CONTENT AFTER DELETE ON {0} WHEN OLD.CONTENTHASH IS NOT NULL
+       BEGIN
+           UPDATE {1} SET REFCOUNT = REFCOUNT - 1 WHERE HASH = OLD.CONTENTHASH;
+           DELETE FROM {1} WHERE HASH = OLD.CONTENTHASH AND REFCOUNT <= 0;
+       END""".format(CHARTS_TBL_NAME, CHART_CONTENTS_TBL_NAME)
+]
+
+#Full text index of the chart summaries, requires the SQLLite FTS5 extension
+CHARTS_FTS_DDL = [
+    "CREATE VIRTUAL TABLE {0} USING fts5(CHARTID UNINDEXED, DESCRIPTION, AUTHOR, RENDERERID)".format(CHARTS_FTS_TBL_NAME),
+    "INSERT INTO {0} (CHARTID, DESCRIPTION, AUTHOR, RENDERERID) SELECT CHARTID, DESCRIPTION, AUTHOR, RENDERERID FROM {1}".format(
+        CHARTS_FTS_TBL_NAME, CHARTS_TBL_NAME
+    ),
+    """CREATE TRIGGER IF NOT EXISTS {0}_INSERT_FTS AFTER INSERT ON {0}
+       BEGIN
+           INSERT INTO {1} (CHARTID, DESCRIPTION, AUTHOR, RENDERERID)
+           VALUES (NEW.CHARTID, NEW.DESCRIPTION, NEW.AUTHOR, NEW.RENDERERID);
+       END""".format(CHARTS_TBL_NAME, CHARTS_FTS_TBL_NAME),
+    """CREATE TRIGGER IF NOT EXISTS {0}_DELETE_FTS AFTER DELETE ON {0}
+       BEGIN DELETE FROM {1} WHERE CHARTID = OLD.CHARTID; END""".format(CHARTS_TBL_NAME, CHARTS_FTS_TBL_NAME)
+]
+
+def to_fts_query(query):
+    """
+    Convert a user search to an FTS5 query matching the charts that contain all its words, as prefixes.
+    Raises ValueError if the search has no words
+    """
+    words = re.findall(r"\w+", query, re.UNICODE)
+    if len(words) == 0:
+        raise ValueError("Invalid search: {}".format(query))
+    return " ".join('"{}"*'.format(word) for word in words)
+
+def init_charts_fts(execute, table_names):
+    """
+    Create the full text index if not already there. Returns False if FTS5 is not available, search is then disabled
+    """
+    if CHARTS_FTS_TBL_NAME in table_names:
+        return True
+    try:
+        for ddl in CHARTS_FTS_DDL:
+            execute(ddl)
+    except sqlite3.OperationalError as exc:
+        app_log.warning("Chart search disabled, SQLLite full text search is not available: %s", exc)
+        return False
+    return True
+
+def get_charts_ddl(column_names):
+    "Return the DDL bringing a CHARTS table with the given columns up to date"
+    ddl = [] if "CONTENTHASH" in column_names else [
+        "ALTER TABLE {0} ADD COLUMN CONTENTHASH TEXT".format(CHARTS_TBL_NAME)
+    ]
+    return ddl + CHARTS_DDL
+
+CHART_SUMMARY_COLUMNS = "CHARTID,AUTHOR,DATE,DESCRIPTION,RENDERERID"
+#Thumbnails live in the ThumbnailStore, the THUMBNAIL column is only read to migrate the legacy ones
+CHART_COLUMNS = "CHARTID,AUTHOR,DATE,DESCRIPTION,CONTENT,RENDERERID"
+#Charts stored by previous versions have their content inline, the others point to a CHART_CONTENTS row
+SELECT_CHART_MODEL = """
+    SELECT C.CHARTID, C.AUTHOR, C.DATE, C.DESCRIPTION, C.RENDERERID, C.CONTENTHASH,
+           COALESCE(B.CONTENT, C.CONTENT) AS CONTENT
+    FROM {0} C LEFT JOIN {1} B ON B.HASH = C.CONTENTHASH
+    WHERE C.CHARTID = {{}}
+""".format(CHARTS_TBL_NAME, CHART_CONTENTS_TBL_NAME)
+
+def compress_chart_content(content):
+    "Return the (hash, gzipped content) tuple under which the chart content is stored"
+    if not isinstance(content, bytes):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest(), gzip_compress(content)
+
+INSERT_CHART_CONTENT = "INSERT OR IGNORE INTO {0} (HASH,CONTENT,REFCOUNT) VALUES (?,?,0)".format(CHART_CONTENTS_TBL_NAME)
+IMPORT_CHART = """
+    INSERT OR IGNORE INTO {0} (CHARTID,AUTHOR,DATE,DESCRIPTION,CONTENTHASH,RENDERERID) VALUES (?,?,?,?,?,?)
+""".format(CHARTS_TBL_NAME)
+DELETE_UNUSED_CONTENT = "DELETE FROM {0} WHERE HASH = ? AND REFCOUNT <= 0".format(CHART_CONTENTS_TBL_NAME)
+
+def import_chart_records(connection, records):
+    """
+    Insert exported chart records in a single transaction. Charts already present are skipped.
+    Returns the number of charts inserted
+    """
+    contents = [compress_chart_content(record.get('CONTENT') or "") for record in records]
+    with connection:
+        connection.executemany(
+            INSERT_CHART_CONTENT, [(content_hash, sqlite3.Binary(content)) for content_hash, content in contents]
+        )
+        inserted_count = connection.executemany(IMPORT_CHART, [(
+            record['CHARTID'],
+            record.get('AUTHOR') or "username",
+            record['DATE'],
+            record.get('DESCRIPTION'),
+            content_hash,
+            record.get('RENDERERID')
+        ) for record, (content_hash, _) in zip(records, contents)]).rowcount
+        #contents of skipped charts that no chart uses
+        connection.executemany(DELETE_UNUSED_CONTENT, [(content_hash,) for content_hash, _ in contents])
+    return inserted_count
+
+CHART_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def format_chart_date(timestamp):
+    "Format a timestamp like the SQLLite chart dates, in UTC"
+    return time.strftime(CHART_DATE_FORMAT, time.gmtime(timestamp))
+
+def parse_chart_date(date):
+    "Timestamp of a date formatted like the SQLLite chart dates, in UTC"
+    return calendar.timegm(time.strptime(date, CHART_DATE_FORMAT))
+
+def to_chart_model(row):
+    "Convert a SELECT_CHART_MODEL row to a chart model"
+    if row is not None and row['CONTENTHASH'] is not None:
+        row['CONTENT'] = gzip_decompress(row['CONTENT']).decode("utf-8")
+    return row
+
+def encode_cursor(*values):
+    """
+    Encode the keyset values of the first chart of the next page into an opaque cursor
+    """
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode("utf-8")).decode("utf-8")
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor returned by encode_cursor. Raises ValueError if the cursor is malformed
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(str(cursor)).decode("utf-8"))
+    except Exception:
+        raise ValueError("Invalid cursor: {}".format(cursor))
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor: {}".format(cursor))
+    return values
+
+def decode_sqlite_cursor(cursor):
+    "Decode and validate a (DATE, CHARTID) SQLLite cursor"
+    values = decode_cursor(cursor)
+    if len(values) != 2 or not all(isinstance(v, string_types) for v in values) or\
+        re.match(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$", values[0]) is None:
+        raise ValueError("Invalid cursor: {}".format(cursor))
+    #Validate the chart id format
+    uuid.UUID(values[1])
+    return values
+
+def make_charts_page(charts_list, page_num, page_size, total_count, get_cursor):
+    """
+    Build the get_charts payload from a list fetched with page_size + 1 rows. The extra row,
+    if present, is the first chart of the next page and is used to compute the next cursor
+    """
+    next_cursor = get_cursor(charts_list[page_size]) if len(charts_list) > page_size else None
+    return {
+        "page_num": page_num,
+        "page_size": page_size,
+        "total_count": total_count,
+        "next_cursor": next_cursor,
+        "charts_list": charts_list[:page_size]
+    }
 
 class ChartStorage(with_metaclass(ABCMeta)):
     """
@@ -41,71 +241,100 @@ class ChartStorage(with_metaclass(ABCMeta)):
         pass
 
     @abstractmethod
-    def update_chart(self, payload):
-        "Update the chart model"
-        pass
-    @abstractmethod
     def get_chart(self, chart_id):
         "returns chart model"
         pass
     @abstractmethod
+    def search_charts(self, query, page_num=0, page_size=10, cursor=None):
+        """
+        returns a page of the charts whose description, author or renderer contain all the words of the query,
+        most recent first. The page has the same format as get_charts.
+        Raises SearchNotSupportedError if the storage is not able to search
+        """
+        pass
+
+    @gen.coroutine
+    def get_charts_by_id(self, chart_ids):
+        "returns the chart models of the given ids, None for the charts not found. Storages can override to fetch them at once"
+        chart_models = []
+        for chart_id in chart_ids:
+            chart_models.append((yield gen.maybe_future(self.get_chart(chart_id))))
+        raise gen.Return(chart_models)
+
+    def get_chart_thumbnail(self, chart_id):
+        "returns the base64 thumbnail saved with the chart by previous versions, None if there is none"
+        return None
+
+    @abstractmethod
+    def import_charts(self, records):
+        """
+        Insert charts exported by pixiegateway.chartsMigration keeping their id and date.
+        Charts already present are skipped, returns the number of charts inserted
+        """
+        pass
+
+    @abstractmethod
     def delete_chart(self, chart_id):
         pass
     @abstractmethod
     def list_charts(self):
         pass
     @abstractmethod
-    def get_charts(self, page_num=0, page_size=10):
+    def get_charts(self, page_num=0, page_size=10, cursor=None):
+        """
+        returns a page of charts, most recent first. If cursor is specified, the page starts at the
+        chart identified by the next_cursor value of the previous page, page_num is then only informative
+        """
         pass
 
 class SQLLiteChartStorage(ChartStorage, Storage):
     "Chart storage class for SQLLite PixieDust DB (default)"
-    CHARTS_TBL_NAME="CHARTS"
+    CHARTS_TBL_NAME=CHARTS_TBL_NAME
     def __init__(self):
-        self._initTable( SQLLiteChartStorage.CHARTS_TBL_NAME,
-        '''
-            CHARTID        TEXT  NOT NULL PRIMARY KEY,
-            AUTHOR         TEXT  NOT NULL,
-            DATE           DATETIME  NOT NULL,
-            DESCRIPTION    TEXT,
-            CONTENT        BLOB,
-            RENDERERID     TEXT,
-            THUMBNAIL      BLOB
-        ''')
+        self._initTable(SQLLiteChartStorage.CHARTS_TBL_NAME, CHARTS_SCHEMA)
+        column_names = [row['name'] for row in self.fetchMany("PRAGMA table_info({0})".format(SQLLiteChartStorage.CHARTS_TBL_NAME))]
+        for ddl in get_charts_ddl(column_names):
+            self.update(ddl)
+        table_names = [row['name'] for row in self.fetchMany("SELECT name FROM sqlite_master WHERE type='table'")]
+        self.search_enabled = init_charts_fts(self.update, table_names)
 
     def store_chart(self, payload):
         chart_id = str(uuid.uuid4())
+        content_hash, content = compress_chart_content(payload['chart'])
+        self.insert("""
+            INSERT OR IGNORE INTO {0} (HASH,CONTENT,REFCOUNT) VALUES (?,?,0)
+        """.format(CHART_CONTENTS_TBL_NAME), (content_hash, sqlite3.Binary(content)))
         self.insert("""
-            INSERT INTO {0} (CHARTID,AUTHOR,DATE,DESCRIPTION,CONTENT,RENDERERID)
+            INSERT INTO {0} (CHARTID,AUTHOR,DATE,DESCRIPTION,CONTENTHASH,RENDERERID)
             VALUES (?,?,CURRENT_TIMESTAMP,?,?,?)
         """.format(SQLLiteChartStorage.CHARTS_TBL_NAME), (
             chart_id,
             "username",
             payload.get("description", ""),
-            payload['chart'],
+            content_hash,
             payload.get("rendererId", "")
         ))
         #return the chart_model for this newly stored chart
         return self.get_chart(chart_id)
 
-    def update_chart(self, payload):
-        chart_id = payload['CHARTID']
-        self.update("""
-            UPDATE {0} 
-            SET THUMBNAIL = ?
-            WHERE CHARTID = ?;
-        """.format(SQLLiteChartStorage.CHARTS_TBL_NAME), (
-            payload.get("THUMBNAIL", ""),
-            chart_id
-        ))
-        return self.get_chart(chart_id)
-
     def get_chart(self, chart_id):
-        return self.fetchOne(
-            """SELECT * from {0} WHERE CHARTID='{1}'""".format(
+        return self.fetchOne(SELECT_CHART_MODEL.format("'{}'".format(chart_id)), to_chart_model)
+
+    def import_charts(self, records):
+        #use a dedicated connection to insert the batch in a single transaction
+        connection = sqlite3.connect(storage.SQLITE_DB_NAME_PATH)
+        try:
+            return import_chart_records(connection, records)
+        finally:
+            connection.close()
+
+    def get_chart_thumbnail(self, chart_id):
+        row = self.fetchOne(
+            """SELECT THUMBNAIL from {0} WHERE CHARTID='{1}'""".format(
                 SQLLiteChartStorage.CHARTS_TBL_NAME, chart_id
             )
         )
+        return row['THUMBNAIL'] if row is not None and row['THUMBNAIL'] else None
 
     def delete_chart(self, chart_id):
         rows_deleted = self.delete(
@@ -125,20 +354,268 @@ class SQLLiteChartStorage(ChartStorage, Storage):
             walker
         )
 
-    def get_charts(self, page_num=0, page_size=10):
+    def get_charts(self, page_num=0, page_size=10, cursor=None):
+        return self._get_charts_page(page_num, page_size, cursor)
+
+    def search_charts(self, query, page_num=0, page_size=10, cursor=None):
+        if not self.search_enabled:
+            raise SearchNotSupportedError(self.__class__.__name__)
+        return self._get_charts_page(page_num, page_size, cursor, to_fts_query(query))
+
+    def _get_charts_page(self, page_num, page_size, cursor, fts_query=None):
         limit = max(1, page_size)
-        offset = limit * max(0, page_num)
+        conditions = []
+        if cursor is not None:
+            #values are validated by decode_sqlite_cursor
+            date, chart_id = decode_sqlite_cursor(cursor)
+            conditions.append("(DATE < '{0}' OR (DATE = '{0}' AND CHARTID <= '{1}'))".format(date, chart_id))
+        if fts_query is not None:
+            #fts queries built by to_fts_query only contain words, double quotes and stars
+            conditions.append("CHARTID IN (SELECT CHARTID FROM {0} WHERE {0} MATCH '{1}')".format(CHARTS_FTS_TBL_NAME, fts_query))
         charts_list = self.fetchMany("""
-                SELECT CHARTID,AUTHOR,DATE,DESCRIPTION,RENDERERID FROM {0} LIMIT {1} OFFSET {2}
-            """.format(SQLLiteChartStorage.CHARTS_TBL_NAME, str(limit), str(offset))
+                SELECT {0} FROM {1} {2} ORDER BY DATE DESC, CHARTID DESC LIMIT {3} {4}
+            """.format(
+                CHART_SUMMARY_COLUMNS, SQLLiteChartStorage.CHARTS_TBL_NAME,
+                "WHERE " + " AND ".join(conditions) if len(conditions) > 0 else "", str(limit + 1),
+                "" if cursor is not None else "OFFSET {}".format(limit * max(0, page_num))
+            )
         )
 
-        total_count = self.fetchOne('SELECT COUNT(CHARTID) as count from {0}'.format(SQLLiteChartStorage.CHARTS_TBL_NAME))['count']
+        if fts_query is not None:
+            total_count = self.fetchOne("SELECT COUNT(*) as count FROM {0} WHERE {0} MATCH '{1}'".format(
+                CHARTS_FTS_TBL_NAME, fts_query
+            ))['count']
+        else:
+            total_count = self.fetchOne("SELECT VALUE as count FROM {0} WHERE NAME = 'count'".format(CHARTS_STATS_TBL_NAME))['count']
+
+        return make_charts_page(
+            charts_list, page_num, limit, total_count, lambda row: encode_cursor(row['DATE'], row['CHARTID'])
+        )
+
+class AsyncSQLLiteChartStorage(ChartStorage):
+    """
+    Chart storage class for SQLLite that runs the queries off the IOLoop on a bounded thread pool.
+    Each thread owns its connection to the database which is opened in WAL mode
+    """
+    CHARTS_TBL_NAME = CHARTS_TBL_NAME
+
+    class SQLLiteConfig(SingletonConfigurable):
+        def __init__(self, **kwargs):
+            kwargs['parent'] = PixieGatewayApp.instance()
+            super(AsyncSQLLiteChartStorage.SQLLiteConfig, self).__init__(**kwargs)
+
+        db_path = Unicode(None, config=True, help="Path of the SQLLite Chart Storage database")
+        max_workers = Integer(4, config=True, help="Max number of threads running SQLLite queries")
+        cached_statements = Integer(100, config=True, help="Number of prepared statements cached per connection")
+
+        @default('db_path')
+        def db_path_default(self):
+            return os.getenv("PG_SQLITE_DB_PATH", storage.SQLITE_DB_NAME_PATH)
+
+        @default('max_workers')
+        def max_workers_default(self):
+            return int(os.getenv("PG_SQLITE_MAX_WORKERS", 4))
+
+        @default('cached_statements')
+        def cached_statements_default(self):
+            return int(os.getenv("PG_SQLITE_CACHED_STATEMENTS", 100))
+
+    INSERT_CONTENT = INSERT_CHART_CONTENT
+    INSERT_CHART = """
+        INSERT INTO {0} (CHARTID,AUTHOR,DATE,DESCRIPTION,CONTENTHASH,RENDERERID)
+        VALUES (?,?,CURRENT_TIMESTAMP,?,?,?)
+    """.format(CHARTS_TBL_NAME)
+    SELECT_CHART = SELECT_CHART_MODEL.format("?")
+    SELECT_THUMBNAIL = "SELECT THUMBNAIL FROM {0} WHERE CHARTID = ?".format(CHARTS_TBL_NAME)
+    DELETE_CHART = "DELETE FROM {0} WHERE CHARTID = ?".format(CHARTS_TBL_NAME)
+    SELECT_CHART_IDS = "SELECT CHARTID FROM {0}".format(CHARTS_TBL_NAME)
+    SELECT_CHARTS_PAGE = """
+        SELECT {0} FROM {1} ORDER BY DATE DESC, CHARTID DESC LIMIT ? OFFSET ?
+    """.format(CHART_SUMMARY_COLUMNS, CHARTS_TBL_NAME)
+    SELECT_CHARTS_PAGE_AFTER = """
+        SELECT {0} FROM {1} WHERE DATE < ? OR (DATE = ? AND CHARTID <= ?)
+        ORDER BY DATE DESC, CHARTID DESC LIMIT ?
+    """.format(CHART_SUMMARY_COLUMNS, CHARTS_TBL_NAME)
+    COUNT_CHARTS = "SELECT VALUE as count FROM {0} WHERE NAME = 'count'".format(CHARTS_STATS_TBL_NAME)
+    SEARCH_CHARTS_PAGE = """
+        SELECT {0} FROM {1} WHERE CHARTID IN (SELECT CHARTID FROM {2} WHERE {2} MATCH ?)
+        ORDER BY DATE DESC, CHARTID DESC LIMIT ? OFFSET ?
+    """.format(CHART_SUMMARY_COLUMNS, CHARTS_TBL_NAME, CHARTS_FTS_TBL_NAME)
+    SEARCH_CHARTS_PAGE_AFTER = """
+        SELECT {0} FROM {1} WHERE CHARTID IN (SELECT CHARTID FROM {2} WHERE {2} MATCH ?)
+        AND (DATE < ? OR (DATE = ? AND CHARTID <= ?))
+        ORDER BY DATE DESC, CHARTID DESC LIMIT ?
+    """.format(CHART_SUMMARY_COLUMNS, CHARTS_TBL_NAME, CHARTS_FTS_TBL_NAME)
+    COUNT_SEARCH = "SELECT COUNT(*) as count FROM {0} WHERE {0} MATCH ?".format(CHARTS_FTS_TBL_NAME)
+
+    def __init__(self):
+        config = AsyncSQLLiteChartStorage.SQLLiteConfig.instance()
+        self.db_path = config.db_path
+        self.cached_statements = config.cached_statements
+        self.executor = ThreadPoolExecutor(max_workers=max(1, config.max_workers))
+        self.local = threading.local()
+        self._init_table()
+
+    def _init_table(self):
+        connection = self._connect()
+        try:
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS {0} ({1});""".format(AsyncSQLLiteChartStorage.CHARTS_TBL_NAME, CHARTS_SCHEMA)
+            )
+            column_names = [row['name'] for row in connection.execute(
+                "PRAGMA table_info({0})".format(AsyncSQLLiteChartStorage.CHARTS_TBL_NAME)
+            )]
+            for ddl in get_charts_ddl(column_names):
+                connection.execute(ddl)
+            table_names = [row['name'] for row in connection.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+            self.search_enabled = init_charts_fts(connection.execute, table_names)
+            connection.commit()
+        finally:
+            connection.close()
+
+    def _connect(self):
+        def row_dict_factory(cursor, row):
+            return {col[0]: row[i] for i, col in enumerate(cursor.description)}
+        connection = sqlite3.connect(self.db_path, cached_statements=self.cached_statements)
+        connection.row_factory = row_dict_factory
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    @property
+    def connection(self):
+        "Connection owned by the current executor thread"
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.local.connection = self._connect()
+        return connection
+
+    def _fetch_one(self, query, args=()):
+        return self.connection.execute(query, args).fetchone()
+
+    def _fetch_chart(self, chart_id):
+        return to_chart_model(self._fetch_one(AsyncSQLLiteChartStorage.SELECT_CHART, (chart_id,)))
+
+    def _fetch_all(self, query, args=()):
+        return self.connection.execute(query, args).fetchall()
 
-        return {"page_num": page_num, "page_size": page_size, "total_count": total_count, "charts_list": charts_list}
+    def _execute(self, query, args=()):
+        with self.connection:
+            return self.connection.execute(query, args).rowcount
+
+    @run_on_executor
+    def store_chart(self, payload):
+        chart_id = str(uuid.uuid4())
+        content_hash, content = compress_chart_content(payload['chart'])
+        with self.connection:
+            self.connection.execute(AsyncSQLLiteChartStorage.INSERT_CONTENT, (content_hash, sqlite3.Binary(content)))
+            self.connection.execute(AsyncSQLLiteChartStorage.INSERT_CHART, (
+                chart_id,
+                "username",
+                payload.get("description", ""),
+                content_hash,
+                payload.get("rendererId", "")
+            ))
+        #return the chart_model for this newly stored chart
+        return self._fetch_chart(chart_id)
+
+    @run_on_executor
+    def get_chart(self, chart_id):
+        return self._fetch_chart(chart_id)
+
+    @run_on_executor
+    def import_charts(self, records):
+        return import_chart_records(self.connection, records)
+
+    @run_on_executor
+    def get_chart_thumbnail(self, chart_id):
+        row = self._fetch_one(AsyncSQLLiteChartStorage.SELECT_THUMBNAIL, (chart_id,))
+        return row['THUMBNAIL'] if row is not None and row['THUMBNAIL'] else None
+
+    @run_on_executor
+    def delete_chart(self, chart_id):
+        return self._execute(AsyncSQLLiteChartStorage.DELETE_CHART, (chart_id,))
+
+    @run_on_executor
+    def list_charts(self):
+        return [row['CHARTID'] for row in self._fetch_all(AsyncSQLLiteChartStorage.SELECT_CHART_IDS)]
+
+    @run_on_executor
+    def get_charts(self, page_num=0, page_size=10, cursor=None):
+        limit = max(1, page_size)
+        if cursor is not None:
+            date, chart_id = decode_sqlite_cursor(cursor)
+            charts_list = self._fetch_all(
+                AsyncSQLLiteChartStorage.SELECT_CHARTS_PAGE_AFTER, (date, date, chart_id, limit + 1)
+            )
+        else:
+            charts_list = self._fetch_all(
+                AsyncSQLLiteChartStorage.SELECT_CHARTS_PAGE, (limit + 1, limit * max(0, page_num))
+            )
+        total_count = self._fetch_one(AsyncSQLLiteChartStorage.COUNT_CHARTS)['count']
+        return make_charts_page(
+            charts_list, page_num, limit, total_count, lambda row: encode_cursor(row['DATE'], row['CHARTID'])
+        )
+
+    @run_on_executor
+    def search_charts(self, query, page_num=0, page_size=10, cursor=None):
+        if not self.search_enabled:
+            raise SearchNotSupportedError(self.__class__.__name__)
+        limit = max(1, page_size)
+        fts_query = to_fts_query(query)
+        if cursor is not None:
+            date, chart_id = decode_sqlite_cursor(cursor)
+            charts_list = self._fetch_all(
+                AsyncSQLLiteChartStorage.SEARCH_CHARTS_PAGE_AFTER, (fts_query, date, date, chart_id, limit + 1)
+            )
+        else:
+            charts_list = self._fetch_all(
+                AsyncSQLLiteChartStorage.SEARCH_CHARTS_PAGE, (fts_query, limit + 1, limit * max(0, page_num))
+            )
+        total_count = self._fetch_one(AsyncSQLLiteChartStorage.COUNT_SEARCH, (fts_query,))['count']
+        return make_charts_page(
+            charts_list, page_num, limit, total_count, lambda row: encode_cursor(row['DATE'], row['CHARTID'])
+        )
 
 class CloudantChartStorage(ChartStorage):
+    """
+    Chart storage class for Cloudant or any CouchDB compatible database. All the requests are asynchronous,
+    go through a bounded pool of connections and are retried with an exponential backoff on 429 and 5xx errors
+    """
     CHART_DB_NAME = "pixiegateway_chart"
+    DESIGN_DOC_ID = "_design/charts"
+    #View of the chart summaries sorted by date, the view row count is maintained by Cloudant.
+    #Search index of the chart summaries, the fields are stored so that results don't need to include the docs
+    DESIGN_DOC = {
+        "views": {
+            "by_date": {
+                "map": """function(doc) {
+                    if (doc.CHARTID && doc.DATE) {
+                        emit(doc.DATE, {
+                            CHARTID: doc.CHARTID, AUTHOR: doc.AUTHOR, DATE: doc.DATE,
+                            DESCRIPTION: doc.DESCRIPTION, RENDERERID: doc.RENDERERID
+                        });
+                    }
+                }"""
+            }
+        },
+        "indexes": {
+            "search": {
+                "index": """function(doc) {
+                    if (doc.CHARTID && doc.DATE) {
+                        index("DESCRIPTION", doc.DESCRIPTION || "", {store: true});
+                        index("AUTHOR", doc.AUTHOR || "", {store: true});
+                        index("RENDERERID", doc.RENDERERID || "", {store: true});
+                        index("DATE", doc.DATE, {store: true});
+                    }
+                }"""
+            }
+        }
+    }
+    SEARCH_FIELDS = ["DESCRIPTION", "AUTHOR", "RENDERERID"]
+    #Rate limited, server errors and connection errors
+    RETRY_CODES = (429, 500, 502, 503, 504, 599)
+
     class CloudantConfig(SingletonConfigurable):
         def __init__(self, **kwargs):
             kwargs['parent'] = PixieGatewayApp.instance()
@@ -149,6 +626,11 @@ class CloudantChartStorage(ChartStorage):
         port = Integer(443, config=True, help="Cloudant Chart Storage port")
         username = Unicode(None, config=True, help="Cloudant Chart Storage username")
         password = Unicode(None, config=True, help="Cloudant Chart Storage password")
+        max_connections = Integer(10, config=True, help="Max number of concurrent connections to Cloudant")
+        max_retries = Integer(3, config=True, help="Max number of retries of a request rate limited or failed by Cloudant")
+        retry_delay = Float(0.5, config=True, help="Delay in seconds before the first retry, doubled on each retry")
+        request_timeout = Float(20, config=True, help="Timeout in seconds of the Cloudant requests")
+        max_retry_delay = Float(30, config=True, help="Max delay in seconds before a retry, caps the Retry-After header")
 
         @default('host')
         def host_default(self):
@@ -170,37 +652,132 @@ class CloudantChartStorage(ChartStorage):
         def password_default(self):
             return os.getenv("PG_CLOUDANT_PASSWORD", "")
 
-    def __init__(self):
-        self.http_client = AsyncHTTPClient()
-        self.host = CloudantChartStorage.CloudantConfig.instance().host
-        self.protocol = CloudantChartStorage.CloudantConfig.instance().protocol
-        self.port = CloudantChartStorage.CloudantConfig.instance().port
-        self.username = CloudantChartStorage.CloudantConfig.instance().username
-        self.password = CloudantChartStorage.CloudantConfig.instance().password
-
-        #make sure the database exists, if not create it
-        response = requests.head(self.build_url(), headers=self.get_headers())
-        if response.status_code == 404:
-            response = requests.put( self.build_url(), headers=self.get_headers())
-
-        if response.status_code != 200 and response.status_code != 201:
-            app_log.error("Unexcepted error while connecting to cloudant: %s - %s", response.status_code, response.text)
-        else:
-            app_log.info("Succesfully connected to Cloudant db: %s-%s", self.host, CloudantChartStorage.CHART_DB_NAME)
+        @default('max_connections')
+        def max_connections_default(self):
+            return int(os.getenv("PG_CLOUDANT_MAX_CONNECTIONS", 10))
 
-    def get_headers(self):
-        return {
+        @default('max_retries')
+        def max_retries_default(self):
+            return int(os.getenv("PG_CLOUDANT_MAX_RETRIES", 3))
+
+        @default('retry_delay')
+        def retry_delay_default(self):
+            return float(os.getenv("PG_CLOUDANT_RETRY_DELAY", 0.5))
+
+        @default('request_timeout')
+        def request_timeout_default(self):
+            return float(os.getenv("PG_CLOUDANT_REQUEST_TIMEOUT", 20))
+
+        @default('max_retry_delay')
+        def max_retry_delay_default(self):
+            return float(os.getenv("PG_CLOUDANT_MAX_RETRY_DELAY", 30))
+
+    def __init__(self):
+        config = CloudantChartStorage.CloudantConfig.instance()
+        self.host = config.host
+        self.protocol = config.protocol
+        self.port = config.port
+        self.username = config.username
+        self.password = config.password
+        self.max_retries = config.max_retries
+        self.retry_delay = config.retry_delay
+        self.request_timeout = config.request_timeout
+        self.max_retry_delay = config.max_retry_delay
+        self.headers = {
             'Authorization': 'Basic {}'.format(base64.b64encode('{}:{}'.format(self.username, self.password).encode()).decode()),
             'Accept': 'application/json',
             'Content-Type': 'application/json'
         }
+        self.http_client = self.create_http_client(config.max_connections)
+        self.db_ready = None
+
+    @staticmethod
+    def create_http_client(max_connections):
+        """
+        Private client bounded to max_connections concurrent requests. libcurl is used when pycurl is installed
+        as it keeps the connections alive between requests
+        """
+        try:
+            from tornado.curl_httpclient import CurlAsyncHTTPClient
+            return CurlAsyncHTTPClient(force_instance=True, max_clients=max_connections)
+        except ImportError:
+            return AsyncHTTPClient(force_instance=True, max_clients=max_connections)
+
+    def ensure_db(self):
+        """
+        Return a Future resolved once the database and the design document are created.
+        A failed initialization is retried by the next call
+        """
+        if self.db_ready is None or (self.db_ready.done() and self.db_ready.exception() is not None):
+            self.db_ready = self.init_db()
+        return self.db_ready
+
+    @gen.coroutine
+    def init_db(self):
+        #make sure the database exists, if not create it. 412 means another worker just created it
+        response = yield self.fetch(method="HEAD", allowed_codes=(404,))
+        if response.code == 404:
+            yield self.fetch(method="PUT", allowed_codes=(412,))
+        app_log.info("Succesfully connected to Cloudant db: %s-%s", self.host, CloudantChartStorage.CHART_DB_NAME)
+
+        response = yield self.fetch(CloudantChartStorage.DESIGN_DOC_ID, allowed_codes=(404,))
+        design_doc = dict(CloudantChartStorage.DESIGN_DOC)
+        if response.code != 404:
+            current_doc = self.to_json(response.body)
+            if all(current_doc.get(key) == value for key, value in iteritems(design_doc)):
+                return
+            #upgrade the design doc of a previous version, e.g. without the search index
+            design_doc["_rev"] = current_doc["_rev"]
+        yield self.fetch(CloudantChartStorage.DESIGN_DOC_ID, method="PUT", body=design_doc, allowed_codes=(409,))
+
+    def get_headers(self):
+        return self.headers
 
     def build_url(self, path="", **kwargs):
         url = "{}://{}:{}/{}/{}".format(self.protocol, self.host, self.port, CloudantChartStorage.CHART_DB_NAME, path)
         return url if len(kwargs)==0 else "{}?{}".format(url,"&".join(["{}={}".format(k,v) for k,v in iteritems(kwargs)]))
 
+    def doc_path(self, chart_id):
+        return url_escape(chart_id, plus=False)
+
+    @gen.coroutine
+    def fetch(self, path="", method="GET", body=None, allowed_codes=(), **kwargs):
+        """
+        Send a request to the chart database and return the response. Requests failing with one of the RETRY_CODES
+        are retried with an exponential backoff, other errors are raised unless their code is in allowed_codes
+        """
+        if body is not None:
+            body = json_encode(body)
+        elif method in ("POST", "PUT"):
+            body = ""
+        request = HTTPRequest(
+            self.build_url(path, **kwargs), method=method, headers=self.headers, body=body,
+            request_timeout=self.request_timeout
+        )
+        attempt = 0
+        while True:
+            try:
+                response = yield self.http_client.fetch(request, raise_error=False)
+                code, error = response.code, response.error
+            except (IOError, HTTPError) as exc:
+                #recent versions of tornado raise connection errors and timeouts instead of returning a 599
+                response, code, error = None, getattr(exc, "code", 599), exc
+            if code not in CloudantChartStorage.RETRY_CODES or attempt >= self.max_retries:
+                break
+            delay = self.retry_delay * (2 ** attempt)
+            if response is not None and response.headers.get("Retry-After", "").isdigit():
+                delay = max(delay, int(response.headers["Retry-After"]))
+            delay = min(delay, self.max_retry_delay)
+            app_log.warning("Cloudant request %s %s failed with %s, retrying in %ss", method, path, code, delay)
+            yield gen.sleep(delay)
+            attempt += 1
+        if error is not None and code not in allowed_codes:
+            raise error
+        raise gen.Return(response)
+
     @gen.coroutine
     def store_chart(self, payload):
+        yield self.ensure_db()
         chart_id = str(uuid.uuid4())
         payload = {
             '_id': chart_id,
@@ -212,28 +789,32 @@ class CloudantChartStorage(ChartStorage):
             'RENDERERID': payload.get("rendererId", "")
         }
 
-        response = yield self.http_client.fetch(
-            HTTPRequest(self.build_url(), method='POST', headers=self.get_headers(), body=json_encode(payload))
-        )
-        if response.error is not None:
-            raise response.error
+        #the id is new so a conflict means that a retried request was stored by a previous attempt
+        response = yield self.fetch(self.doc_path(chart_id), method="PUT", body=payload, allowed_codes=(409,))
+        if response.code == 409:
+            response = yield self.fetch(self.doc_path(chart_id), method="HEAD")
+            payload['_rev'] = response.headers["ETag"].strip('"')
+        else:
+            payload['_rev'] = self.to_json(response.body)['rev']
         #return the chart_model for this newly stored chart
         raise gen.Return(payload)
 
     @gen.coroutine
-    def update_chart(self, payload):
-        chart_id = payload["CHARTID"]
-        response = yield self.http_client.fetch(
-            HTTPRequest(self.build_url(chart_id), method='PUT', headers=self.get_headers(), body=json_encode(payload))
-        )
-        if response.error is not None:
-            print("Error occurred updating to couch: {}".format(response.text))
-            raise response.error
-        #return the chart_model for this newly stored chart
-        raise gen.Return(payload)
+    def import_charts(self, records):
+        yield self.ensure_db()
+        docs = [dict(
+            record,
+            _id=record['CHARTID'],
+            DATE=parse_chart_date(record['DATE'])
+        ) for record in records]
+        response = yield self.fetch("_bulk_docs", method="POST", body={"docs": docs})
+        results = self.to_json(response.body)
+        for result in [result for result in results if result.get("error") not in (None, "conflict")]:
+            app_log.error("Unable to import chart %s: %s", result['id'], result.get("reason", result["error"]))
+        raise gen.Return(len([result for result in results if "error" not in result]))
 
     def format_chart_model(self, chart_model):
-        chart_model['DATE'] = datetime.datetime.fromtimestamp(chart_model['DATE']).strftime("%Y-%m-%d %H:%M:%S")
+        chart_model['DATE'] = format_chart_date(chart_model['DATE'])
         return chart_model
 
     def to_json(self, payload):
@@ -244,31 +825,267 @@ class CloudantChartStorage(ChartStorage):
 
     @gen.coroutine
     def get_chart(self, chart_id):
-        response = yield self.http_client.fetch(self.build_url(chart_id), headers=self.get_headers())
-        raise gen.Return(self.to_json(response.body))
+        yield self.ensure_db()
+        #use a query rather than a plain GET so that the legacy thumbnail is not transferred
+        response = yield self.fetch("_find", method="POST", body={
+            "selector": {"_id": chart_id},
+            "fields": ["_id", "_rev"] + CHART_COLUMNS.split(","),
+            "limit": 1
+        })
+        docs = self.to_json(response.body)['docs']
+        raise gen.Return(docs[0] if len(docs) > 0 else None)
+
+    @gen.coroutine
+    def get_charts_by_id(self, chart_ids):
+        yield self.ensure_db()
+        response = yield self.fetch("_bulk_get", method="POST", body={"docs": [{"id": chart_id} for chart_id in chart_ids]})
+        chart_models = {}
+        for result in self.to_json(response.body)['results']:
+            chart_model = result['docs'][0].get('ok')
+            if chart_model is not None:
+                chart_model.pop("THUMBNAIL", None)
+                chart_models[result['id']] = chart_model
+        raise gen.Return([chart_models.get(chart_id) for chart_id in chart_ids])
 
+    @gen.coroutine
+    def get_chart_thumbnail(self, chart_id):
+        yield self.ensure_db()
+        response = yield self.fetch(self.doc_path(chart_id), allowed_codes=(404,))
+        if response.code == 404:
+            raise gen.Return(None)
+        raise gen.Return(self.to_json(response.body).get("THUMBNAIL") or None)
+
+    @gen.coroutine
     def delete_chart(self, chart_id):
-        response = requests.delete(self.build_url(chart_id), headers=self.get_headers())
-        if not response.ok:
-            raise Exception(response.text)
+        yield self.ensure_db()
+        #the ETag of the document is its current revision
+        response = yield self.fetch(self.doc_path(chart_id), method="HEAD", allowed_codes=(404,))
+        if response.code == 404:
+            raise gen.Return(0)
+        response = yield self.fetch(
+            self.doc_path(chart_id), method="DELETE", allowed_codes=(404,), rev=response.headers["ETag"].strip('"')
+        )
+        raise gen.Return(0 if response.code == 404 else 1)
 
     def list_charts(self):
         return self.get_charts()
 
     @gen.coroutine
-    def get_charts(self, page_num=0, page_size=10):
+    def get_charts(self, page_num=0, page_size=10, cursor=None):
+        yield self.ensure_db()
         limit = max(1, page_size)
-        offset = limit * max(0, page_num)
-        url = self.build_url("_all_docs", limit=limit, skip=offset, include_docs="true")
-        response = yield self.http_client.fetch(url, headers=self.get_headers())
+        kwargs = {"descending": "true", "limit": limit + 1}
+        if cursor is not None:
+            date, chart_id = decode_cursor(cursor)
+            kwargs.update(startkey=url_escape(json_encode(date)), startkey_docid=url_escape(chart_id))
+        else:
+            kwargs["skip"] = limit * max(0, page_num)
+        response = yield self.fetch("{}/_view/by_date".format(CloudantChartStorage.DESIGN_DOC_ID), **kwargs)
         payload = self.to_json(response.body)
+        page = make_charts_page(
+            [row['value'] for row in payload['rows']], page_num, limit, payload['total_rows'],
+            lambda chart: encode_cursor(chart['DATE'], chart['CHARTID'])
+        )
+        page["charts_list"] = [self.format_chart_model(chart) for chart in page["charts_list"]]
+        raise gen.Return(page)
+
+    @staticmethod
+    def to_search_query(query):
+        """
+        Convert a user search to a Lucene query matching the charts that contain all its words, as prefixes.
+        Raises ValueError if the search has no words
+        """
+        words = re.findall(r"\w+", query.lower(), re.UNICODE)
+        if len(words) == 0:
+            raise ValueError("Invalid search: {}".format(query))
+        return " AND ".join(
+            "(" + " OR ".join("{}:{}*".format(field, word) for field in CloudantChartStorage.SEARCH_FIELDS) + ")"
+            for word in words
+        )
+
+    @gen.coroutine
+    def search_charts(self, query, page_num=0, page_size=10, cursor=None):
+        """
+        Search pages are chained with the Cloudant bookmark, page_num is only used to label the page
+        """
+        yield self.ensure_db()
+        limit = max(1, page_size)
+        kwargs = {
+            "q": url_escape(self.to_search_query(query)),
+            "sort": url_escape(json_encode("-DATE<number>")),
+            "limit": limit
+        }
+        offset = 0
+        if cursor is not None:
+            bookmark, offset = decode_cursor(cursor)
+            kwargs["bookmark"] = url_escape(bookmark)
+        response = yield self.fetch("{}/_search/search".format(CloudantChartStorage.DESIGN_DOC_ID), **kwargs)
+        payload = self.to_json(response.body)
+        rows = payload['rows']
+        offset += len(rows)
         raise gen.Return({
             "page_num": page_num,
-            "page_size": page_size,
+            "page_size": limit,
             "total_count": payload['total_rows'],
-            "charts_list": [self.format_chart_model(row['doc']) for row in payload['rows']]
+            "next_cursor": encode_cursor(payload['bookmark'], offset) if offset < payload['total_rows'] else None,
+            "charts_list": [self.format_chart_model(dict(row['fields'], CHARTID=row['id'])) for row in rows]
         })
 
+class CachedChartStorage(ChartStorage):
+    """
+    Chart storage that puts a local SQLLite cache in front of a remote chart storage, e.g. Cloudant.
+    Writes go through to the remote storage, reads are served from the local cache when possible and fill it
+    otherwise. The least recently read charts are evicted once the cache grows above its max size.
+    Chart listings always come from the remote storage
+    """
+    CACHE_TBL_NAME = "CHART_CACHE"
+    CACHE_STATS_TBL_NAME = "CHART_CACHE_STATS"
+    #Total size of the cached models maintained by triggers, same as the CHARTS count
+    CACHE_DDL = [
+        "CREATE TABLE IF NOT EXISTS {0} (CHARTID TEXT NOT NULL PRIMARY KEY, MODEL TEXT NOT NULL, SIZE INTEGER NOT NULL, ACCESSED REAL NOT NULL)".format(
+            CACHE_TBL_NAME
+        ),
+        "CREATE INDEX IF NOT EXISTS {0}_ACCESSED_IDX ON {0} (ACCESSED)".format(CACHE_TBL_NAME),
+        "CREATE TABLE IF NOT EXISTS {0} (NAME TEXT NOT NULL PRIMARY KEY, VALUE INTEGER NOT NULL)".format(CACHE_STATS_TBL_NAME),
+        "INSERT OR IGNORE INTO {1} (NAME, VALUE) SELECT 'size', COALESCE(SUM(SIZE), 0) FROM {0}".format(
+            CACHE_TBL_NAME, CACHE_STATS_TBL_NAME
+        ),
+        """CREATE TRIGGER IF NOT EXISTS {0}_INSERT_SIZE AFTER INSERT ON {0}
+           BEGIN UPDATE {1} SET VALUE = VALUE + NEW.SIZE WHERE NAME = 'size'; END""".format(CACHE_TBL_NAME, CACHE_STATS_TBL_NAME),
+        """CREATE TRIGGER IF NOT EXISTS {0}_DELETE_SIZE AFTER DELETE ON {0}
+           BEGIN UPDATE {1} SET VALUE = VALUE - OLD.SIZE WHERE NAME = 'size'; END""".format(CACHE_TBL_NAME, CACHE_STATS_TBL_NAME)
+    ]
+    SELECT_MODEL = "SELECT MODEL FROM {0} WHERE CHARTID = ?".format(CACHE_TBL_NAME)
+    TOUCH_MODEL = "UPDATE {0} SET ACCESSED = ? WHERE CHARTID = ? AND ACCESSED < ?".format(CACHE_TBL_NAME)
+    DELETE_MODEL = "DELETE FROM {0} WHERE CHARTID = ?".format(CACHE_TBL_NAME)
+    INSERT_MODEL = "INSERT INTO {0} (CHARTID, MODEL, SIZE, ACCESSED) VALUES (?, ?, ?, ?)".format(CACHE_TBL_NAME)
+    CACHE_SIZE = "SELECT VALUE FROM {0} WHERE NAME = 'size'".format(CACHE_STATS_TBL_NAME)
+    LEAST_RECENTLY_READ = "SELECT CHARTID, SIZE FROM {0} ORDER BY ACCESSED".format(CACHE_TBL_NAME)
+    #Don't write the access time more than once per interval (in seconds) for the same chart
+    TOUCH_INTERVAL = 60
+
+    class CacheConfig(SingletonConfigurable):
+        def __init__(self, **kwargs):
+            kwargs['parent'] = PixieGatewayApp.instance()
+            super(CachedChartStorage.CacheConfig, self).__init__(**kwargs)
+
+        remote_storage_class = Unicode(None, config=True, help="Chart storage class of the remote storage")
+        db_path = Unicode(None, config=True, help="Path of the local chart cache database")
+        max_size = Integer(256 * 1024 * 1024, config=True, help="Max size in bytes of the charts in the local cache")
+
+        @default('remote_storage_class')
+        def remote_storage_class_default(self):
+            return os.getenv("PG_CHART_REMOTE_STORAGE", "pixiegateway.chartsManager.CloudantChartStorage")
+
+        @default('db_path')
+        def db_path_default(self):
+            return os.getenv(
+                "PG_CHART_LOCAL_CACHE_DB_PATH", os.path.join(os.path.dirname(storage.SQLITE_DB_NAME_PATH), "chartcache.db")
+            )
+
+        @default('max_size')
+        def max_size_default(self):
+            return int(os.getenv("PG_CHART_LOCAL_CACHE_SIZE", 256 * 1024 * 1024))
+
+    def __init__(self):
+        config = CachedChartStorage.CacheConfig.instance()
+        self.remote = import_object(config.remote_storage_class)()
+        self.db_path = config.db_path
+        self.max_size = config.max_size
+        #sqlite serializes the writes anyway
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            for ddl in CachedChartStorage.CACHE_DDL:
+                self.connection.execute(ddl)
+
+    @run_on_executor
+    def get_local(self, chart_id):
+        "returns the cached chart model, None if not cached"
+        row = self.connection.execute(CachedChartStorage.SELECT_MODEL, (chart_id,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        with self.connection:
+            self.connection.execute(
+                CachedChartStorage.TOUCH_MODEL, (now, chart_id, now - CachedChartStorage.TOUCH_INTERVAL)
+            )
+        return json.loads(row[0])
+
+    @run_on_executor
+    def set_local(self, chart_models):
+        "cache the chart models and evict the least recently read ones if needed"
+        with self.connection:
+            for chart_model in chart_models:
+                model = json.dumps(chart_model)
+                self.connection.execute(CachedChartStorage.DELETE_MODEL, (chart_model['CHARTID'],))
+                if len(model) <= self.max_size:
+                    self.connection.execute(
+                        CachedChartStorage.INSERT_MODEL, (chart_model['CHARTID'], model, len(model), time.time())
+                    )
+            excess = self.connection.execute(CachedChartStorage.CACHE_SIZE).fetchone()[0] - self.max_size
+            evicted_ids = []
+            for chart_id, size in self.connection.execute(CachedChartStorage.LEAST_RECENTLY_READ):
+                if excess <= 0:
+                    break
+                evicted_ids.append((chart_id,))
+                excess -= size
+            self.connection.executemany(CachedChartStorage.DELETE_MODEL, evicted_ids)
+
+    @run_on_executor
+    def delete_local(self, chart_id):
+        with self.connection:
+            self.connection.execute(CachedChartStorage.DELETE_MODEL, (chart_id,))
+
+    @gen.coroutine
+    def store_chart(self, payload):
+        chart_model = yield gen.maybe_future(self.remote.store_chart(payload))
+        yield self.set_local([chart_model])
+        raise gen.Return(chart_model)
+
+    @gen.coroutine
+    def get_chart(self, chart_id):
+        chart_model = yield self.get_local(chart_id)
+        if chart_model is None:
+            chart_model = yield gen.maybe_future(self.remote.get_chart(chart_id))
+            if chart_model is not None:
+                yield self.set_local([chart_model])
+        raise gen.Return(chart_model)
+
+    @gen.coroutine
+    def get_charts_by_id(self, chart_ids):
+        chart_models = yield [self.get_local(chart_id) for chart_id in chart_ids]
+        missing_ids = [chart_id for chart_id, chart_model in zip(chart_ids, chart_models) if chart_model is None]
+        if len(missing_ids) > 0:
+            fetched_models = yield gen.maybe_future(self.remote.get_charts_by_id(missing_ids))
+            fetched_models = {chart_model['CHARTID']: chart_model for chart_model in fetched_models if chart_model is not None}
+            yield self.set_local(list(fetched_models.values()))
+            chart_models = [chart_model or fetched_models.get(chart_id) for chart_id, chart_model in zip(chart_ids, chart_models)]
+        raise gen.Return(chart_models)
+
+    def get_chart_thumbnail(self, chart_id):
+        return self.remote.get_chart_thumbnail(chart_id)
+
+    def import_charts(self, records):
+        #imported charts are cached when first read
+        return self.remote.import_charts(records)
+
+    @gen.coroutine
+    def delete_chart(self, chart_id):
+        yield self.delete_local(chart_id)
+        raise gen.Return((yield gen.maybe_future(self.remote.delete_chart(chart_id))))
+
+    def list_charts(self):
+        return self.remote.list_charts()
+
+    def get_charts(self, page_num=0, page_size=10, cursor=None):
+        return self.remote.get_charts(page_num, page_size, cursor)
+
+    def search_charts(self, query, page_num=0, page_size=10, cursor=None):
+        return self.remote.search_charts(query, page_num, page_size, cursor)
+
 class SingletonChartStorage(SingletonConfigurable):
     """
     Singleton use to access concrete instance of chart storage
@@ -292,3 +1109,77 @@ class SingletonChartStorage(SingletonConfigurable):
         if self.chart_storage is not None and hasattr(self.chart_storage, name):
             return getattr(self.chart_storage, name)
         raise AttributeError("{0} attribute not found".format(name))
+
+def chart_model_size(chart_model):
+    return sum(len(value) for value in chart_model.values() if isinstance(value, (string_types, bytes)))
+
+class ChartCache(SingletonConfigurable):
+    """
+    Size bounded LRU cache of chart models and rendered chart html in front of SingletonChartStorage
+    Charts never change once stored, which makes the rendered html safe to cache
+    """
+
+    max_size = Integer(64 * 1024 * 1024, config=True, help="Max size in bytes of the chart cache")
+    max_age = Integer(30 * 24 * 3600, config=True, help="Cache-Control max-age in seconds of the chart responses")
+
+    @default('max_size')
+    def max_size_default(self):
+        return int(os.getenv("PG_CHART_CACHE_SIZE", 64 * 1024 * 1024))
+
+    @default('max_age')
+    def max_age_default(self):
+        return int(os.getenv("PG_CHART_MAX_AGE", 30 * 24 * 3600))
+
+    def __init__(self, **kwargs):
+        kwargs['parent'] = PixieGatewayApp.instance()
+        super(ChartCache, self).__init__(**kwargs)
+        self.chart_models = LRUCache(self.max_size // 2, sizeof=chart_model_size)
+        self.renders = LRUCache(self.max_size // 2, sizeof=lambda render: len(render[1]) + len(render[2]))
+        #concurrent misses for the same chart, e.g. a popular chart after a restart, share a single storage fetch
+        self.pending_fetches = SingleFlight()
+
+    @gen.coroutine
+    def get_chart(self, chart_id):
+        chart_model = self.chart_models.get(chart_id)
+        if chart_model is None:
+            chart_model = yield self.pending_fetches.do(chart_id, lambda: self._fetch_chart(chart_id))
+        raise gen.Return(chart_model)
+
+    @gen.coroutine
+    def _fetch_chart(self, chart_id):
+        chart_model = yield gen.maybe_future(SingletonChartStorage.instance().get_chart(chart_id))
+        if chart_model is not None:
+            self.chart_models.set(chart_id, chart_model)
+        raise gen.Return(chart_model)
+
+    @gen.coroutine
+    def store_chart(self, payload):
+        chart_model = yield gen.maybe_future(SingletonChartStorage.instance().store_chart(payload))
+        self.chart_models.set(chart_model['CHARTID'], chart_model)
+        raise gen.Return(chart_model)
+
+    @gen.coroutine
+    def delete_chart(self, chart_id):
+        self.invalidate(chart_id)
+        ThumbnailStore.instance().delete(chart_id)
+        raise gen.Return((yield gen.maybe_future(SingletonChartStorage.instance().delete_chart(chart_id))))
+
+    def invalidate(self, chart_id):
+        self.chart_models.pop(chart_id)
+        for key in [key for key in self.renders.keys() if key[0] == chart_id]:
+            self.renders.pop(key)
+
+    def get_render(self, chart_id, variant):
+        """
+        Return the (etag, html, gzipped html) tuple previously rendered for this chart variant, None if not cached
+        """
+        return self.renders.get((chart_id, variant))
+
+    def set_render(self, chart_id, variant, html):
+        """
+        Cache the rendered html of a chart variant and return its (etag, html, gzipped html) tuple.
+        The html is compressed once here so that the responses don't need to
+        """
+        render = ('"{}"'.format(hashlib.sha1(html).hexdigest()), html, gzip_compress(html))
+        self.renders.set((chart_id, variant), render)
+        return render
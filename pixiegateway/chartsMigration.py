@@ -0,0 +1,224 @@
+# -------------------------------------------------------------------------------
+# Copyright IBM Corp. 2017
+# 
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+# http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -------------------------------------------------------------------------------
+"""
+Streaming export and import of the shared charts as NDJSON, one chart per line.
+After each page of charts the export writes a {"next_cursor": ...} checkpoint line from which it can be resumed.
+Imports skip the charts already present in the target storage so that they can safely be run again.
+
+Usage:
+    python -m pixiegateway.chartsMigration export [--storage CLASS] [--output FILE] [--cursor CURSOR]
+    python -m pixiegateway.chartsMigration import [--storage CLASS] [--input FILE]
+    python -m pixiegateway.chartsMigration migrate --source CLASS --target CLASS [--state-file FILE]
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import sys
+from six import string_types
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.util import import_object
+from .chartsManager import format_chart_date
+from .thumbnailStore import ThumbnailStore
+
+EXPORT_COLUMNS = ["CHARTID", "AUTHOR", "DATE", "DESCRIPTION", "CONTENT", "RENDERERID"]
+
+def to_export_record(chart_model):
+    """
+    Convert a chart model to its export record. Dates are exported in the SQLLite format whatever the storage
+    """
+    record = {column: chart_model.get(column) for column in EXPORT_COLUMNS}
+    if not isinstance(record['DATE'], string_types):
+        record['DATE'] = format_chart_date(record['DATE'])
+    if isinstance(record['CONTENT'], bytes):
+        record['CONTENT'] = record['CONTENT'].decode("utf-8")
+    return record
+
+@gen.coroutine
+def get_thumbnail(chart_storage, chart_id):
+    "Return the base64 thumbnail of the chart, None if it was never generated"
+    thumbnail_store = ThumbnailStore.instance()
+    if thumbnail_store.exists(chart_id):
+        with io.open(thumbnail_store.get_path(chart_id), "rb") as thumbnail_file:
+            raise gen.Return(base64.b64encode(thumbnail_file.read()).decode("utf-8"))
+    raise gen.Return((yield gen.maybe_future(chart_storage.get_chart_thumbnail(chart_id))))
+
+@gen.coroutine
+def export_charts(chart_storage, write, cursor=None, page_size=100, include_thumbnails=True):
+    """
+    Page through the chart storage, most recent first, and call write with each NDJSON line.
+    Only one page of charts is loaded at a time, write can return a Future to apply back pressure
+    """
+    while True:
+        page = yield gen.maybe_future(chart_storage.get_charts(page_size=page_size, cursor=cursor))
+        chart_models = yield gen.maybe_future(
+            chart_storage.get_charts_by_id([chart['CHARTID'] for chart in page['charts_list']])
+        )
+        #charts deleted since the page was listed are None
+        for chart_model in [chart_model for chart_model in chart_models if chart_model is not None]:
+            record = to_export_record(chart_model)
+            if include_thumbnails:
+                record['THUMBNAIL'] = yield get_thumbnail(chart_storage, record['CHARTID'])
+            yield gen.maybe_future(write(json.dumps(record) + "\n"))
+        cursor = page['next_cursor']
+        yield gen.maybe_future(write(json.dumps({"next_cursor": cursor}) + "\n"))
+        if cursor is None:
+            break
+
+class ChartImporter(object):
+    """
+    Import NDJSON lines fed in chunks of any size into a chart storage, charts are inserted in batches
+    """
+    def __init__(self, chart_storage, batch_size=100, on_checkpoint=None):
+        self.chart_storage = chart_storage
+        self.batch_size = batch_size
+        #called with the export cursor once all the charts before the checkpoint are imported
+        self.on_checkpoint = on_checkpoint
+        self.buffer = b""
+        self.batch = []
+        self.imported_count = 0
+        self.skipped_count = 0
+
+    @gen.coroutine
+    def feed(self, data):
+        if not isinstance(data, bytes):
+            data = data.encode("utf-8")
+        lines = (self.buffer + data).split(b"\n")
+        self.buffer = lines.pop()
+        for line in lines:
+            yield self.add_line(line)
+
+    @gen.coroutine
+    def add_line(self, line):
+        if len(line.strip()) == 0:
+            return
+        record = json.loads(line.decode("utf-8") if isinstance(line, bytes) else line)
+        if "CHARTID" not in record:
+            yield self.flush()
+            if self.on_checkpoint is not None:
+                yield gen.maybe_future(self.on_checkpoint(record.get("next_cursor")))
+            return
+        self.batch.append(record)
+        if len(self.batch) >= self.batch_size:
+            yield self.flush()
+
+    @gen.coroutine
+    def flush(self):
+        batch, self.batch = self.batch, []
+        if len(batch) == 0:
+            return
+        thumbnails = [(record['CHARTID'], record.pop('THUMBNAIL', None)) for record in batch]
+        imported_count = yield gen.maybe_future(self.chart_storage.import_charts(batch))
+        self.imported_count += imported_count
+        self.skipped_count += len(batch) - imported_count
+        thumbnail_store = ThumbnailStore.instance()
+        for chart_id, thumbnail in thumbnails:
+            if thumbnail and not thumbnail_store.exists(chart_id):
+                yield thumbnail_store.save(chart_id, base64.b64decode(thumbnail))
+
+    @gen.coroutine
+    def close(self):
+        "Import the remaining charts"
+        if len(self.buffer) > 0:
+            yield self.add_line(self.buffer)
+            self.buffer = b""
+        yield self.flush()
+
+@gen.coroutine
+def run_export(args):
+    chart_storage = import_object(args.storage)()
+    #a resumed export continues the same file
+    output = sys.stdout if args.output == "-" else open(args.output, "a" if args.cursor else "w")
+    try:
+        yield export_charts(
+            chart_storage, output.write, cursor=args.cursor, page_size=args.page_size,
+            include_thumbnails=not args.no_thumbnails
+        )
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+@gen.coroutine
+def run_import(args):
+    importer = ChartImporter(import_object(args.storage)(), batch_size=args.page_size)
+    stdin = getattr(sys.stdin, "buffer", sys.stdin)
+    input_file = stdin if args.input == "-" else io.open(args.input, "rb")
+    try:
+        while True:
+            data = input_file.read(64 * 1024)
+            if not data:
+                break
+            yield importer.feed(data)
+        yield importer.close()
+    finally:
+        if input_file is not stdin:
+            input_file.close()
+    print("Imported {} charts, skipped {} already present".format(importer.imported_count, importer.skipped_count))
+
+@gen.coroutine
+def run_migrate(args):
+    cursor = None
+    if args.state_file and os.path.isfile(args.state_file):
+        with io.open(args.state_file) as state_file:
+            cursor = json.load(state_file).get("next_cursor")
+        if cursor is None:
+            print("Migration already complete, delete {} to run it again".format(args.state_file))
+            return
+
+    def on_checkpoint(next_cursor):
+        if args.state_file:
+            with open(args.state_file, "w") as state_file:
+                state_file.write(json.dumps({"next_cursor": next_cursor}))
+
+    importer = ChartImporter(import_object(args.target)(), batch_size=args.page_size, on_checkpoint=on_checkpoint)
+    #source and target share the same ThumbnailStore
+    yield export_charts(
+        import_object(args.source)(), importer.feed, cursor=cursor, page_size=args.page_size, include_thumbnails=False
+    )
+    yield importer.close()
+    print("Migrated {} charts, skipped {} already present".format(importer.imported_count, importer.skipped_count))
+
+def main(argv=None):
+    default_storage = os.getenv('PG_CHART_STORAGE', 'pixiegateway.chartsManager.SQLLiteChartStorage')
+    parser = argparse.ArgumentParser(description="Export, import or migrate the PixieGateway shared charts")
+    subparsers = parser.add_subparsers(dest="command")
+    export_parser = subparsers.add_parser("export", help="Export the charts as NDJSON")
+    export_parser.add_argument("--storage", default=default_storage, help="Chart storage class")
+    export_parser.add_argument("--output", default="-", help="Output file, stdout by default")
+    export_parser.add_argument("--cursor", help="Resume the export from this next_cursor checkpoint")
+    export_parser.add_argument("--no-thumbnails", action="store_true", help="Don't export the thumbnails")
+    import_parser = subparsers.add_parser("import", help="Import charts exported as NDJSON")
+    import_parser.add_argument("--storage", default=default_storage, help="Chart storage class")
+    import_parser.add_argument("--input", default="-", help="Input file, stdin by default")
+    migrate_parser = subparsers.add_parser("migrate", help="Copy the charts from a storage to another")
+    migrate_parser.add_argument("--source", required=True, help="Source chart storage class")
+    migrate_parser.add_argument("--target", required=True, help="Target chart storage class")
+    migrate_parser.add_argument("--state-file", help="File recording the progress, a migration resumes from it")
+    for subparser in [export_parser, import_parser, migrate_parser]:
+        subparser.add_argument("--page-size", type=int, default=100, help="Number of charts read or written at once")
+
+    args = parser.parse_args(argv)
+    commands = {"export": run_export, "import": run_import, "migrate": run_migrate}
+    if args.command not in commands:
+        parser.print_help()
+        return 1
+    IOLoop.current().run_sync(lambda: commands[args.command](args))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -34,3 +34,10 @@ class AppAccessError(Exception):
     """
     def __init__(self):
         super(AppAccessError, self).__init__("Unauthorized Access")
+
+class SearchNotSupportedError(Exception):
+    """
+    Exception raised when the chart storage is not able to search the charts
+    """
+    def __init__(self, storage_name):
+        super(SearchNotSupportedError, self).__init__("Chart search is not supported by {}".format(storage_name))
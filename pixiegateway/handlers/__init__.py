@@ -17,7 +17,8 @@ __all__ = [
     'PixieDustHandler', 'PixieDustLogHandler', 'ExecuteCodeHandler', 'PixieAppHandler',
     'PixieAppListHandler', 'PixieAppPublishHandler', 'ChartShareHandler', 'StatsHandler',
     'AdminHandler', 'ChartEmbedHandler', 'ChartsHandler', 'OEmbedChartHandler', 'LoginHandler',
-    'AdminCommandHandler'
+    'AdminCommandHandler', 'ChartsExportHandler', 'ChartsImportHandler', 'AssetBundleHandler',
+    'OutputBlobHandler', 'WorkerSyncHandler'
 ]
 
 import inspect
@@ -26,13 +27,25 @@ import os
 import traceback
 from uuid import uuid4
 import tornado
+from tornado import gen, web, httputil
+from tornado.ioloop import PeriodicCallback
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
 from tornado.log import app_log
 import pixiegateway
 from pixiegateway.exceptions import CodeExecutionError, AppAccessError
+from pixiegateway.assetBundle import AssetBundle
+from pixiegateway.pixieGatewayApp import PixieGatewayApp
 from pixiegateway.session import SessionManager
 
+#Templates with an absolute name are resolved from the package, the others from this directory
+PACKAGE_TEMPLATE_PATH = os.path.dirname(os.path.abspath(pixiegateway.__file__))
+HANDLERS_TEMPLATE_PATH = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+
 class BaseHandler(tornado.web.RequestHandler):
     """Base class for all PixieGateway handler"""
+
+    #template name -> (state version, html) of the sub-views rendered with render_fragment
+    fragment_cache = {}
     def initialize(self):
         self.output_json_error = False
 
@@ -40,10 +53,10 @@ class BaseHandler(tornado.web.RequestHandler):
         print("Got an exception: {}".format(exc))
         if isinstance(exc, AppAccessError):
             return self.send_error(401)
+        if isinstance(exc, web.HTTPError):
+            return self.send_error(exc.status_code)
 
-        html_error = "<div>Unexpected error:</div><pre>{}</pre>".format(
-            str(exc) if isinstance(exc, CodeExecutionError) else traceback.format_exc()
-        )
+        html_error = self.get_html_error(exc)
         if self.output_json_error:
             msg = {
                 "buffers": [],
@@ -71,6 +84,12 @@ class BaseHandler(tornado.web.RequestHandler):
             self.write(html_error)
         self.finish()
 
+    def get_html_error(self, exc):
+        "Markup of the error, must be called from the except block that caught it"
+        return "<div>Unexpected error:</div><pre>{}</pre>".format(
+            str(exc) if isinstance(exc, CodeExecutionError) else traceback.format_exc()
+        )
+
     # def create_template_loader2(self, template_path):
     #     print("Create template loader: {}".format(template_path))
     #     file = None
@@ -102,20 +121,140 @@ class BaseHandler(tornado.web.RequestHandler):
         finally:
             self.template_name = None
 
+    def get_template_namespace(self):
+        namespace = super(BaseHandler, self).get_template_namespace()
+        namespace["bundle_url"] = AssetBundle.instance().get_url
+        namespace["render_fragment"] = self.render_fragment
+        return namespace
+
     def get_template_path(self):
-        if self.template_name.startswith("/"):
-            file_path = pixiegateway.__file__
-        else:
-            file_path = inspect.getfile(inspect.currentframe())
-        return os.path.dirname(os.path.abspath(file_path))
+        return PACKAGE_TEMPLATE_PATH if self.template_name.startswith("/") else HANDLERS_TEMPLATE_PATH
+
+    def render_fragment(self, template_name, version, get_args=None):
+        """
+        Render a sub-view template, the html is cached until the version of the state it depends on changes.
+        get_args is only called when the fragment is rendered
+        """
+        fragment = BaseHandler.fragment_cache.get(template_name)
+        if fragment is None or fragment[0] != version:
+            html = self.render_string(template_name, **(get_args() if get_args is not None else {}))
+            fragment = BaseHandler.fragment_cache[template_name] = (version, html)
+        return fragment[1]
+
+    @staticmethod
+    def reset_template_cache():
+        "Drop the compiled templates and the cached fragments so that they are reloaded from disk"
+        with tornado.web.RequestHandler._template_loader_lock:
+            for loader in tornado.web.RequestHandler._template_loaders.values():
+                loader.reset()
+        BaseHandler.fragment_cache.clear()
 
+    FORWARDED_HEADER = "X-PixieGateway-Worker"
+
+    def get_worker_hint(self):
+        """
+        Return the id carrying the worker hint for this request. Subclasses can override
+        to route on a run_id passed in the url
+        """
+        return self.get_secure_cookie("pd_session_id")
+
+    @gen.coroutine
     def prepare(self):
         """
-        Retrieve session for current user
+        Forward the request to the worker that owns it, otherwise retrieve session for current user
         """
+        app = PixieGatewayApp.instance()
+        #only the requests relayed by the other workers, on the loopback port, are not forwarded again
+        if BaseHandler.FORWARDED_HEADER in self.request.headers and not self.is_worker_request():
+            del self.request.headers[BaseHandler.FORWARDED_HEADER]
+        if BaseHandler.FORWARDED_HEADER not in self.request.headers:
+            worker_id = app.get_tagged_worker(self.get_worker_hint())
+            if worker_id is not None and worker_id != app.worker_id:
+                yield self.forward_to_worker(worker_id)
+                return
         self.session = SessionManager.instance().get_session(self)
         app_log.debug("session %s", self.session)
 
+    @gen.coroutine
+    def forward_to_worker(self, worker_id):
+        """
+        Relay the request to the worker that owns it. The response is streamed back as it arrives
+        so that the content flushed early by the worker, e.g. the PixieApp page head, isn't held back
+        """
+        app = PixieGatewayApp.instance()
+        headers = self.request.headers.copy()
+        headers[BaseHandler.FORWARDED_HEADER] = str(app.worker_id)
+        headers["X-Forwarded-For"] = self.request.remote_ip
+        headers["X-Scheme"] = self.request.protocol
+        response_headers = httputil.HTTPHeaders()
+        streamed = []
+        def on_header_line(line):
+            if line.startswith("HTTP/"):
+                start_line = httputil.parse_response_start_line(line.strip())
+                self.clear()
+                self.set_status(start_line.code, start_line.reason)
+            elif line.strip():
+                response_headers.parse_line(line)
+            else:
+                for name, value in response_headers.get_all():
+                    if name == "Set-Cookie":
+                        self.add_header(name, value)
+                    elif name not in ("Content-Length", "Transfer-Encoding", "Connection"):
+                        self.set_header(name, value)
+        def on_chunk(chunk):
+            streamed.append(True)
+            self.write(chunk)
+            self.flush()
+        response = yield AsyncHTTPClient().fetch(HTTPRequest(
+            "http://127.0.0.1:{}{}".format(app.get_worker_port(worker_id), self.request.uri),
+            method=self.request.method,
+            headers=headers,
+            body=self.request.body if self.request.method in ("POST", "PUT", "PATCH") else None,
+            follow_redirects=False,
+            allow_nonstandard_methods=True,
+            decompress_response=False,
+            request_timeout=0,
+            header_callback=on_header_line,
+            streaming_callback=on_chunk
+        ), raise_error=False)
+        if response.code == 599 and len(streamed) == 0:
+            app_log.error("Unable to forward request to worker %s: %s", worker_id, response.error)
+            raise web.HTTPError(502, u"Worker {} unavailable".format(worker_id))
+        self.finish()
+
+    @gen.coroutine
+    def notify_workers(self, path):
+        """
+        POST to the given path of the other workers so that they update their own state, e.g. the published
+        PixieApps. Returns the log messages of the workers
+        """
+        app = PixieGatewayApp.instance()
+        if app.worker_id is None:
+            raise gen.Return([])
+        worker_ids = [worker_id for worker_id in range(app.workers) if worker_id != app.worker_id]
+        responses = yield [AsyncHTTPClient().fetch(HTTPRequest(
+            "http://127.0.0.1:{}{}".format(app.get_worker_port(worker_id), path),
+            method="POST",
+            body="",
+            headers={BaseHandler.FORWARDED_HEADER: str(app.worker_id)},
+            request_timeout=0
+        ), raise_error=False) for worker_id in worker_ids]
+        log_messages = []
+        for worker_id, response in zip(worker_ids, responses):
+            if response.code == 200:
+                log_messages += json.loads(response.body.decode("utf-8"))
+            else:
+                app_log.error("Unable to notify worker %s of %s: %s", worker_id, path, response.error)
+                log_messages.append("Worker {} not updated: {}".format(worker_id, response.error))
+        raise gen.Return(log_messages)
+
+    def is_worker_request(self):
+        "True if the request was received on the private loopback port of the worker"
+        app = PixieGatewayApp.instance()
+        if app.worker_id is None:
+            return False
+        return self.request.connection.stream.socket.getsockname()[1] == app.get_worker_port(app.worker_id)
+
     def get_current_user(self):
         return self.get_secure_cookie("pd_user")
 
@@ -124,7 +263,27 @@ class BaseHandler(tornado.web.RequestHandler):
         self.set_header("Access-Control-Allow-Headers", "x-requested-with")
         self.set_header('Access-Control-Allow-Methods', 'POST, GET, OPTIONS')
 
+def watch_templates(interval=1000):
+    """
+    Development mode: reset the template cache whenever a template file changes on disk
+    """
+    template_dir = os.path.join(PACKAGE_TEMPLATE_PATH, "template")
+    def get_mtimes():
+        return {
+            os.path.join(root, name): os.path.getmtime(os.path.join(root, name))
+            for root, _, names in os.walk(template_dir) for name in names
+        }
+    mtimes = [get_mtimes()]
+    def check_templates():
+        current_mtimes = get_mtimes()
+        if current_mtimes != mtimes[0]:
+            mtimes[0] = current_mtimes
+            app_log.info("Templates changed on disk, resetting the template cache")
+            BaseHandler.reset_template_cache()
+    PeriodicCallback(check_templates, interval).start()
+
 from .adminHandlers import AdminHandler, StatsHandler, AdminCommandHandler
 from .handlers import (PixieDustHandler, PixieDustLogHandler, ExecuteCodeHandler, PixieAppHandler,
     PixieAppListHandler, PixieAppPublishHandler, ChartShareHandler,
-    ChartEmbedHandler, ChartsHandler, OEmbedChartHandler, LoginHandler)
\ No newline at end of file
+    ChartEmbedHandler, ChartsHandler, OEmbedChartHandler, LoginHandler, ChartsExportHandler, ChartsImportHandler,
+    AssetBundleHandler, OutputBlobHandler, WorkerSyncHandler)
\ No newline at end of file
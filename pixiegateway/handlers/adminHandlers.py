@@ -13,8 +13,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # -------------------------------------------------------------------------------
+import os
 from collections import OrderedDict, deque
 from six import iteritems, PY3
+from six.moves.urllib import parse
 import tornado
 from tornado import gen, web
 from tornado.util import import_object
@@ -54,6 +56,7 @@ class StatsHandler(BaseHandler):
 
 class AdminCommandHandler(BaseHandler):
     "Handles admin commands"
+    @gen.coroutine
     @tornado.web.authenticated
     def get(self, command):
         command_map = {
@@ -64,12 +67,14 @@ class AdminCommandHandler(BaseHandler):
         args = parts[1:]
         if command not in command_map:
             raise web.HTTPError(400, u'Unknown admin command: {}'.format(command))
-        command_map[command](*args)
+        yield gen.maybe_future(command_map[command](*args))
 
     @gen.coroutine
     def delete_app(self, appName):
         try:
             results = yield NotebookMgr.instance().delete_notebook_pixieapp(appName)
+            if results["status_code"] == 200:
+                results["messages"] += yield self.notify_workers("/workerSync/delete/{}".format(parse.quote(appName)))
             self.set_status(results["status_code"])
             self.write(results)
             self.flush()
@@ -81,14 +86,21 @@ class AdminHandler(BaseHandler):
     def fetch_logs(self):
         with open( PixieGatewayApp.instance().log_path) as log_file:
             return "\n".join(deque(log_file, 100))
+    def get_logs_version(self):
+        log_stat = os.stat(PixieGatewayApp.instance().log_path)
+        return (log_stat.st_size, log_stat.st_mtime)
     @tornado.web.authenticated
     def get(self, tab_id):
         tab_definitions = OrderedDict([
+            #cache_key returns the version of the state a tab depends on, its html is cached until the version changes
             ("apps", {"name": "PixieApps", "path": "admin/pixieappList.html", "description": "Published PixieApps",
-                      "args": lambda: {"pixieapp_list":NotebookMgr.instance().notebook_pixieapps()}}),
-            ("charts", {"name": "Charts", "path": "admin/chartsList.html", "description": "Shared Charts"}),
+                      "args": lambda: {"pixieapp_list":NotebookMgr.instance().notebook_pixieapps()},
+                      "cache_key": lambda: NotebookMgr.instance().version}),
+            ("charts", {"name": "Charts", "path": "admin/chartsList.html", "description": "Shared Charts",
+                        "cache_key": lambda: None}),
             ("stats", {
-                "default": {"name": "Kernel Stats", "path": "admin/adminStats.html", "description": "PixieGateway Statistics"},
+                "default": {"name": "Kernel Stats", "path": "admin/adminStats.html", "description": "PixieGateway Statistics",
+                            "cache_key": lambda: None},
                 "app": {
                     "name": "PixieApp Details", "path": "admin/pixieappDetails.html", 
                     "description": "PixieApp Details", "manager":"pixiegateway.admin.AppController"
@@ -100,7 +112,7 @@ class AdminHandler(BaseHandler):
             }
             ),
             ("logs", {"name": "Server Logs", "path": "admin/adminLogs.html", "description": "Server logs",
-                      "args": lambda: {"logs": self.fetch_logs()}})
+                      "args": lambda: {"logs": self.fetch_logs()}, "cache_key": self.get_logs_version})
         ])
         tab_id, content_definition = self.compute_tab_id(tab_definitions, tab_id or "apps")
         self.render(
@@ -17,8 +17,8 @@
 
 import traceback
 import json
+import os
 import re
-import base64
 import nbformat
 import tornado
 from tornado import gen, web
@@ -26,9 +26,15 @@ from tornado.log import app_log
 from six.moves.urllib import parse
 from pixiegateway.notebookMgr import NotebookMgr
 from pixiegateway.managedClient import ManagedClientPool
-from pixiegateway.chartsManager import SingletonChartStorage
-from pixiegateway.utils import sanitize_traceback
+from pixiegateway.chartsManager import SingletonChartStorage, ChartCache
+from pixiegateway.thumbnailStore import ThumbnailStore
+from pixiegateway.assetBundle import AssetBundle
+from pixiegateway.outputCache import OutputCache
+from pixiegateway.outputBlobStore import OutputBlobStore
+from pixiegateway.resultExtractor import TextOutputExtractor
+from pixiegateway.pixieGatewayApp import PixieGatewayApp
 from pixiegateway.handlers import BaseHandler
+from pixiegateway.exceptions import SearchNotSupportedError
 
 class TemplateDispatcherHandler(BaseHandler):
     """
@@ -59,6 +65,13 @@ Implement generic kernel code execution routine
     def initialize(self):
         self.output_json_error = True
 
+    def get_worker_hint(self):
+        #route on the run_id when it carries a worker hint, on the session otherwise
+        run_id = self.path_args[0] if len(self.path_args) > 0 else None
+        if PixieGatewayApp.instance().get_tagged_worker(run_id) is not None:
+            return run_id
+        return super(ExecuteCodeHandler, self).get_worker_hint()
+
     @gen.coroutine
     def post(self, *args, **kwargs):
         run_id = args[0]
@@ -68,7 +81,8 @@ Implement generic kernel code execution routine
             yield self.admin_mode_execute_code(managed_client)
         else:
             managed_client = yield self.session.get_managed_client_by_run_id(run_id)
-            yield self.execute_code(managed_client)
+            pixieapp_def = NotebookMgr.instance().get_notebook_pixieapp(self.session.run_pixieapps.get(run_id))
+            yield self.execute_code(managed_client, pixieapp_def)
 
     @gen.coroutine
     @tornado.web.authenticated
@@ -76,19 +90,41 @@ Implement generic kernel code execution routine
         yield self.execute_code(managed_client)
 
     @gen.coroutine
-    def execute_code(self, managed_client):
+    def execute_code(self, managed_client, pixieapp_def=None):
+        code = self.request.body.decode('utf-8')
+        output_cache = OutputCache.instance()
+        route = output_cache.get_route(pixieapp_def, code, self.session.namespace)
+        if route is not None:
+            #cached or coalesced with the identical requests in flight
+            try:
+                response = yield output_cache.fetch(
+                    route, managed_client.kernel_id, lambda: self.run_code(managed_client, code)
+                )
+                self.write(response)
+                self.finish()
+            except Exception as exc:
+                self._handle_request_exception(exc)
+            return
         with (yield managed_client.lock.acquire()):
             try:
-                response = yield managed_client.execute_code(self.request.body.decode('utf-8'))
+                response = yield managed_client.execute_code(code)
                 self.write(response)
                 self.finish()
             except Exception as exc:
                 self._handle_request_exception(exc)
 
+    @gen.coroutine
+    def run_code(self, managed_client, code):
+        with (yield managed_client.lock.acquire()):
+            raise gen.Return((yield managed_client.execute_code(code)))
+
 class PixieAppHandler(BaseHandler):
     """
-    Entry point for running a PixieApp
+    Entry point for running a PixieApp. The page head is flushed before the kernel runs the app
+    so that the browser loads the assets while the kernel works, the app body is streamed in afterwards
     """
+    PRELOAD_BUNDLES = [("pixieapp.js", "script"), ("pixiedust.css", "style")]
+
     @gen.coroutine
     def get(self, *args, **kwargs):
         clazz = args[0]
@@ -96,8 +132,23 @@ class PixieAppHandler(BaseHandler):
         #check the notebooks first
         pixieapp_def = NotebookMgr.instance().get_notebook_pixieapp(clazz)
         #validate app security
+        run_id = None
         if pixieapp_def is not None:
             pixieapp_def.validate_security(self)
+            #the cookies must be set before the page head is flushed with the response headers
+            run_id = self.session.get_pixieapp_run_id(self, pixieapp_def)
+        yield self.flush_page_head(pixieapp_def.title if pixieapp_def is not None else None)
+        #the status and the head are sent, errors are rendered in the page body
+        try:
+            yield self.run_app(clazz, pixieapp_def, run_id)
+        except Exception as exc:
+            app_log.error("Error running PixieApp %s: %s", clazz, exc)
+            self.write(self.get_html_error(exc))
+        self.write(self.render_string("/template/mainFoot.html"))
+        self.finish()
+
+    @gen.coroutine
+    def run_app(self, clazz, pixieapp_def, run_id):
         code = None
         managed_client = yield self.session.get_managed_client(self, pixieapp_def, True)
         if pixieapp_def is not None:
@@ -112,7 +163,7 @@ class PixieAppHandler(BaseHandler):
             print("path is {}".format(metadata))
             code = pixieapp_def.get_run_code(
                 self.session,
-                self.session.get_pixieapp_run_id(self, pixieapp_def),
+                run_id,
                 app_metadata = metadata
             )
         else:
@@ -128,45 +179,85 @@ clazz = "{clazz}"
 
 {instance_name} = my_import(clazz)()
 {instance_name}.run()
-            """.format(clazz=args[0], instance_name=instance_name)
+            """.format(clazz=clazz, instance_name=instance_name)
 
         with (yield managed_client.lock.acquire()):
-            response = yield managed_client.execute_code(code, self.result_extractor)
-            self.render("/template/main.html", response=response, title=pixieapp_def.title if pixieapp_def is not None else None)
-
-    def result_extractor(self, result_accumulator):
-        res = []
-        for msg in result_accumulator:
-            if msg['header']['msg_type'] == 'stream':
-                res.append(msg['content']['text'])
-            elif msg['header']['msg_type'] == 'display_data':
-                if "data" in msg['content'] and "text/html" in msg['content']['data']:
-                    res.append(msg['content']['data']['text/html'])
-                else:
-                    app_log.warning("display_data msg not processed: %s", msg)                    
-            elif msg['header']['msg_type'] == 'error':
-                error_name = msg['content']['ename']
-                error_value = msg['content']['evalue']
-                trace = sanitize_traceback(msg['content']['traceback'])
-                return 'Error {}: {}\n{}\n'.format(error_name, error_value, trace)
-            else:
-                app_log.warning("Message type not processed: %s", msg['header']['msg_type'])
-        return ''.join(res)
+            response = yield managed_client.execute_code(code, TextOutputExtractor())
+            self.write(response)
+
+    def flush_page_head(self, title):
+        asset_bundle = AssetBundle.instance()
+        for name, destination in PixieAppHandler.PRELOAD_BUNDLES:
+            self.add_header("Link", "<{}>; rel=preload; as={}".format(asset_bundle.get_url(name), destination))
+        self.write(self.render_string("/template/mainHead.html", title=title))
+        return self.flush()
+
+def write_asset_bundle(handler, bundle):
+    "Write the precompressed variant of the bundle accepted by the client"
+    accept_encoding = handler.request.headers.get("Accept-Encoding", "")
+    handler.set_header("Content-Type", bundle.content_type)
+    handler.set_header("Vary", "Accept-Encoding")
+    if bundle.brotli_content is not None and "br" in accept_encoding:
+        handler.set_header("Content-Encoding", "br")
+        handler.write(bundle.brotli_content)
+    elif "gzip" in accept_encoding:
+        handler.set_header("Content-Encoding", "gzip")
+        handler.write(bundle.gzipped_content)
+    else:
+        handler.write(bundle.content)
 
 class PixieDustHandler(BaseHandler):
-    "Handler for rest end point that returns pixiedust.js and pixiedust.css"
+    """
+    Handler for rest end point that returns pixiedust.js and pixiedust.css. Kept for the pages that don't use
+    the fingerprinted bundle urls, the client revalidates with the Etag
+    """
     def initialize(self, loadjs):
         self.loadjs = loadjs
 
     def get(self):
-        from pixiedust.display.display import Display
-        class PixieDustDisplay(Display):
-            def doRender(self, handlerId):
-                pass
-        self.set_header('Content-Type', 'text/javascript' if self.loadjs else 'text/css')
-        disp = PixieDustDisplay({"gateway":"true"}, None)
-        disp.callerText = "display(None)"
-        self.write(disp.renderTemplate("pixiedust.js" if self.loadjs else "pixiedust.css"))
+        bundle = AssetBundle.instance().get_bundle("pixiedust.js" if self.loadjs else "pixiedust.css")
+        self.set_header("Etag", '"{}"'.format(bundle.fingerprint))
+        self.set_header("Cache-Control", "no-cache")
+        if self.check_etag_header():
+            self.set_status(304)
+        else:
+            write_asset_bundle(self, bundle)
+        self.finish()
+
+class AssetBundleHandler(web.RequestHandler):
+    """
+    Serve the fingerprinted asset bundles. A bundle url changes with its content so it can be cached forever.
+    Like the static files, bundles don't need a session
+    """
+    def get(self, base_name, fingerprint, ext):
+        try:
+            bundle = AssetBundle.instance().get_bundle("{}.{}".format(base_name, ext))
+        except KeyError:
+            raise web.HTTPError(404)
+        if fingerprint == bundle.fingerprint:
+            self.set_header("Cache-Control", "public, max-age=31536000, immutable")
+        else:
+            #page rendered before an upgrade, the current bundle must not be cached under the old url
+            self.set_header("Cache-Control", "no-cache")
+        write_asset_bundle(self, bundle)
+        self.finish()
+
+class OutputBlobHandler(BaseHandler):
+    """
+    Serve the binary payloads extracted from the kernel outputs. Blob ids are content hashes so they can be cached forever
+    """
+    def get_worker_hint(self):
+        #blobs live in the memory of the worker that executed the code
+        return self.path_args[0] if len(self.path_args) > 0 else None
+
+    def get(self, blob_id):
+        blob = OutputBlobStore.instance().get(blob_id)
+        if blob is None:
+            raise web.HTTPError(404)
+        content_type, data = blob
+        self.set_header("Content-Type", content_type)
+        self.set_header("Cache-Control", "public, max-age=31536000, immutable")
+        self.write(data)
         self.finish()
 
 class PixieAppListHandler(BaseHandler):
@@ -180,6 +271,7 @@ class PixieAppPublishHandler(BaseHandler):
         try:
             notebook = nbformat.from_dict(json.loads(payload))
             pixieapp_model = yield NotebookMgr.instance().publish(name, notebook)
+            pixieapp_model["log"] += yield self.notify_workers("/workerSync/publish/{}".format(parse.quote(name)))
             if "url" in pixieapp_model:
                 server = self.request.protocol + "://" + self.request.host
                 pixieapp_model["url"] = server + pixieapp_model["url"]
@@ -190,12 +282,122 @@ class PixieAppPublishHandler(BaseHandler):
             app_log.error(traceback.print_exc())
             raise web.HTTPError(400, u'Publish PixieApp error: {}'.format(exc))
 
-class ChartShareHandler(BaseHandler):
+class WorkerSyncHandler(BaseHandler):
+    """
+    Applies the PixieApp changes made by another worker to the state of this worker,
+    only served on the private loopback port of the worker
+    """
+    @gen.coroutine
+    def post(self, command, name):
+        if not self.is_worker_request():
+            return self.send_error(404)
+        try:
+            if command == "publish":
+                log_messages = yield NotebookMgr.instance().reload_pixieapp(name)
+            elif NotebookMgr.instance().get_notebook_pixieapp(name) is None:
+                log_messages = ["PixieApp {} already deleted".format(name)]
+            else:
+                results = yield NotebookMgr.instance().delete_notebook_pixieapp(name, remove_file=False)
+                if results["status_code"] != 200:
+                    raise Exception(", ".join(results["messages"]))
+                log_messages = results["messages"]
+        except Exception as exc:
+            app_log.error("Unable to %s PixieApp %s: %s", command, name, exc)
+            return self.send_error(500)
+        self.write(json.dumps(log_messages))
+        self.finish()
+
+#Default size of the charts embedded through oEmbed
+OEMBED_WIDTH = 600
+OEMBED_HEIGHT = 400
+
+BOKEH_WIDTH_REGEX = re.compile(r'(("|\')plot_width("|\')\s*:\s*[0-9]+)')
+BOKEH_HEIGHT_REGEX = re.compile(r'(("|\')plot_height("|\')\s*:\s*[0-9]+)')
+MATPLOTLIB_STYLE_REGEX = re.compile(r'(<img.*)(?P<style_tag>style="[^"]+)([^<]*>)')
+
+class BaseChartHandler(BaseHandler):
+    """
+    Base class for the chart handlers, serves the rendered charts from the ChartCache
+    """
+    #embed sizes are rounded down to a multiple of this step so that close sizes share the same cached variant
+    EMBED_SIZE_STEP = 10
+    #smallest embed size, leaves room for the padding around the chart
+    EMBED_MIN_SIZE = 100
+    #embed sizes rendered when a chart is shared: plain embed and default oEmbed
+    EMBED_PRESETS = [(None, None), (OEMBED_WIDTH, OEMBED_HEIGHT)]
+
+    def get_embed_size(self, size):
+        "Round the requested embed size, raises a 400 HTTPError if it is not a number"
+        if not size:
+            return None
+        try:
+            size = int(size)
+        except ValueError:
+            raise web.HTTPError(400, "Invalid embed size: {}".format(size))
+        step = BaseChartHandler.EMBED_SIZE_STEP
+        return max(BaseChartHandler.EMBED_MIN_SIZE, size // step * step)
+
+    def render_embed(self, chart_model, width, height):
+        """
+        Render the chart resized to the given embed size, cache it and return the (etag, html) tuple
+        """
+        #the model is shared with the cache, work on a copy
+        chart_model = dict(chart_model)
+        if 'RENDERERID' in chart_model:
+            content = chart_model['CONTENT']
+            if chart_model['RENDERERID'] == 'bokeh':
+                if width:
+                    content = BOKEH_WIDTH_REGEX.sub('"plot_width":' + str(width - 25), content)
+                if height:
+                    content = BOKEH_HEIGHT_REGEX.sub('"plot_height":' + str(height - 40), content)
+            if chart_model['RENDERERID'] == 'matplotlib':
+                size = ';'
+                if width:
+                    size += 'width:' + str(width - 25) + 'px;'
+                if height:
+                    size += 'height:' + str(height - 40) + 'px;'
+                match = MATPLOTLIB_STYLE_REGEX.search(content)
+                if match and match.group('style_tag'):
+                    content = content.replace(match.group('style_tag'), match.group('style_tag') + size)
+            chart_model['CONTENT'] = content
+        return ChartCache.instance().set_render(
+            chart_model['CHARTID'], ("embed", width, height),
+            self.render_string("/template/embedChart.html", chart_model=chart_model)
+        )
+    def set_chart_cache_headers(self):
+        self.set_header("Cache-Control", "public, max-age={}".format(ChartCache.instance().max_age))
+
+    def write_chart_render(self, render):
+        """
+        Write a (etag, html, gzipped html) tuple obtained from the ChartCache, or a 304 if the client already has it.
+        The gzipped html is sent as is to the clients accepting it
+        """
+        etag, html, gzipped_html = render
+        self.set_header("Etag", etag)
+        self.set_header("Vary", "Accept-Encoding")
+        self.set_chart_cache_headers()
+        if self.check_etag_header():
+            self.set_status(304)
+        elif "gzip" in self.request.headers.get("Accept-Encoding", ""):
+            self.set_header("Content-Encoding", "gzip")
+            self.write(gzipped_html)
+        else:
+            self.write(html)
+        self.finish()
+
+    def write_chart_not_found(self, chart_id):
+        self.set_status(404)
+        self.write("Chart not found {}".format(chart_id))
+        self.finish()
+
+class ChartShareHandler(BaseChartHandler):
     @gen.coroutine
     def post(self, chart_id):
         payload = json.loads(self.request.body.decode('utf-8'))
         try:
-            chart_model = yield gen.maybe_future(SingletonChartStorage.instance().store_chart(payload))
+            chart_model = yield ChartCache.instance().store_chart(payload)
+            from pixiegateway.chartThumbnail import ThumbnailQueue
+            yield ThumbnailQueue.instance().enqueue(chart_model['CHARTID'])
             self.set_status(200)
             self.write(json.dumps(chart_model))
             self.finish()
@@ -203,57 +405,87 @@ class ChartShareHandler(BaseHandler):
             app_log.error(traceback.print_exc())
             raise web.HTTPError(400, u'Share Chart error: {}'.format(exc))
 
+        #the response is sent, render the usual embed sizes ahead of the first viewers
+        try:
+            for width, height in BaseChartHandler.EMBED_PRESETS:
+                self.render_embed(chart_model, width, height)
+        except Exception as exc:
+            app_log.warning("Unable to render the embed variants of chart %s: %s", chart_model['CHARTID'], exc)
+
     @gen.coroutine
     def get(self, chart_id):
-        chart_model = yield gen.maybe_future(SingletonChartStorage.instance().get_chart(chart_id))
+        if self.get_query_argument("format", "") == "thumbnail":
+            yield self.write_thumbnail(chart_id)
+            return
+
+        #the rendered page depends on the host it is served from
+        variant = ("share", self.request.protocol, self.request.host)
+        render = ChartCache.instance().get_render(chart_id, variant)
+        if render is not None:
+            self.write_chart_render(render)
+            return
+
+        chart_model = yield ChartCache.instance().get_chart(chart_id)
         if chart_model is None:
-            self.set_status(404)
-            self.write("Chart not found {}".format(chart_id))
-            self.finish()
+            self.write_chart_not_found(chart_id)
+            return
 
-        fmt = self.get_query_argument("format", "")
-        if fmt == "thumbnail":
-            thumbnail = chart_model.get("THUMBNAIL", None)
-            if thumbnail is None:
-                from pixiegateway.chartThumbnail import Thumbnail
-                thumbnail = yield Thumbnail.instance().get_screenshot_as_png(chart_model)
-            else:
-                thumbnail = base64.b64decode(thumbnail)
-            self.set_header('Content-Type', 'image/png')
-            self.write(thumbnail)
+        self.write_chart_render(ChartCache.instance().set_render(
+            chart_id, variant, self.render_string("/template/showChart.html", chart_model=chart_model)
+        ))
+
+    @gen.coroutine
+    def write_thumbnail(self, chart_id):
+        """
+        Stream the thumbnail file of the requested size from the ThumbnailStore, generating it first if needed.
+        The transfer is delegated to the front-end server when a sendfile header is configured
+        """
+        store = ThumbnailStore.instance()
+        size = self.get_query_argument("size", store.default_size)
+        if size not in ThumbnailStore.SIZES:
+            self.set_status(400)
+            self.write("Invalid thumbnail size {}, expected one of {}".format(size, ", ".join(sorted(ThumbnailStore.SIZES))))
             self.finish()
+            return
+        try:
+            path = store.get_path(chart_id, size)
+        except ValueError:
+            self.write_chart_not_found(chart_id)
+            return
+        if not os.path.isfile(path):
+            from pixiegateway.chartThumbnail import Thumbnail
+            found = yield Thumbnail.instance().generate_thumbnail(chart_id)
+            if not found:
+                self.write_chart_not_found(chart_id)
+                return
+
+        stat = os.stat(path)
+        self.set_header('Content-Type', 'image/png')
+        self.set_header("Etag", '"{:x}-{:x}"'.format(int(stat.st_mtime), stat.st_size))
+        self.set_chart_cache_headers()
+        if self.check_etag_header():
+            self.set_status(304)
+        elif store.sendfile_header:
+            self.set_header(store.sendfile_header, store.get_sendfile_value(path))
         else:
-            self.render("/template/showChart.html", chart_model=chart_model)
+            self.set_header("Content-Length", stat.st_size)
+            for chunk in web.StaticFileHandler.get_content(path):
+                self.write(chunk)
+                yield self.flush()
+        self.finish()
 
-class ChartEmbedHandler(BaseHandler):
+class ChartEmbedHandler(BaseChartHandler):
     @gen.coroutine
     def get(self, chart_id, width, height):
-        chart_model = yield gen.maybe_future(SingletonChartStorage.instance().get_chart(chart_id))
-        if chart_model is not None:
-            if 'RENDERERID' in chart_model:
-                content = chart_model['CONTENT']
-                if chart_model['RENDERERID'] == 'bokeh':
-                    if width:
-                        regex = re.compile('(("|\')plot_width("|\')\s*:\s*[0-9]+)')
-                        content = re.sub(regex, '"plot_width":' + str(int(width) - 25), content)
-                    if height:
-                        regex = re.compile('(("|\')plot_height("|\')\s*:\s*[0-9]+)')
-                        content = re.sub(regex, '"plot_height":' + str(int(height) - 40), content)
-                if chart_model['RENDERERID'] == 'matplotlib':
-                    size = ';'
-                    if width:
-                        size += 'width:' + str(int(width) - 25) + 'px;'
-                    if height:
-                        size += 'height:' + str(int(height) - 40) + 'px;'
-                    regex = re.search('(<img.*)(?P<style_tag>style="[^"]+)([^<]*>)', content)
-                    if regex and regex.group('style_tag'):
-                        content = content.replace(regex.group('style_tag'), regex.group('style_tag') + size)
-                chart_model['CONTENT'] = content
-            self.render("/template/embedChart.html", chart_model=chart_model)
-        else:
-            self.set_status(404)
-            self.write("Chart not found")
-            self.finish()
+        width, height = self.get_embed_size(width), self.get_embed_size(height)
+        render = ChartCache.instance().get_render(chart_id, ("embed", width, height))
+        if render is None:
+            chart_model = yield ChartCache.instance().get_chart(chart_id)
+            if chart_model is None:
+                self.write_chart_not_found(chart_id)
+                return
+            render = self.render_embed(chart_model, width, height)
+        self.write_chart_render(render)
 
 class OEmbedChartHandler(BaseHandler):
     def get(self):
@@ -264,8 +496,8 @@ class OEmbedChartHandler(BaseHandler):
             self.set_status(404)
             return self.write("Invalid url {}".format(url))
         chartid = match.group('chartid')
-        width = 600
-        height = 400
+        width = OEMBED_WIDTH
+        height = OEMBED_HEIGHT
         height_ratio = min(int(self.get_query_argument("maxheight", height)), height)/height
         width_ratio = min(int(self.get_query_argument("maxwidth", width)), width)/width
 
@@ -294,10 +526,80 @@ class OEmbedChartHandler(BaseHandler):
 class ChartsHandler(BaseHandler):
     @gen.coroutine
     def get(self, page_num=0, page_size=10):
-        payload = yield gen.maybe_future(SingletonChartStorage.instance().get_charts(int(page_num), int(page_size)))
+        cursor = self.get_query_argument("cursor", None) or None
+        query = self.get_query_argument("q", "").strip()
+        chart_storage = SingletonChartStorage.instance()
+        try:
+            if query:
+                payload = yield gen.maybe_future(chart_storage.search_charts(
+                    query, int(page_num or 0), int(page_size or 10), cursor=cursor
+                ))
+            else:
+                payload = yield gen.maybe_future(chart_storage.get_charts(
+                    int(page_num or 0), int(page_size or 10), cursor=cursor
+                ))
+        except (ValueError, SearchNotSupportedError) as exc:
+            self.set_status(400)
+            payload = "Invalid charts request: {}".format(exc)
         self.write(payload)
         self.finish()
 
+class ChartsExportHandler(BaseHandler):
+    """
+    Stream all the charts as NDJSON, resume an interrupted export with the last next_cursor received
+    """
+    @gen.coroutine
+    @tornado.web.authenticated
+    def get(self):
+        self.set_header('Content-Type', 'application/x-ndjson')
+        self.set_header('Content-Disposition', 'attachment; filename="charts.ndjson"')
+        @gen.coroutine
+        def write(line):
+            self.write(line)
+            yield self.flush()
+        from pixiegateway.chartsMigration import export_charts
+        try:
+            yield export_charts(
+                SingletonChartStorage.instance(), write,
+                cursor=self.get_query_argument("cursor", None) or None,
+                include_thumbnails=self.get_query_argument("thumbnails", "true") == "true"
+            )
+        except ValueError as exc:
+            #nothing is written before the first page is read
+            self.set_status(400)
+            self.write("Invalid export request: {}".format(exc))
+        self.finish()
+
+@web.stream_request_body
+class ChartsImportHandler(BaseHandler):
+    """
+    Import the charts of an NDJSON export streamed in the request body, charts already present are skipped
+    """
+    def get_worker_hint(self):
+        #streamed bodies can't be forwarded, any worker can import
+        return None
+
+    @gen.coroutine
+    @tornado.web.authenticated
+    def prepare(self):
+        yield super(ChartsImportHandler, self).prepare()
+        from pixiegateway.chartsMigration import ChartImporter
+        self.importer = ChartImporter(SingletonChartStorage.instance())
+
+    def data_received(self, chunk):
+        return self.importer.feed(chunk)
+
+    @gen.coroutine
+    def post(self):
+        yield self.importer.close()
+        self.write({"imported": self.importer.imported_count, "skipped": self.importer.skipped_count})
+        self.finish()
+
+class LogOutputExtractor(TextOutputExtractor):
+    "PixieDust log lines formatted as html"
+    def format(self, outputs):
+        return '<br/>'.join([w.replace('\n', '<br/>') for w in outputs])
+
 class PixieDustLogHandler(BaseHandler):
     """
     Access the PixieDust Logs
@@ -314,25 +616,9 @@ import pixiedust
         managed_client = yield ManagedClientPool.instance().get()
         with (yield managed_client.lock.acquire()):
             try:
-                response = yield managed_client.execute_code(code, self.result_extractor)
+                response = yield managed_client.execute_code(code, LogOutputExtractor())
                 self.write(response)
             except:
                 traceback.print_exc()
             finally:
-                self.finish()
-
-    def result_extractor(self, result_accumulator):
-        res = []
-        for msg in result_accumulator:
-            if msg['header']['msg_type'] == 'stream':
-                res.append( msg['content']['text'])
-            elif msg['header']['msg_type'] == 'display_data':
-                if "data" in msg['content'] and "text/html" in msg['content']['data']:
-                    res.append( msg['content']['data']['text/html'] )                    
-            elif msg['header']['msg_type'] == 'error':
-                error_name = msg['content']['ename']
-                error_value = msg['content']['evalue']
-                trace = sanitize_traceback(msg['content']['traceback'])
-                return 'Error {}: {}\n{}\n'.format(error_name, error_value, trace)
-
-        return '<br/>'.join([w.replace('\n', '<br/>') for w in res])
\ No newline at end of file
+                self.finish()
\ No newline at end of file
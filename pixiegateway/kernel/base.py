@@ -85,6 +85,12 @@ class BaseKernelManager(with_metaclass(ABCMeta)):
         """
         pass
 
+    def close(self):
+        """
+        Release the resources of the manager once all the kernels are shut down
+        """
+        pass
+
     def register_execute_future(self, kernel_handle, future):
         """
         registers a code execution future for notification in case the kernel dies
@@ -0,0 +1,234 @@
+# -------------------------------------------------------------------------------
+# Copyright IBM Corp. 2017
+# 
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+# http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -------------------------------------------------------------------------------
+"""
+Fork server of the local kernels, Linux only. It is run as a script so that it doesn't import the gateway.
+
+    serve: template process, preloads the modules used by the kernels then forks a kernel for each launch request
+    launch: command of the fork server kernel spec. Asks the template for a kernel started with the ipykernel
+            arguments that follow --, forwards the signals it receives to it and exits with it
+
+The launcher passes its stdin, stdout and stderr to the kernel. A kernel whose launcher is killed is killed too.
+The template reads the launch requests one at a time, a launcher that doesn't send its request in time is dropped
+"""
+from __future__ import print_function
+import argparse
+import array
+import importlib
+import json
+import os
+import select
+import signal
+import socket
+import sys
+import time
+import traceback
+
+FORWARDED_SIGNALS = [signal.SIGINT, signal.SIGTERM, signal.SIGHUP, signal.SIGQUIT, signal.SIGUSR1, signal.SIGUSR2]
+
+def send_json(sock, payload):
+    sock.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+
+def read_json_line(reader):
+    "Read a json line from the socket file, None if the socket is closed before"
+    line = reader.readline()
+    return json.loads(line.decode("utf-8")) if line.endswith(b"\n") else None
+
+def exit_code(status):
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+def receive_fds(conn, count):
+    fds = array.array("i")
+    _, ancdata, _, _ = conn.recvmsg(1, socket.CMSG_LEN(count * fds.itemsize))
+    for level, msg_type, data in ancdata:
+        if level == socket.SOL_SOCKET and msg_type == socket.SCM_RIGHTS:
+            fds.frombytes(data[:len(data) - (len(data) % fds.itemsize)])
+    return list(fds)
+
+def read_request(conn, timeout):
+    "Return the (request, fds) sent by a launcher, request is None if it isn't received within timeout seconds"
+    conn.settimeout(timeout)
+    fds = []
+    try:
+        fds = receive_fds(conn, 3)
+        #the launcher sends nothing after its request, no data is left in the reader buffer
+        with conn.makefile("rb") as reader:
+            request = read_json_line(reader)
+    except (OSError, ValueError):
+        request = None
+    conn.settimeout(None)
+    return request, fds
+
+def run_kernel(request, fds):
+    "Body of the forked kernel process, never returns"
+    code = 1
+    try:
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+            os.close(fd)
+        os.environ.clear()
+        os.environ.update(request["env"])
+        os.chdir(request["cwd"])
+        sys.path[0:0] = [request["cwd"]]
+        for signum in FORWARDED_SIGNALS:
+            signal.signal(signum, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        #the random module is reseeded at fork, numpy isn't
+        if "numpy" in sys.modules:
+            sys.modules["numpy"].random.seed()
+        #matplotlib read its backend from the template environment, use the one ipykernel would have set
+        if "matplotlib" in sys.modules:
+            sys.modules["matplotlib"].rcParams["backend"] = os.environ.setdefault(
+                "MPLBACKEND", "module://matplotlib_inline.backend_inline"
+            )
+        sys.argv = ["ipykernel_launcher"] + request["argv"]
+        from ipykernel import kernelapp
+        kernelapp.launch_new_instance()
+        code = 0
+    except SystemExit as exc:
+        code = exc.code if isinstance(exc.code, int) else 0 if exc.code is None else 1
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+def serve(socket_path, preload_modules, request_timeout):
+    #don't shadow the preloaded modules with the modules of this directory
+    if sys.path[0] == os.path.dirname(os.path.abspath(__file__)):
+        del sys.path[0]
+    for module_name in preload_modules:
+        try:
+            importlib.import_module(module_name)
+        except Exception as exc:
+            print("Unable to preload {}: {}".format(module_name, exc), file=sys.stderr)
+
+    parent_pid = os.getppid()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path + ".tmp")
+    #the launchers wait for the socket to exist, only expose it once it is listening
+    server.listen(16)
+    os.rename(socket_path + ".tmp", socket_path)
+
+    #launcher connection -> kernel pid
+    kernels = {}
+    while os.getppid() == parent_pid:
+        readable, _, _ = select.select([server] + list(kernels), [], [], 0.5)
+        for sock in readable:
+            if sock is server:
+                conn, _ = server.accept()
+                request, fds = read_request(conn, request_timeout)
+                if request is None:
+                    for fd in fds:
+                        os.close(fd)
+                    conn.close()
+                    continue
+                pid = os.fork()
+                if pid == 0:
+                    server.close()
+                    conn.close()
+                    for other in kernels:
+                        other.close()
+                    run_kernel(request, fds)
+                for fd in fds:
+                    os.close(fd)
+                send_json(conn, {"pid": pid})
+                kernels[conn] = pid
+            elif not sock.recv(1024):
+                #the launcher is gone, its kernel goes with it
+                try:
+                    os.kill(kernels.pop(sock), signal.SIGKILL)
+                except OSError:
+                    pass
+                sock.close()
+
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except OSError:
+                break
+            if pid == 0:
+                break
+            for conn, kernel_pid in list(kernels.items()):
+                if kernel_pid == pid:
+                    del kernels[conn]
+                    try:
+                        send_json(conn, {"exit_code": exit_code(status)})
+                    except OSError:
+                        pass
+                    conn.close()
+
+def connect(socket_path, timeout):
+    "Connect to the fork server, waiting for the template to be ready"
+    deadline = time.time() + timeout
+    while True:
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(socket_path)
+            return sock
+        except OSError:
+            sock.close()
+            if time.time() > deadline:
+                raise
+            time.sleep(0.05)
+
+def launch(socket_path, argv, timeout):
+    sock = connect(socket_path, timeout)
+    sock.sendmsg([b"\0"], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", [0, 1, 2]))])
+    send_json(sock, {"argv": argv, "env": dict(os.environ), "cwd": os.getcwd()})
+    reader = sock.makefile("rb")
+    pid = read_json_line(reader)["pid"]
+
+    def forward(signum, frame):
+        try:
+            os.kill(pid, signum)
+        except OSError:
+            pass
+    for signum in FORWARDED_SIGNALS:
+        signal.signal(signum, forward)
+
+    #blocks until the kernel exits
+    reply = read_json_line(reader)
+    return reply["exit_code"] if reply is not None else 1
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fork server of the local kernels")
+    subparsers = parser.add_subparsers(dest="command")
+    serve_parser = subparsers.add_parser("serve", help="Run the template process")
+    serve_parser.add_argument("--socket", required=True, help="Unix socket of the fork server")
+    serve_parser.add_argument("--preload", default="", help="Comma separated modules imported by the template")
+    serve_parser.add_argument("--request-timeout", type=float, default=5, help="Max time in seconds to read a launch request")
+    launch_parser = subparsers.add_parser("launch", help="Start a kernel forked from the template")
+    launch_parser.add_argument("--socket", required=True, help="Unix socket of the fork server")
+    launch_parser.add_argument("--timeout", type=float, default=60, help="Max time in seconds to wait for the template")
+    launch_parser.add_argument("kernel_args", nargs=argparse.REMAINDER, help="ipykernel arguments, after --")
+
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        serve(args.socket, [name for name in args.preload.split(",") if name], args.request_timeout)
+        return 0
+    if args.command == "launch":
+        kernel_args = args.kernel_args[1:] if args.kernel_args[:1] == ["--"] else args.kernel_args
+        return launch(args.socket, kernel_args, args.timeout)
+    parser.print_help()
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,27 +13,89 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # -------------------------------------------------------------------------------
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
 from collections import namedtuple
+from datetime import timedelta
 from tornado import gen
+from tornado.concurrent import Future
+from tornado.ioloop import IOLoop
+from tornado.log import app_log
 from .base import BaseKernelManager, BaseKernelInfo
 
+FORK_SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "forkServer.py")
+
+def fork_server_supported():
+    "The fork server passes file descriptors over unix sockets with the Python 3 socket API"
+    return sys.platform.startswith("linux") and sys.version_info[0] >= 3
+
 class KernelInfo(BaseKernelInfo):
     def __init__(self):
         super(KernelInfo, self).__init__()
 
+class ForkServer(object):
+    """
+    Template process with the kernel modules preloaded, the kernels of its kernel spec are forked from it
+    instead of starting a new interpreter. See forkServer.py.
+    The kernel spec is internal: it is only used for the default kernel and hidden from the kernel spec listings
+    """
+    KERNEL_NAME = "pixiegateway_forkserver"
+
+    def __init__(self, kernel_spec_manager, preload_modules):
+        #private directory holding the socket and the kernel spec
+        self.work_dir = tempfile.mkdtemp(prefix="pixiegateway-forkserver-")
+        self.socket_path = os.path.join(self.work_dir, "server.sock")
+        kernels_dir = os.path.join(self.work_dir, "kernels")
+        os.makedirs(os.path.join(kernels_dir, ForkServer.KERNEL_NAME))
+        with open(os.path.join(kernels_dir, ForkServer.KERNEL_NAME, "kernel.json"), "w") as kernel_file:
+            json.dump({
+                "argv": [
+                    sys.executable, FORK_SERVER_SCRIPT, "launch", "--socket", self.socket_path,
+                    "--", "-f", "{connection_file}"
+                ],
+                "display_name": "Python {} (fork server)".format(sys.version_info[0]),
+                "language": "python",
+                "interrupt_mode": "signal"
+            }, kernel_file)
+        kernel_spec_manager.kernel_dirs.append(kernels_dir)
+        self.process = subprocess.Popen(
+            [sys.executable, FORK_SERVER_SCRIPT, "serve", "--socket", self.socket_path, "--preload", ",".join(preload_modules)],
+            start_new_session=True
+        )
+        app_log.info("Started kernel fork server with pid %s, preloading %s", self.process.pid, preload_modules)
+
+    def stop(self):
+        self.process.terminate()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
 class LocalKernelManager(BaseKernelManager):
     "Manager for local kernels"
-    def __init__(self, kernel_manager):
+    def __init__(self, kernel_manager, ready_timeout=60, fork_server_preload=None):
         self.kernel_manager = kernel_manager
+        self.ready_timeout = ready_timeout
+        #kernels of the default kernel spec are forked from a template process when enabled
+        self.fork_server = None
+        if fork_server_preload is not None:
+            if fork_server_supported():
+                self.fork_server = ForkServer(kernel_manager.kernel_spec_manager, fork_server_preload)
+            else:
+                app_log.warning("The kernel fork server is only supported on Linux with Python 3, kernels are started normally")
 
     @gen.coroutine
     def start_kernel(self, kernel_name, iopub_handler=None, **kwargs):
         on_success = kwargs.pop("on_success", None)
         on_failure = kwargs.pop("on_failure", None)
+        if self.fork_server is not None and kernel_name in (None, self.kernel_manager.default_kernel_name):
+            kernel_name = ForkServer.KERNEL_NAME
         try:
             kernel_id = yield self.kernel_manager.start_kernel(kernel_name=kernel_name, **kwargs)
             kernel_handle = self._get_kernel_handle(kernel_id)
             kernel_handle.kernel_info.log("kernel_Id is: {}".format(kernel_id))
+            yield self.wait_for_ready(kernel_handle)
             kernel_handle.kernel_info.log("kernel client successfully initialized")
 
             if iopub_handler is not None:
@@ -51,6 +113,35 @@ class LocalKernelManager(BaseKernelManager):
         else:
             raise gen.Return(kernel_handle)
 
+    @gen.coroutine
+    def wait_for_ready(self, kernel_handle):
+        """
+        Wait for the kernel to answer a kernel_info request on its shell channel. Unlike the kernel client
+        wait_for_ready, the IOLoop keeps serving the other requests, and starting the other kernels, meanwhile
+        """
+        session = kernel_handle.session
+        shell = self.kernel_manager.connect_shell(kernel_handle.kernel_id)
+        ready = Future()
+        def on_reply(msg_list):
+            _, msg_list = session.feed_identities(msg_list)
+            if session.deserialize(msg_list)['msg_type'] == 'kernel_info_reply' and not ready.done():
+                ready.set_result(True)
+        shell.on_recv(on_reply)
+        deadline = IOLoop.current().time() + self.ready_timeout
+        try:
+            while not ready.done():
+                #requests sent before the kernel listens are lost, send them until one is answered
+                session.send(shell, "kernel_info_request")
+                try:
+                    yield gen.with_timeout(timedelta(seconds=1), ready)
+                except gen.TimeoutError:
+                    if IOLoop.current().time() > deadline:
+                        raise RuntimeError("Kernel {} not ready after {} seconds".format(
+                            kernel_handle.kernel_id, self.ready_timeout
+                        ))
+        finally:
+            shell.close()
+
     def get_kernel_execution_state(self, kernel_handle):
         return BaseKernelManager.KernelExecutionState(
             kernel_handle.kernel_info.state,
@@ -66,9 +157,8 @@ class LocalKernelManager(BaseKernelManager):
             key=kernel.session.key
         )
 
-        # Start channels and wait for ready
+        #readiness is awaited asynchronously by wait_for_ready
         kernel_client.start_channels()
-        kernel_client.wait_for_ready()
 
         session = type(kernel_client.session)(
             config=kernel_client.session.config,
@@ -85,10 +175,15 @@ class LocalKernelManager(BaseKernelManager):
         return kernel_handle.kernel.kernel_spec.to_dict()
 
     def get_kernel_name(self, kernel_handle):
+        #forked kernels stand for the default kernel, e.g. when they are restarted
+        if kernel_handle.kernel.kernel_name == ForkServer.KERNEL_NAME:
+            return self.kernel_manager.default_kernel_name
         return kernel_handle.kernel.kernel_name
 
     def list_kernel_specs(self):
-        return self.kernel_manager.kernel_spec_manager.get_all_specs()
+        specs = self.kernel_manager.kernel_spec_manager.get_all_specs()
+        specs.pop(ForkServer.KERNEL_NAME, None)
+        return specs
 
     def execute(self, kernel_handle, code, silent=False, store_history=True,
                 user_expressions=None, allow_stdin=False,
@@ -101,3 +196,7 @@ class LocalKernelManager(BaseKernelManager):
             kernel_handle.kernel_info.log("Shutting down kernel")
             kernel_handle.kernel_client.stop_channels()
             self.kernel_manager.shutdown_kernel(kernel_handle.kernel_id, now=True)
+
+    def close(self):
+        if self.fork_server is not None:
+            self.fork_server.stop()
@@ -17,6 +17,7 @@ import base64
 import traceback
 import os
 import json
+import struct
 from uuid import uuid4
 from collections import namedtuple
 from six import string_types
@@ -33,6 +34,21 @@ from .base import BaseKernelManager, BaseKernelInfo
 import ssl
 ssl.match_hostname = lambda cert, hostname: True
 
+def deserialize_binary_message(bmsg):
+    """
+    Deserialize a message sent in a binary websocket frame, used by the kernel gateway for the messages with buffers:
+    the number of frames, their offsets, then the frames. The first frame is the json message, the others its buffers.
+    The buffers are memoryview slices of the frame, they are not copied
+    """
+    nbufs = struct.unpack('!i', bmsg[:4])[0]
+    offsets = list(struct.unpack('!' + 'I' * nbufs, bmsg[4:4 * (nbufs + 1)]))
+    offsets.append(None)
+    frames = memoryview(bmsg)
+    bufs = [frames[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+    msg = json.loads(bufs[0].tobytes().decode("utf-8"))
+    msg["buffers"] = bufs[1:]
+    return msg
+
 class KernelInfo(BaseKernelInfo):
     def __init__(self, future):
         super(KernelInfo, self).__init__()
@@ -68,13 +84,14 @@ class RemoteKernelManager(BaseKernelManager):
     """
     Manager for remote kernels
     """
-    def __init__(self, config):
+    def __init__(self, config, delete_existing_kernels=True):
         app_log.info("Remote gateway config is: %s", config)
         self.config = config
         self.http_client = AsyncHTTPClient()
 
         #Delete any existing kernels
-        self._delete_existing_kernels()
+        if delete_existing_kernels:
+            self._delete_existing_kernels()
 
     @gen.coroutine
     def _delete_existing_kernels(self):
@@ -92,7 +109,12 @@ class RemoteKernelManager(BaseKernelManager):
         def message_callback(message):
             app_log.debug("got a message %s", message)
             try:
-                msg = json.loads(message) if message is not None else None
+                if message is None:
+                    msg = None
+                elif isinstance(message, bytes):
+                    msg = deserialize_binary_message(message)
+                else:
+                    msg = json.loads(message)
                 if msg is None or self.is_kernel_dead(msg):
                     ws_conn = kernel_handle.kernel_info.ws_conn
                     kernel_handle.kernel_info.retries = kernel_handle.kernel_info.retries + 1
@@ -14,33 +14,87 @@
 # limitations under the License.
 # -------------------------------------------------------------------------------
 import json
-from datetime import datetime, timedelta
+import os
+from datetime import timedelta
 from time import time
 from six import iteritems
 from tornado import locks, gen
 from tornado.log import app_log
 from tornado.concurrent import Future
 from traitlets.config.configurable import SingletonConfigurable
-from traitlets import Dict, default
+from traitlets import Dict, Integer, Bool, List, Unicode, default
 from .kernel import LocalKernelManager, RemoteKernelManager
 from .pixieGatewayApp import PixieGatewayApp
-from .utils import sanitize_traceback
+from .resultExtractor import ResultExtractor, MessageListExtractor, TextOutputExtractor, JSONMessagesExtractor
+from .utils import sanitize_traceback, LRUCache
 from .exceptions import CodeExecutionError
 
+#Fingerprint of the kernel python environment, changes when packages are installed or removed.
+#The snippets run in the user namespace of the kernel, they leave no names behind
+ENVIRONMENT_FINGERPRINT_CODE = """
+def pd_environment_fingerprint():
+    import hashlib
+    import json
+    import os
+    import sys
+    print(json.dumps({"environment": hashlib.sha1(json.dumps(
+        [sys.executable] + [[path, os.stat(path).st_mtime] for path in sys.path if os.path.isdir(path)]
+    ).encode("utf-8")).hexdigest()}))
+pd_environment_fingerprint()
+del pd_environment_fingerprint
+"""
+
+INSTALLED_MODULES_CODE = """
+def pd_query_installed_modules(names):
+    import json
+    try:
+        from importlib.metadata import distribution, PackageNotFoundError
+    except ImportError:
+        from pkg_resources import get_distribution as distribution, DistributionNotFound as PackageNotFoundError
+    def is_installed(name):
+        for candidate in [name, name.replace("-","_"), name.replace("_","-")]:
+            try:
+                distribution(candidate)
+                return True
+            except PackageNotFoundError:
+                pass
+        return False
+    print(json.dumps({{"installed_modules": {{name: is_installed(name) for name in names}}}}))
+pd_query_installed_modules({})
+del pd_query_installed_modules
+"""
+
+def parse_json_output(output, key):
+    "Return the value of the key in the first JSON dictionary printed on its own line, None if not found"
+    for line in output.splitlines():
+        try:
+            val = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(val, dict) and key in val:
+            return val[key]
+    return None
+
 class ManagedClient(object):
     """
     Managed access to a kernel client
     """
+
+    #(kernel name, environment fingerprint) -> {module name: installed}, shared by the clients and kept across restarts
+    installed_modules_cache = LRUCache(32, sizeof=lambda installed_modules: 1)
+
     def __init__(self, kernel_manager, kernel_name=None):
         self.kernel_manager = kernel_manager
         self.kernel_name = kernel_name
         self.start_exception = None
         self.current_iopub_handler = None
-        self.installed_modules = []
+        self.installed_modules = {}
         self.app_stats = None
         self.run_stats = None
         self.lock = locks.Lock()
         self.kernel_handle = None
+        #Future of the kernel start in progress
+        self.starting = None
 
     def get_app_stats(self, pixieapp_def, stat_name = None):
         name = pixieapp_def.name
@@ -81,6 +135,12 @@ class ManagedClient(object):
             on_failure=on_failure
         ))
 
+    @gen.coroutine
+    def wait_started(self):
+        "Wait for the kernel if it is being started by another request, the other clients start concurrently"
+        if self.starting is not None and not self.starting.done():
+            yield self.starting
+
     def iopub_handler(self, msg):
         if msg['header']['msg_type'] == 'status':
             self.run_stats.update_status(msg['content']['execution_state'])
@@ -103,7 +163,6 @@ class ManagedClient(object):
             future = self.execute_code(
                 """
 import pixiedust
-import pkg_resources
 import json
 from pixiedust.display.app import pixieapp
 class Customizer():
@@ -113,25 +172,23 @@ class Customizer():
         options.update( {'cell_id': 'dummy', 'showchrome':'false', 'gateway':self.gateway})
         options.update( {'nostore_pixiedust': 'true', 'runInDialog': 'false'})
 pixieapp.pixieAppRunCustomizer = Customizer()
-print(json.dumps( {"installed_modules": list(pkg_resources.AvailableDistributions())} ))
-            """,
-                lambda acc: json.dumps([msg['content']['text'] for msg in acc if msg['header']['msg_type'] == 'stream'], default=self._date_json_serializer),
+            """ + ENVIRONMENT_FINGERPRINT_CODE,
+                TextOutputExtractor(msg_types=["stream"], max_size=0),
                 timeout=30
             )
 
             def done(fut):
                 if fut.exception():
                     return app_log.error("Unexcepted exception %s", fut.exception())
-                results = json.loads(fut.result())
-                for result in results:
-                    try:
-                        val = json.loads(result)
-                        if isinstance(val, dict) and "installed_modules" in val:
-                            self.installed_modules = val["installed_modules"]
-                            break
-                    except:
-                        pass
-                app_log.debug("Installed modules %s", self.installed_modules)
+                key = (self.run_stats["kernel_name"], parse_json_output(fut.result(), "environment"))
+                if key[1] is None:
+                    app_log.warning("Unable to fingerprint the kernel environment, installed modules are not cached")
+                    self.installed_modules = {}
+                    return
+                if key not in ManagedClient.installed_modules_cache:
+                    ManagedClient.installed_modules_cache.set(key, {})
+                self.installed_modules = ManagedClient.installed_modules_cache.get(key)
+                app_log.debug("Kernel environment %s, known modules %s", key, self.installed_modules)
             future.add_done_callback(done)
             yield future
 
@@ -142,15 +199,29 @@ print(json.dumps( {"installed_modules": list(pkg_resources.AvailableDistribution
     def shutdown(self):
         self.kernel_manager.shutdown(self.kernel_handle)
 
+    @gen.coroutine
+    def query_installed_modules(self, names):
+        "Look up in the kernel whether the modules that are not known yet for its environment are installed"
+        names = [name for name in names if name not in self.installed_modules]
+        if len(names) > 0:
+            with (yield self.lock.acquire()):
+                output = yield self.execute_code(
+                    INSTALLED_MODULES_CODE.format(json.dumps(names)), TextOutputExtractor(msg_types=["stream"], max_size=0)
+                )
+            self.installed_modules.update(parse_json_output(output, "installed_modules") or {})
+        raise gen.Return(self.installed_modules)
+
     @gen.coroutine
     def install_dependencies(self, pixieapp_def, log_messages):
         restart = False
-        for dep, info in [ (d,i) for d,i in iteritems(pixieapp_def.deps) if not any(a for a in [d,d.replace("-","_"),d.replace("_","-")] if a in self.installed_modules)]:
+        installed_modules = yield self.query_installed_modules(list(pixieapp_def.deps))
+        for dep, info in [ (d,i) for d,i in iteritems(pixieapp_def.deps) if not installed_modules.get(d)]:
             log_messages.append("Installing module: {} from {}".format(dep, info))
             pip_dep = dep
             if info.get("install", None) is not None:
                 pip_dep = info.get("install")
-            yield self.execute_code("!pip install {}".format(pip_dep))
+            with (yield self.lock.acquire()):
+                yield self.execute_code("!pip install {}".format(pip_dep))
             restart = True
         raise gen.Return(restart)
 
@@ -173,17 +244,9 @@ print(json.dumps( {"installed_modules": list(pkg_resources.AvailableDistribution
     def restart(self):
         with (yield self.lock.acquire()):
             yield gen.maybe_future(self.shutdown())
-            self.installed_modules = []
+            self.installed_modules = {}
         yield gen.maybe_future(self.start(self.run_stats["kernel_name"]))
 
-    def _date_json_serializer(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat().replace('+00:00', 'Z')
-        raise TypeError("{} is not JSON serializable".format(obj))
-
-    def _result_extractor(self, result_accumulator):
-        return json.dumps(result_accumulator, default=self._date_json_serializer)
-
     def execute_code(self, code, result_extractor = None, done_callback = None, timeout=None):
         """
         Asynchronously execute the given code using the underlying managed kernel client
@@ -197,8 +260,9 @@ print(json.dumps( {"installed_modules": list(pkg_resources.AvailableDistribution
         code : String
             Python code to be executed
 
-        result_extractor : function [Optional]
-            Called when the code has finished executing to extract the results into the returned Future
+        result_extractor : ResultExtractor [Optional]
+            Fed with each message of the execution, its result is set in the returned Future.
+            Functions called with the list of the messages are also supported
 
         Returns
         -------
@@ -206,21 +270,22 @@ print(json.dumps( {"installed_modules": list(pkg_resources.AvailableDistribution
         
         """
         if result_extractor is None:
-            result_extractor = self._result_extractor
+            result_extractor = JSONMessagesExtractor()
+        elif not isinstance(result_extractor, ResultExtractor):
+            result_extractor = MessageListExtractor(result_extractor)
         code = PixieGatewayApp.instance().prepend_execute_code + "\n" + code
         app_log.debug("Executing Code: %s", code)
         future = Future()
         parent_header = self.kernel_manager.execute(self.kernel_handle, code)
-        result_accumulator = []
         def on_reply(msg):
             if 'msg_id' in msg['parent_header'] and msg['parent_header']['msg_id'] == parent_header:
                 if not future.done():
                     if "channel" not in msg:
                         msg["channel"] = "iopub"
-                    result_accumulator.append(msg)
+                    result_extractor.add(msg)
                     # Complete the future on idle status
                     if msg['header']['msg_type'] == 'status' and msg['content']['execution_state'] == 'idle':
-                        future.set_result(result_extractor(result_accumulator))
+                        future.set_result(result_extractor.result())
                     elif msg['header']['msg_type'] == 'error':
                         error_name = msg['content']['ename']
                         error_value = msg['content']['evalue']
@@ -291,10 +356,30 @@ class ManagedClientRunMetrics(dict):
 class ManagedClientPool(SingletonConfigurable):
     remote_gateway_config = Dict(config=True, help="Remote Gateway configuration in JSON format")
 
+    kernel_ready_timeout = Integer(60, config=True, help="Max time in seconds for a local kernel to become ready")
+    kernel_fork_server = Bool(False, config=True, help="Fork the local kernels from a template process (Linux and Python 3 only)")
+    kernel_fork_server_preload = List(Unicode(), config=True, help="Modules preloaded by the kernel fork server")
+
     @default('remote_gateway_config')
     def remote_gateway_config_default(self):
         return {}
 
+    @default('kernel_ready_timeout')
+    def kernel_ready_timeout_default(self):
+        return int(os.getenv("PG_KERNEL_READY_TIMEOUT", 60))
+
+    @default('kernel_fork_server')
+    def kernel_fork_server_default(self):
+        return os.getenv("PG_KERNEL_FORK_SERVER", "false").lower() == "true"
+
+    @default('kernel_fork_server_preload')
+    def kernel_fork_server_preload_default(self):
+        #pixiedust itself binds to the kernel shell when imported, only its heaviest dependencies are preloaded
+        return os.getenv(
+            "PG_KERNEL_FORK_SERVER_PRELOAD", "ipykernel.kernelapp,ipykernel.ipkernel,IPython,numpy,pandas,"
+            "matplotlib,matplotlib.figure,matplotlib.backends.backend_agg"
+        ).split(",")
+
     """
     Orchestrates a Pool of ManagedClients, load-balancing based on user load
     """
@@ -302,9 +387,17 @@ class ManagedClientPool(SingletonConfigurable):
         kwargs['parent'] = PixieGatewayApp.instance()
         super(ManagedClientPool, self).__init__(**kwargs)
         if self.remote_gateway_config is None or len(self.remote_gateway_config) == 0:
-            self.kernel_manager = LocalKernelManager(kernel_manager)
+            self.kernel_manager = LocalKernelManager(
+                kernel_manager,
+                ready_timeout=self.kernel_ready_timeout,
+                fork_server_preload=self.kernel_fork_server_preload if self.kernel_fork_server else None
+            )
         else:
-            self.kernel_manager = RemoteKernelManager(self.remote_gateway_config)
+            #only the first worker cleans up, the others would delete kernels that are already in use
+            self.kernel_manager = RemoteKernelManager(
+                self.remote_gateway_config,
+                delete_existing_kernels=PixieGatewayApp.instance().worker_id in (None, 0)
+            )
         self.managed_clients = []
         #start a client
         #self.get()
@@ -312,6 +405,7 @@ class ManagedClientPool(SingletonConfigurable):
     def shutdown(self):
         for managed_client in self.managed_clients:
             managed_client.shutdown()
+        self.kernel_manager.close()
 
     def on_publish(self, pixieapp_def, log_messages):
         #find all the affected clients
@@ -335,15 +429,19 @@ class ManagedClientPool(SingletonConfigurable):
         if kernel_name is not None:
             kernel_name = None if kernel_name.strip() == "" else kernel_name.strip()
         if (pixieapp_def is None or kernel_name is None) and len(self.managed_clients)>0:
+            yield self.managed_clients[0].wait_started()
             raise gen.Return(self.managed_clients[0])
         #do we already have a ManagedClient for the pref_kernel
-        clients = list(filter(lambda mc: mc.run_stats["kernel_name"] == kernel_name, self.managed_clients))
+        #the run stats of the clients still starting don't have the kernel name yet
+        clients = list(filter(lambda mc: mc.run_stats.get("kernel_name", mc.kernel_name) == kernel_name, self.managed_clients))
         if len(clients) > 0:
+            yield clients[0].wait_started()
             raise gen.Return(clients[0])
         app_log.info("Creating a new Managed client for kernel: {}".format(kernel_name))
         client = ManagedClient( self.kernel_manager, kernel_name)
         self.managed_clients.append(client)
-        yield client.start()
+        client.starting = client.start()
+        yield client.starting
         raise gen.Return(client)
 
     def get_by_kernel_id(self, kernel_id):
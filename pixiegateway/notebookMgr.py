@@ -29,6 +29,7 @@ from tornado.util import import_object
 from .pixieGatewayApp import PixieGatewayApp
 from .managedClient import ManagedClientPool
 from .exceptions import AppAccessError
+from .outputCache import OutputCache
 from IPython.core.getipython import get_ipython
 
 def ast_parse(code):
@@ -70,6 +71,8 @@ class NotebookMgr(SingletonConfigurable):
         # Read the notebooks
         self.ns_counter = 0
         self.pixieapps = {}
+        #incremented whenever the published pixieapps change
+        self.version = 0
         self.loader = import_object(self.notebook_loader)()
         self._readNotebooks()
 
@@ -94,7 +97,7 @@ class NotebookMgr(SingletonConfigurable):
         if pixieapp_def is not None and pixieapp_def.is_valid:
             log_messages.append("PixieApp {} found. Proceeding with Publish".format(pixieapp_def.name))
             pixieapp_def.location = full_path
-            self.pixieapps[pixieapp_def.name] = pixieapp_def
+            self._set_pixieapp(pixieapp_def)
             with io.open(full_path, 'w', encoding='utf-8') as f:
                 nbformat.write(notebook, f, version=nbformat.NO_CONVERT)
             log_messages.append("Successfully stored notebook file {}".format(name))
@@ -109,6 +112,25 @@ class NotebookMgr(SingletonConfigurable):
             log_messages.append("Invalid notebook or no PixieApp found")
             raise Exception("Invalid notebook or no PixieApp found")
 
+    @gen.coroutine
+    def reload_pixieapp(self, name):
+        """
+        Load the PixieApp of the given notebook file, e.g. when it is published by another worker
+        Returns the list of log messages
+        """
+        pixieapp_def = self._read_notebook(os.path.join(self.notebook_dir, name))
+        if pixieapp_def is None:
+            raise Exception("Invalid notebook or no PixieApp found")
+        self._set_pixieapp(pixieapp_def)
+        log_messages = ["PixieApp {} reloaded".format(pixieapp_def.name)]
+        yield ManagedClientPool.instance().on_publish(pixieapp_def, log_messages)
+        raise gen.Return(log_messages)
+
+    def _set_pixieapp(self, pixieapp_def):
+        self.pixieapps[pixieapp_def.name] = pixieapp_def
+        self.version += 1
+        OutputCache.instance().invalidate(pixieapp_def.name)
+
     def get_notebook_pixieapp(self, pixieAppName):
         """
         Return the pixieapp definition associeted with the given name, None if doens't exist
@@ -125,7 +147,10 @@ class NotebookMgr(SingletonConfigurable):
         return self.pixieapps.get(pixieAppName, None)
 
     @gen.coroutine
-    def delete_notebook_pixieapp(self, pixieAppName):
+    def delete_notebook_pixieapp(self, pixieAppName, remove_file=True):
+        """
+        Delete the given PixieApp, remove_file is False when the notebook file was already removed by another worker
+        """
         pixieapp_def = self.get_notebook_pixieapp(pixieAppName)
         if not pixieapp_def:
             raise Exception("Invalid Input given")
@@ -138,8 +163,11 @@ class NotebookMgr(SingletonConfigurable):
         try:
             yield ManagedClientPool.instance().on_delete(pixieapp_def, log_messages)
             log_message = ["Deleting physical instance of the Notebook"]
-            os.remove(pixieapp_def.location)
+            if remove_file:
+                os.remove(pixieapp_def.location)
             self.pixieapps.pop(pixieAppName)
+            self.version += 1
+            OutputCache.instance().invalidate(pixieAppName)
             log_message = ["Successfully delete app {}".format(pixieAppName)]
         except Exception as exc:
             results["status_code"] = 500
@@ -153,19 +181,25 @@ class NotebookMgr(SingletonConfigurable):
             return
         for path in os.listdir(self.notebook_dir):
             if path.endswith(".ipynb"):
-                full_path = os.path.join(self.notebook_dir, path)
-                nb_contents = self.loader.load(full_path)
-                if nb_contents is not None:
-                    with nb_contents:
-                        app_log.debug("loading Notebook: %s", full_path)
-                        notebook = nbformat.read(nb_contents, as_version=4)
-                        #Load the pixieapp definition if any
-                        pixieapp_def = self.read_pixieapp_def(notebook)
-                        if pixieapp_def is not None and pixieapp_def.is_valid:
-                            pixieapp_def.location = full_path
-                            self.pixieapps[pixieapp_def.name] = pixieapp_def
-                        else:
-                            app_log.info("Skipping Notebook %s because no valid pixieapp was found", full_path)
+                pixieapp_def = self._read_notebook(os.path.join(self.notebook_dir, path))
+                if pixieapp_def is not None:
+                    self.pixieapps[pixieapp_def.name] = pixieapp_def
+
+    def _read_notebook(self, full_path):
+        "Return the pixieapp definition of the given notebook file, None if it doesn't have a valid one"
+        nb_contents = self.loader.load(full_path)
+        if nb_contents is None:
+            return None
+        with nb_contents:
+            app_log.debug("loading Notebook: %s", full_path)
+            notebook = nbformat.read(nb_contents, as_version=4)
+            #Load the pixieapp definition if any
+            pixieapp_def = self.read_pixieapp_def(notebook)
+            if pixieapp_def is not None and pixieapp_def.is_valid:
+                pixieapp_def.location = full_path
+                return pixieapp_def
+            app_log.info("Skipping Notebook %s because no valid pixieapp was found", full_path)
+            return None
 
     def read_pixieapp_def(self, notebook):
         #Load the warmup and run code
@@ -204,6 +238,8 @@ class PixieappDef():
         self.deps = pixiedust_meta.get("imports", {})
         self.pref_kernel = pixiedust_meta.get("kernel", None)
         self.security = pixiedust_meta.get("security", None)
+        #routes whose output can be cached, see OutputCache
+        self.cache = pixiedust_meta.get("cache", None)
         self.token = self.security.split(":") if self.security is not None else None
         self.token = self.token[1] if self.token is not None and len(self.token) == 2 and self.token[0] == "token" else None
 
@@ -0,0 +1,124 @@
+# -------------------------------------------------------------------------------
+# Copyright IBM Corp. 2017
+# 
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+# http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -------------------------------------------------------------------------------
+import base64
+import binascii
+import hashlib
+import os
+import re
+from six import string_types
+from traitlets.config.configurable import SingletonConfigurable
+from traitlets import Integer, default
+from .pixieGatewayApp import PixieGatewayApp
+from .utils import LRUCache
+
+#inline images, e.g. the matplotlib charts and the image routes rendered by pixiedust
+DATA_URI_REGEX = re.compile(r"data:(image/(?:png|jpeg|gif));base64,([A-Za-z0-9+/=]+)")
+BLOB_URL_REGEX = re.compile(r"/outputBlob/([0-9a-f]{40}(?:-w\d+)?)")
+
+IMAGE_MIME_TYPES = ["image/png", "image/jpeg", "image/gif"]
+OUTPUT_MSG_TYPES = ["display_data", "execute_result", "update_display_data"]
+
+class OutputBlobStore(SingletonConfigurable):
+    """
+    In memory store of the binary payloads of the kernel outputs: message buffers and large images.
+    They are served as binary from /outputBlob/<blob_id> instead of being inlined as base64 in the executeCode responses.
+    Blob ids are content hashes, an image rendered for several users is stored once and cached by the browsers
+    """
+
+    max_size = Integer(128 * 1024 * 1024, config=True, help="Max total size in bytes of the stored blobs")
+    min_size = Integer(16 * 1024, config=True, help="Size in bytes of the base64 images below which they stay inline")
+
+    @default('max_size')
+    def max_size_default(self):
+        return int(os.getenv("PG_OUTPUT_BLOB_STORE_SIZE", 128 * 1024 * 1024))
+
+    @default('min_size')
+    def min_size_default(self):
+        return int(os.getenv("PG_OUTPUT_BLOB_MIN_SIZE", 16 * 1024))
+
+    def __init__(self, **kwargs):
+        kwargs['parent'] = PixieGatewayApp.instance()
+        super(OutputBlobStore, self).__init__(**kwargs)
+        #blob id -> (content type, data)
+        self.blobs = LRUCache(self.max_size, sizeof=lambda blob: len(blob[1]))
+
+    def put(self, data, content_type="application/octet-stream"):
+        "Store the blob and return its id, tagged with the worker that holds it"
+        blob_id = PixieGatewayApp.instance().tag_worker(hashlib.sha1(data).hexdigest())
+        if blob_id not in self.blobs:
+            self.blobs.set(blob_id, (content_type, data))
+        return blob_id
+
+    def get(self, blob_id):
+        "Return the (content type, data) of the blob, None if it is unknown or evicted"
+        return self.blobs.get(blob_id)
+
+    @staticmethod
+    def get_url(blob_id):
+        return "/outputBlob/" + blob_id
+
+    def has_blobs(self, text):
+        "True if all the blobs referenced by the text are still available"
+        return all(blob_id in self.blobs for blob_id in BLOB_URL_REGEX.findall(text))
+
+    def put_base64(self, value, content_type):
+        "Store the base64 encoded value, return the url of the blob or None if the value is not valid base64"
+        try:
+            data = base64.b64decode(value)
+        except (binascii.Error, TypeError, ValueError):
+            return None
+        return self.get_url(self.put(data, content_type))
+
+    def extract_data_uris(self, html):
+        "Replace the large data uri images of the html by blob urls"
+        def replace(match):
+            if len(match.group(2)) < self.min_size:
+                return match.group(0)
+            return self.put_base64(match.group(2), match.group(1)) or match.group(0)
+        return DATA_URI_REGEX.sub(replace, html)
+
+    def extract_blobs(self, msg):
+        """
+        Return the kernel message with its buffers and large images replaced by blob urls, the message is not modified.
+        An image mime bundle is moved to the url metadata of its mime type, with a text/html img element pointing
+        to it when the bundle has no html representation
+        """
+        buffers = msg.get("buffers") or []
+        if msg['header']['msg_type'] not in OUTPUT_MSG_TYPES and len(buffers) == 0:
+            return msg
+        msg = dict(msg)
+        if len(buffers) > 0:
+            msg["buffers"] = [self.get_url(self.put(bytes(buffer))) for buffer in buffers]
+
+        content = msg.get("content") or {}
+        if msg['header']['msg_type'] in OUTPUT_MSG_TYPES and content.get("data"):
+            data = dict(content["data"])
+            metadata = dict(content.get("metadata") or {})
+            for mime_type in IMAGE_MIME_TYPES:
+                value = data.get(mime_type)
+                if not isinstance(value, string_types) or len(value) < self.min_size:
+                    continue
+                url = self.put_base64(value, mime_type)
+                if url is None:
+                    continue
+                del data[mime_type]
+                metadata[mime_type] = dict(metadata.get(mime_type) or {}, url=url)
+                if "text/html" not in data:
+                    data["text/html"] = "<img src='{}'></img>".format(url)
+            if isinstance(data.get("text/html"), string_types):
+                data["text/html"] = self.extract_data_uris(data["text/html"])
+            msg["content"] = dict(content, data=data, metadata=metadata)
+        return msg
@@ -0,0 +1,169 @@
+# -------------------------------------------------------------------------------
+# Copyright IBM Corp. 2017
+# 
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+# http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -------------------------------------------------------------------------------
+import json
+import os
+import re
+import time
+from collections import namedtuple
+from traitlets.config.configurable import SingletonConfigurable
+from traitlets import Integer, default
+from six import iteritems
+from tornado import gen
+from .pixieGatewayApp import PixieGatewayApp
+from .outputBlobStore import OutputBlobStore
+from .utils import LRUCache, SingleFlight
+
+#display(instance, key='value', ...) commands sent by the PixieApp routes, anything else is never cached
+DISPLAY_COMMAND_REGEX = re.compile(
+    r"^display\((?P<instance>\w+)(?P<options>(?:\s*,\s*\w+\s*=\s*'(?:\\.|[^'\\])*')*)\s*\)$"
+)
+DISPLAY_OPTION_REGEX = re.compile(r"(\w+)\s*=\s*'((?:\\.|[^'\\])*)'")
+
+#Options specific to the user session or to the page element, replaced by placeholders in the cache
+SESSION_OPTIONS = ["gateway", "prefix"]
+#Session values shorter than this could match unrelated parts of the output, their routes are not cached
+MIN_SESSION_VALUE_LENGTH = 6
+
+CachedRoute = namedtuple("CachedRoute", ["key", "substitutions", "ttl"])
+
+class OutputCache(SingletonConfigurable):
+    """
+    Cache of the route outputs of the PixieApps that opt in through their notebook metadata, e.g.
+        "pixiedust": {"cache": {"ttl": 300, "routes": [{"options": {"state": "summary"}, "ttl": 60}, {"options": {}}]}}
+    A route is cached if all the options of one of the rules match the options of its display command,
+    only routes that render the same output for every user should be marked as cacheable.
+    The session specific values (namespace, app instance, run id and element prefix) are replaced by placeholders
+    so that the output rendered for one user can be served to the others. Concurrent misses of a route in the same
+    kernel share a single execution. Outputs holding an error are not cached
+    """
+
+    max_size = Integer(64 * 1024 * 1024, config=True, help="Max total size in bytes of the cached route outputs")
+    default_ttl = Integer(300, config=True, help="Time to live in seconds of the cached route outputs")
+
+    @default('max_size')
+    def max_size_default(self):
+        return int(os.getenv("PG_OUTPUT_CACHE_SIZE", 64 * 1024 * 1024))
+
+    @default('default_ttl')
+    def default_ttl_default(self):
+        return int(os.getenv("PG_OUTPUT_CACHE_TTL", 300))
+
+    def __init__(self, **kwargs):
+        kwargs['parent'] = PixieGatewayApp.instance()
+        super(OutputCache, self).__init__(**kwargs)
+        #(app name, normalized command) -> (expiration time, normalized output)
+        self.cache = LRUCache(self.max_size, sizeof=lambda entry: len(entry[1]))
+        self.pending_renders = SingleFlight()
+
+    def get_route(self, pixieapp_def, code, namespace):
+        """
+        Return the CachedRoute of the code sent by the PixieApp from the session namespace, None if it is not cacheable
+        """
+        cache_config = pixieapp_def.cache if pixieapp_def is not None else None
+        if not cache_config:
+            return None
+        match = DISPLAY_COMMAND_REGEX.match(code.strip())
+        if match is None:
+            return None
+        options = dict(DISPLAY_OPTION_REGEX.findall(match.group("options")))
+        rule = next((
+            rule for rule in cache_config.get("routes", [])
+            if all(options.get(key) == value for key, value in iteritems(rule.get("options", {})))
+        ), None)
+        if rule is None:
+            return None
+
+        #replace the longest values first in case one contains another
+        substitutions = sorted(
+            [("{{pd_instance}}", match.group("instance")), ("{{pd_namespace}}", namespace)] +
+            [("{{pd_" + name + "}}", options[name]) for name in SESSION_OPTIONS if options.get(name)],
+            key=lambda substitution: len(substitution[1]), reverse=True
+        )
+        if any(len(value) < MIN_SESSION_VALUE_LENGTH for _, value in substitutions):
+            return None
+        return CachedRoute(
+            key=(pixieapp_def.name, self.normalize(code.strip(), substitutions)),
+            substitutions=substitutions,
+            ttl=rule.get("ttl", cache_config.get("ttl", self.default_ttl))
+        )
+
+    @staticmethod
+    def normalize(text, substitutions):
+        "Replace the session values by their placeholders, only where they are not part of a longer identifier"
+        for placeholder, value in substitutions:
+            text = re.sub(r"(?<![A-Za-z0-9]){}(?![A-Za-z0-9])".format(re.escape(value)), placeholder, text)
+        return text
+
+    @staticmethod
+    def denormalize(text, substitutions):
+        for placeholder, value in substitutions:
+            text = text.replace(placeholder, value)
+        return text
+
+    def get(self, route):
+        "Return the output cached for the route with the session values of the caller, None if not cached"
+        entry = self.cache.get(route.key)
+        if entry is None:
+            return None
+        #the output is stale if it expired or refers to blobs evicted from the blob store
+        if entry[0] < time.time() or not OutputBlobStore.instance().has_blobs(entry[1]):
+            self.cache.pop(route.key)
+            return None
+        return self.denormalize(entry[1], route.substitutions)
+
+    @gen.coroutine
+    def fetch(self, route, kernel_id, execute):
+        """
+        Return the output of the route for the caller. On a cache miss execute is called to run the route
+        in the kernel of the caller, unless the same route is already running in that kernel for another caller
+        """
+        output = self.get(route)
+        if output is None:
+            output = self.denormalize(
+                (yield self.pending_renders.do(route.key + (kernel_id,), lambda: self._render(route, execute))),
+                route.substitutions
+            )
+        raise gen.Return(output)
+
+    @gen.coroutine
+    def _render(self, route, execute):
+        output = self.normalize((yield execute()), route.substitutions)
+        #a failed run must not be served to the other sessions
+        if not self.has_error(output):
+            self.cache.set(route.key, (time.time() + route.ttl, output))
+        raise gen.Return(output)
+
+    @staticmethod
+    def has_error(output):
+        "True if the JSON messages of the output hold an error, e.g. a traceback displayed by the route"
+        try:
+            messages = json.loads(output)
+        except ValueError:
+            return True
+        if not isinstance(messages, list):
+            return True
+        def is_error(msg):
+            if not isinstance(msg, dict):
+                return False
+            content = msg.get("content")
+            return msg.get("header", {}).get("msg_type") == "error" or (isinstance(content, dict) and "traceback" in content)
+        return any(is_error(msg) for msg in messages)
+
+    def invalidate(self, app_name):
+        "Drop the cached outputs of the app, e.g. when it is republished"
+        for key in self.cache.keys():
+            if key[0] == app_name:
+                self.cache.pop(key)
@@ -16,22 +16,87 @@
 import base64
 import uuid
 import os
+import re
+from tornado import process
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
 from tornado.log import app_log
+from tornado.netutil import bind_sockets
 from tornado.options import options
 from kernel_gateway.gatewayapp import KernelGatewayApp
-from traitlets import Unicode, default
+from traitlets import Unicode, Integer, Bool, default
 
 class PixieGatewayApp(KernelGatewayApp):
+    WORKER_TAG_REGEX = re.compile(r"-w(?P<worker_id>\d+)$")
+
+    #id of the current worker process, None when running as a single process
+    worker_id = None
+
     def initialize(self, argv=None):
         self.api = 'pixiegateway'
         #self.api = 'notebook-http'
         options.log_file_prefix = self.log_path
-        super(PixieGatewayApp, self).initialize(argv)        
+        #generated before the workers are forked so that they all accept each other's secure cookies
+        self.web_cookie_secret = base64.b64encode(uuid.uuid4().bytes + uuid.uuid4().bytes).decode("UTF-8")
+        super(PixieGatewayApp, self).initialize(argv)
+
+    def init_configurables(self):
+        #fork before the kernel manager is created so that each worker owns its own slice of the kernel pool
+        if self.workers > 1:
+            self.init_workers()
+        super(PixieGatewayApp, self).init_configurables()
+
+    def init_workers(self):
+        app_log.info("Starting %s PixieGateway workers", self.workers)
+        self.worker_id = process.fork_processes(self.workers)
+        if hasattr(self, "io_loop"):
+            #the IOLoop created by the parent process can't be shared with the children
+            import asyncio
+            asyncio.set_event_loop(asyncio.new_event_loop())
+            self.io_loop = IOLoop.current()
+        app_log.info("PixieGateway worker %s started with pid %s", self.worker_id, os.getpid())
+
+    def init_http_server(self):
+        if self.worker_id is None:
+            return super(PixieGatewayApp, self).init_http_server()
+
+        #every worker listens on the public port using SO_REUSEPORT
+        self.http_server = HTTPServer(
+            self.web_app, xheaders=self.trust_xheaders, ssl_options=self._build_ssl_options()
+        )
+        self.http_server.add_sockets(bind_sockets(self.port, self.ip, reuse_port=True))
+
+        #and on a private loopback port used by the other workers to forward requests it owns
+        self.worker_http_server = HTTPServer(self.web_app, xheaders=True)
+        self.worker_http_server.add_sockets(bind_sockets(self.get_worker_port(self.worker_id), "127.0.0.1"))
+
+    def get_worker_port(self, worker_id):
+        return (self.worker_base_port or self.port + 1) + int(worker_id)
+
+    def tag_worker(self, value):
+        """
+        Append the current worker hint to the given id (session id, run id) so that subsequent
+        requests carrying it can be routed to the worker that holds the associated state
+        """
+        if self.worker_id is None:
+            return value
+        return "{}-w{}".format(value, self.worker_id)
+
+    def get_tagged_worker(self, value):
+        """
+        Return the worker id hinted by the given id or None if there is no hint
+        """
+        if self.worker_id is None or value is None:
+            return None
+        if hasattr(value, "decode"):
+            value = value.decode("utf-8")
+        match = PixieGatewayApp.WORKER_TAG_REGEX.search(value)
+        return int(match.group("worker_id")) if match is not None else None
 
     def init_webapp(self):
         super(PixieGatewayApp, self).init_webapp()
-        self.web_app.settings["cookie_secret"] = base64.b64encode(uuid.uuid4().bytes + uuid.uuid4().bytes).decode("UTF-8")
-        self.web_app.settings['compiled_template_cache'] = False
+        self.web_app.settings["cookie_secret"] = self.web_cookie_secret
+        self.web_app.settings['compiled_template_cache'] = True
         self.web_app.settings['login_url'] = "/login"
         self.web_app.settings['admin_password'] = self.admin_password
 
@@ -45,6 +110,21 @@ class PixieGatewayApp(KernelGatewayApp):
     prepend_execute_code = Unicode(None, config=True, allow_none=True,
                                    help="""Code to prepend before each execution""")
 
+    workers = Integer(1, config=True,
+                      help="""Number of gateway worker processes sharing the listening port""")
+
+    worker_base_port = Integer(0, config=True,
+                               help="""First loopback port used to forward requests between workers (defaults to port + 1)""")
+
+    dev_mode = Bool(False, config=True,
+                    help="""Development mode, cached templates are reloaded when they change on disk""")
+
+    compact_execute_response = Bool(True, config=True,
+                                    help="""Only send the kernel message fields used by pixiedust.js in the executeCode responses""")
+
+    max_output_size = Integer(32 * 1024 * 1024, config=True,
+                              help="""Max size in bytes of the output kept for a code execution, 0 for no limit""")
+
     admin_user_id = Unicode("admin", config=True, allow_none=True,
                             help="User id for administrator")
 
@@ -61,4 +141,24 @@ class PixieGatewayApp(KernelGatewayApp):
 
     @default('admin_user_id')
     def admin_user_id_default(self):
-        return os.getenv("ADMIN_USERID", 'admin')
\ No newline at end of file
+        return os.getenv("ADMIN_USERID", 'admin')
+
+    @default('dev_mode')
+    def dev_mode_default(self):
+        return os.getenv("PG_DEV_MODE", "false").lower() == "true"
+
+    @default('compact_execute_response')
+    def compact_execute_response_default(self):
+        return os.getenv("PG_COMPACT_EXECUTE_RESPONSE", "true").lower() == "true"
+
+    @default('max_output_size')
+    def max_output_size_default(self):
+        return int(os.getenv("PG_MAX_OUTPUT_SIZE", 32 * 1024 * 1024))
+
+    @default('workers')
+    def workers_default(self):
+        return int(os.getenv("PG_WORKERS", 1))
+
+    @default('worker_base_port')
+    def worker_base_port_default(self):
+        return int(os.getenv("PG_WORKER_BASE_PORT", 0))
\ No newline at end of file
@@ -0,0 +1,177 @@
+# -------------------------------------------------------------------------------
+# Copyright IBM Corp. 2017
+# 
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+# http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -------------------------------------------------------------------------------
+from abc import ABCMeta, abstractmethod
+from collections import deque
+from datetime import datetime
+from six import with_metaclass
+from tornado.log import app_log
+from .pixieGatewayApp import PixieGatewayApp
+from .outputBlobStore import OutputBlobStore
+from .utils import sanitize_traceback, json_dumps
+
+def date_json_serializer(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat().replace('+00:00', 'Z')
+    raise TypeError("{} is not JSON serializable".format(obj))
+
+def compact_message(msg):
+    "Strip the kernel message down to the fields read by pixiedust.js: channel, header.msg_type and content, plus the buffers if any"
+    compacted = {
+        "channel": msg.get("channel", "iopub"),
+        "header": {"msg_type": msg['header']['msg_type']},
+        "content": msg['content']
+    }
+    if msg.get("buffers"):
+        compacted["buffers"] = msg["buffers"]
+    return compacted
+
+class ResultExtractor(with_metaclass(ABCMeta)):
+    """
+    Incremental fold of the kernel messages of a code execution into its result: add is called with each message as it
+    arrives and result once the execution is complete, so that only the extracted output is held in memory.
+    The output kept is bounded by max_size bytes (PixieGatewayApp.max_output_size by default, 0 for no limit)
+    """
+    def __init__(self, max_size=None):
+        self.max_size = PixieGatewayApp.instance().max_output_size if max_size is None else max_size
+        self.size = 0
+        self.dropped_size = 0
+
+    def fits(self, size):
+        return self.max_size <= 0 or self.size + size <= self.max_size
+
+    def truncation_notice(self):
+        return "Output truncated: {} bytes over the {} bytes limit".format(self.dropped_size, self.max_size)
+
+    @abstractmethod
+    def add(self, msg):
+        "Fold the message into the result"
+        pass
+
+    @abstractmethod
+    def result(self):
+        "Return the result of the execution once all its messages are added"
+        pass
+
+class MessageListExtractor(ResultExtractor):
+    """
+    Adapter for the extractor functions called with the list of all the messages, messages are dropped beyond max_size
+    """
+    def __init__(self, extractor, max_size=None):
+        super(MessageListExtractor, self).__init__(max_size)
+        self.extractor = extractor
+        self.messages = []
+
+    def add(self, msg):
+        size = len(json_dumps(msg.get('content'), default=date_json_serializer))
+        if self.dropped_size > 0 or not self.fits(size):
+            self.dropped_size += size
+            return
+        self.size += size
+        self.messages.append(msg)
+
+    def result(self):
+        if self.dropped_size > 0:
+            app_log.warning(self.truncation_notice())
+        return self.extractor(self.messages)
+
+class TextOutputExtractor(ResultExtractor):
+    """
+    Concatenate the stream text and html outputs of the execution. Outputs are kept up to max_size bytes,
+    the result then ends with a truncation notice
+    """
+    def __init__(self, separator="", msg_types=("stream", "display_data"), max_size=None):
+        super(TextOutputExtractor, self).__init__(max_size)
+        self.separator = separator
+        self.msg_types = msg_types
+        self.outputs = []
+        self.error = None
+
+    def add(self, msg):
+        msg_type = msg['header']['msg_type']
+        if msg_type == 'error':
+            error_name = msg['content']['ename']
+            error_value = msg['content']['evalue']
+            trace = sanitize_traceback(msg['content']['traceback'])
+            self.error = 'Error {}: {}\n{}\n'.format(error_name, error_value, trace)
+            return
+        if msg_type not in self.msg_types:
+            return
+        if msg_type == 'stream':
+            text = msg['content']['text']
+        elif "data" in msg['content'] and "text/html" in msg['content']['data']:
+            text = msg['content']['data']['text/html']
+        else:
+            return app_log.warning("%s msg not processed: %s", msg_type, msg)
+        if self.dropped_size > 0 or not self.fits(len(text)):
+            self.dropped_size += len(text)
+            return
+        self.size += len(text)
+        self.outputs.append(text)
+
+    def format(self, outputs):
+        return self.separator.join(outputs)
+
+    def result(self):
+        if self.error is not None:
+            return self.error
+        if self.dropped_size > 0:
+            app_log.warning(self.truncation_notice())
+            return self.format(self.outputs + ["<div class='pd_output_truncated'>{}</div>".format(self.truncation_notice())])
+        return self.format(self.outputs)
+
+class JSONMessagesExtractor(ResultExtractor):
+    """
+    Serialize the messages into the JSON array of the executeCode responses. Each message is serialized as it arrives,
+    with its binary payloads moved to the OutputBlobStore.
+    pixiedust.js renders every output message over the previous one, so beyond max_size the oldest messages are dropped
+    and a message too large on its own is replaced by a truncation notice
+    """
+    def __init__(self, compact=None, max_size=None):
+        super(JSONMessagesExtractor, self).__init__(max_size)
+        self.compact = PixieGatewayApp.instance().compact_execute_response if compact is None else compact
+        self.messages = deque()
+
+    def add(self, msg):
+        msg_type = msg['header']['msg_type']
+        if self.compact and (msg_type == 'execute_input' or (msg_type == 'status' and msg['content']['execution_state'] != 'idle')):
+            return
+        msg = OutputBlobStore.instance().extract_blobs(msg)
+        serialized = json_dumps(compact_message(msg) if self.compact else msg, default=date_json_serializer)
+        if self.max_size > 0 and len(serialized) > self.max_size:
+            self.dropped_size += len(serialized)
+            serialized = self.notice_message(msg, len(serialized))
+        self.messages.append(serialized)
+        self.size += len(serialized)
+        while self.size > self.max_size > 0 and len(self.messages) > 1:
+            dropped = self.messages.popleft()
+            self.size -= len(dropped)
+            self.dropped_size += len(dropped)
+
+    def notice_message(self, msg, size):
+        "Serialized display_data message standing for the given oversized message"
+        content = {
+            "data": {"text/html": "<div class='pd_output_truncated'>Output of {} bytes over the {} bytes limit</div>".format(
+                size, self.max_size
+            )},
+            "metadata": {}
+        }
+        notice = dict(msg, msg_type="display_data", header=dict(msg['header'], msg_type="display_data"), content=content, buffers=[])
+        return json_dumps(compact_message(notice) if self.compact else notice, default=date_json_serializer)
+
+    def result(self):
+        if self.dropped_size > 0:
+            app_log.warning(self.truncation_notice())
+        return "[" + ",".join(self.messages) + "]"
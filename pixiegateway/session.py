@@ -22,12 +22,15 @@ from tornado.ioloop import PeriodicCallback
 from tornado.log import app_log
 from .pixieGatewayApp import PixieGatewayApp
 from .managedClient import ManagedClientPool
+from .resultExtractor import TextOutputExtractor
 
 class Session(object):
     def __init__(self, session_id):
         self.session_id = session_id
         self.touch()
         self.run_ids = {}
+        #run id -> name of the pixieapp it runs
+        self.run_pixieapps = {}
 
     @property
     def namespace(self):
@@ -78,7 +81,7 @@ except Exception as e:
     for line in traceback.format_stack():
         print(line.strip())
                 """.format(self.namespace),
-                    lambda acc: "\n".join([msg['content']['text'] for msg in acc if msg['header']['msg_type'] == 'stream'])
+                    TextOutputExtractor(separator="\n", msg_types=["stream"])
                 )
                 future.add_done_callback(done)
             except Exception as exc:
@@ -95,7 +98,7 @@ except Exception as e:
         if cookie is None and hasattr(request_handler, cookie_name):
             cookie = getattr(request_handler, cookie_name)
         if cookie is None:
-            cookie = str(uuid.uuid4())
+            cookie = PixieGatewayApp.instance().tag_worker(str(uuid.uuid4()))
             request_handler.set_secure_cookie(cookie_name, cookie)
             setattr(request_handler, cookie_name, cookie)
         elif hasattr(cookie, "decode"):
@@ -117,6 +120,7 @@ except Exception as e:
             if managed_client is None:
                 managed_client = yield ManagedClientPool.instance().get(pixieapp_def)
                 self.run_ids[run_id] = managed_client
+                self.run_pixieapps[run_id] = pixieapp_def.name
             elif managed_client.get_app_stats(pixieapp_def) is None:
                 del self.run_ids[run_id]
                 if retry:
@@ -164,7 +168,7 @@ class SessionManager(SingletonConfigurable):
         session = self.session_map.get(session_id.decode("utf-8")) if session_id is not None else None
         if session is None:
             app_log.debug("no session present, creating one")
-            session_id = str(uuid.uuid4())
+            session_id = PixieGatewayApp.instance().tag_worker(str(uuid.uuid4()))
             request_handler.set_secure_cookie("pd_session_id", session_id)
             session = self.session_map[session_id] = Session(session_id)
 
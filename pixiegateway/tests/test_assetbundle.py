@@ -0,0 +1,34 @@
+# -------------------------------------------------------------------------------
+# Copyright IBM Corp. 2017
+# 
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+# http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -------------------------------------------------------------------------------
+import gzip
+from nose.tools import assert_equals
+from pixiegateway.assetBundle import AssetBundle, minify_css
+
+def test_minify_css():
+    assert_equals(
+        minify_css("""/* comment */
+        .a  .b > .c ,
+        .d:hover {  content: "a  ,  b" ;  }"""),
+        '.a .b>.c,.d:hover{content: "a  ,  b";}'
+    )
+
+def test_asset_bundle():
+    asset_bundle = AssetBundle.instance()
+    bundle = asset_bundle.get_bundle("codemirror.js")
+    assert_equals(asset_bundle.get_bundle("codemirror.js") is bundle, True)
+    assert_equals(asset_bundle.get_url("codemirror.js"), "/bundle/codemirror.{}.js".format(bundle.fingerprint))
+    assert_equals(gzip.decompress(bundle.gzipped_content), bundle.content)
+    assert_equals(b"CodeMirror.defineMode(\"python\"" in bundle.content, True)
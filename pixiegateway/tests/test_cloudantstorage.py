@@ -0,0 +1,318 @@
+# -------------------------------------------------------------------------------
+# Copyright IBM Corp. 2017
+# 
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+# http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -------------------------------------------------------------------------------
+import json
+import os
+import re
+import time
+import uuid
+from nose.tools import assert_equals
+from tornado import gen, web
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
+from tornado.testing import bind_unused_port
+from pixiegateway.chartsManager import CloudantChartStorage, AsyncSQLLiteChartStorage
+from pixiegateway.chartsMigration import export_charts, ChartImporter
+
+class CouchDBStandIn(object):
+    """
+    In memory stand-in implementing the subset of the CouchDB API used by the CloudantChartStorage
+    """
+    def __init__(self):
+        self.db_created = False
+        self.docs = {}
+        #number of requests answered with a 429 before serving the next one
+        self.rate_limited = 0
+        #number of documents stored whose response is lost, answered with a 503
+        self.lost_responses = 0
+
+    def new_rev(self, doc_id):
+        generation = int(self.docs[doc_id]["_rev"].split("-")[0]) + 1 if doc_id in self.docs else 1
+        return "{}-{}".format(generation, uuid.uuid4().hex)
+
+    def save(self, doc):
+        if doc["_id"] in self.docs and doc.get("_rev") != self.docs[doc["_id"]]["_rev"]:
+            return {"id": doc["_id"], "error": "conflict", "reason": "Document update conflict."}
+        doc = dict(doc, _rev=self.new_rev(doc["_id"]))
+        self.docs[doc["_id"]] = doc
+        return {"id": doc["_id"], "rev": doc["_rev"], "ok": True}
+
+class StandInHandler(web.RequestHandler):
+    def initialize(self, couchdb):
+        self.couchdb = couchdb
+
+    def prepare(self):
+        if self.couchdb.rate_limited > 0:
+            self.couchdb.rate_limited -= 1
+            self.set_status(429)
+            self.set_header("Retry-After", "3600")
+            self.finish(json.dumps({"error": "too_many_requests"}))
+
+    def get_json(self):
+        return json.loads(self.request.body.decode("utf-8"))
+
+    def write_json(self, payload, status=200):
+        self.set_status(status)
+        self.finish(json.dumps(payload))
+
+class DatabaseHandler(StandInHandler):
+    def head(self):
+        self.set_status(200 if self.couchdb.db_created else 404)
+
+    def put(self):
+        if self.couchdb.db_created:
+            return self.write_json({"error": "file_exists"}, 412)
+        self.couchdb.db_created = True
+        self.write_json({"ok": True}, 201)
+
+    def post(self):
+        self.write_json(self.couchdb.save(self.get_json()), 201)
+
+class DocumentHandler(StandInHandler):
+    def head(self, doc_id):
+        if doc_id not in self.couchdb.docs:
+            return self.set_status(404)
+        self.set_header("ETag", '"{}"'.format(self.couchdb.docs[doc_id]["_rev"]))
+
+    def get(self, doc_id):
+        if doc_id not in self.couchdb.docs:
+            return self.write_json({"error": "not_found"}, 404)
+        self.write_json(self.couchdb.docs[doc_id])
+
+    def put(self, doc_id):
+        result = self.couchdb.save(dict(self.get_json(), _id=doc_id))
+        if self.couchdb.lost_responses > 0 and "error" not in result:
+            self.couchdb.lost_responses -= 1
+            return self.write_json({"error": "unavailable"}, 503)
+        self.write_json(result, 409 if "error" in result else 201)
+
+    def delete(self, doc_id):
+        if self.get_query_argument("rev") != self.couchdb.docs[doc_id]["_rev"]:
+            return self.write_json({"error": "conflict"}, 409)
+        del self.couchdb.docs[doc_id]
+        self.write_json({"ok": True})
+
+class FindHandler(StandInHandler):
+    def post(self):
+        query = self.get_json()
+        doc = self.couchdb.docs.get(query["selector"]["_id"])
+        docs = [{k: v for k, v in doc.items() if k in query["fields"]}] if doc is not None else []
+        self.write_json({"docs": docs})
+
+class BulkDocsHandler(StandInHandler):
+    def post(self):
+        self.write_json([self.couchdb.save(doc) for doc in self.get_json()["docs"]], 201)
+
+class BulkGetHandler(StandInHandler):
+    def post(self):
+        self.write_json({"results": [{
+            "id": doc["id"],
+            "docs": [{"ok": self.couchdb.docs[doc["id"]]} if doc["id"] in self.couchdb.docs else {"error": {"error": "not_found"}}]
+        } for doc in self.get_json()["docs"]]})
+
+class ByDateViewHandler(StandInHandler):
+    def get(self):
+        docs = sorted(
+            [doc for doc in self.couchdb.docs.values() if "CHARTID" in doc],
+            key=lambda doc: (doc["DATE"], doc["_id"]), reverse=True
+        )
+        if self.get_query_argument("startkey", None) is not None:
+            startkey = (json.loads(self.get_query_argument("startkey")), self.get_query_argument("startkey_docid"))
+            docs = [doc for doc in docs if (doc["DATE"], doc["_id"]) <= startkey]
+        skip = int(self.get_query_argument("skip", 0))
+        limit = int(self.get_query_argument("limit"))
+        self.write_json({
+            "total_rows": len(docs),
+            "rows": [{"id": doc["_id"], "key": doc["DATE"], "value": {
+                k: doc.get(k) for k in ["CHARTID", "AUTHOR", "DATE", "DESCRIPTION", "RENDERERID"]
+            }} for doc in docs[skip:skip + limit]]
+        })
+
+class SearchHandler(StandInHandler):
+    def get(self):
+        #only supports the (FIELD:word* OR ...) AND ... queries sent by search_charts, bookmarks are offsets
+        words = set(re.findall(r"\w+:(\w+)\*", self.get_query_argument("q")))
+        def matches(doc):
+            doc_words = re.findall(r"\w+", " ".join(doc.get(k) or "" for k in ["DESCRIPTION", "AUTHOR", "RENDERERID"]).lower())
+            return all(any(doc_word.startswith(word) for doc_word in doc_words) for word in words)
+        docs = sorted(
+            [doc for doc in self.couchdb.docs.values() if "CHARTID" in doc and matches(doc)],
+            key=lambda doc: doc["DATE"], reverse=True
+        )
+        offset = int(self.get_query_argument("bookmark", 0))
+        limit = int(self.get_query_argument("limit"))
+        self.write_json({
+            "total_rows": len(docs),
+            "bookmark": str(offset + limit),
+            "rows": [{"id": doc["_id"], "fields": {
+                k: doc.get(k) for k in ["AUTHOR", "DATE", "DESCRIPTION", "RENDERERID"]
+            }} for doc in docs[offset:offset + limit]]
+        })
+
+def start_couchdb_stand_in():
+    couchdb = CouchDBStandIn()
+    db_path = "/" + CloudantChartStorage.CHART_DB_NAME
+    args = {"couchdb": couchdb}
+    app = web.Application([
+        (db_path + "/?", DatabaseHandler, args),
+        (db_path + "/_find", FindHandler, args),
+        (db_path + "/_bulk_docs", BulkDocsHandler, args),
+        (db_path + "/_bulk_get", BulkGetHandler, args),
+        (db_path + "/_design/charts/_view/by_date", ByDateViewHandler, args),
+        (db_path + "/_design/charts/_search/search", SearchHandler, args),
+        (db_path + "/(.+)", DocumentHandler, args)
+    ])
+    sock, port = bind_unused_port()
+    server = HTTPServer(app)
+    server.add_sockets([sock])
+    return couchdb, server, port
+
+def test_cloudant_chart_storage():
+    @gen.coroutine
+    def do_cloudant_chart_storage():
+        couchdb, server, port = start_couchdb_stand_in()
+        try:
+            config = CloudantChartStorage.CloudantConfig.instance()
+            config.host, config.protocol, config.port = "127.0.0.1", "http", port
+            config.retry_delay = config.max_retry_delay = 0.01
+            chart_storage = CloudantChartStorage()
+
+            #rate limited requests are retried, the Retry-After delay is capped
+            couchdb.rate_limited = 2
+            chart_models = []
+            for i in range(3):
+                chart_models.append((yield chart_storage.store_chart({'chart': "<div>chart {}</div>".format(i)})))
+            assert_equals(couchdb.db_created, True)
+            assert_equals(CloudantChartStorage.DESIGN_DOC_ID in couchdb.docs, True)
+
+            #a chart stored by an attempt whose response was lost isn't stored twice
+            couchdb.lost_responses = 1
+            doc_count = len(couchdb.docs)
+            lost_model = yield chart_storage.store_chart({'chart': "<div>lost</div>"})
+            assert_equals(len(couchdb.docs), doc_count + 1)
+            assert_equals(lost_model['_rev'], couchdb.docs[lost_model['CHARTID']]['_rev'])
+            yield chart_storage.delete_chart(lost_model['CHARTID'])
+
+            chart_id = chart_models[0]['CHARTID']
+            fetched_model = yield chart_storage.get_chart(chart_id)
+            assert_equals(fetched_model['CONTENT'], "<div>chart 0</div>")
+            assert_equals((yield chart_storage.get_chart(str(uuid.uuid4()))), None)
+
+            for chart_model in chart_models:
+                couchdb.docs[chart_model['CHARTID']]['DESCRIPTION'] = "updated"
+
+            chart_ids = [chart_model['CHARTID'] for chart_model in chart_models]
+            bulk_models = yield chart_storage.get_charts_by_id(chart_ids + [str(uuid.uuid4())])
+            assert_equals([m['DESCRIPTION'] for m in bulk_models[:3]], ["updated"] * 3)
+            assert_equals(bulk_models[3], None)
+
+            listed_ids = []
+            page = yield chart_storage.get_charts(page_size=2)
+            while True:
+                listed_ids += [chart['CHARTID'] for chart in page['charts_list']]
+                if page['next_cursor'] is None:
+                    break
+                page = yield chart_storage.get_charts(page_size=2, cursor=page['next_cursor'])
+            assert_equals(sorted(listed_ids), sorted(chart_ids))
+
+            page = yield chart_storage.search_charts("Updat", page_size=2)
+            assert_equals(page['total_count'], 3)
+            page = yield chart_storage.search_charts("Updat", page_size=2, cursor=page['next_cursor'])
+            assert_equals((len(page['charts_list']), page['next_cursor']), (1, None))
+
+            assert_equals((yield chart_storage.delete_chart(chart_id)), 1)
+            assert_equals((yield chart_storage.delete_chart(chart_id)), 0)
+
+            #requests failing more than max_retries times are raised
+            couchdb.rate_limited = chart_storage.max_retries + 1
+            try:
+                yield chart_storage.get_chart(chart_ids[1])
+                raise AssertionError("Rate limited request should have failed")
+            except Exception as exc:
+                assert_equals(getattr(exc, "code", None), 429)
+        finally:
+            server.stop()
+    IOLoop.current().run_sync(do_cloudant_chart_storage)
+
+def test_migrate_charts_to_cloudant():
+    @gen.coroutine
+    def do_migrate_charts():
+        couchdb, server, port = start_couchdb_stand_in()
+        source = AsyncSQLLiteChartStorage()
+        chart_ids = []
+        try:
+            for i in range(3):
+                chart_ids.append((yield source.store_chart({'chart': "<div>migrated {}</div>".format(i)}))['CHARTID'])
+            config = CloudantChartStorage.CloudantConfig.instance()
+            config.host, config.protocol, config.port = "127.0.0.1", "http", port
+            checkpoints = []
+            importer = ChartImporter(CloudantChartStorage(), batch_size=2, on_checkpoint=checkpoints.append)
+            yield export_charts(source, importer.feed, page_size=2, include_thumbnails=False)
+            yield importer.close()
+            assert_equals(checkpoints[-1], None)
+            for chart_id in chart_ids:
+                assert_equals(chart_id in couchdb.docs, True)
+            assert_equals(couchdb.docs[chart_ids[0]]['CONTENT'], "<div>migrated 0</div>")
+
+            #running it again skips the charts already migrated
+            imported_count = importer.imported_count
+            yield export_charts(source, importer.feed, page_size=2, include_thumbnails=False)
+            yield importer.close()
+            assert_equals(importer.imported_count, imported_count)
+        finally:
+            for chart_id in chart_ids:
+                yield source.delete_chart(chart_id)
+            server.stop()
+    IOLoop.current().run_sync(do_migrate_charts)
+
+def test_cloudant_export_import_dates():
+    @gen.coroutine
+    def do_export_import_dates():
+        source_couchdb, source_server, source_port = start_couchdb_stand_in()
+        target_couchdb, target_server, target_port = start_couchdb_stand_in()
+        config = CloudantChartStorage.CloudantConfig.instance()
+        config.host, config.protocol = "127.0.0.1", "http"
+        try:
+            config.port = source_port
+            source = CloudantChartStorage()
+            chart_model = yield source.store_chart({'chart': "<div>dated</div>"})
+            config.port = target_port
+            target = CloudantChartStorage()
+
+            lines = []
+            yield export_charts(source, lines.append, include_thumbnails=False)
+            record = json.loads(lines[0])
+            #dates are exported and listed in UTC, like the SQLLite dates
+            assert_equals(record['DATE'], time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(chart_model['DATE'])))
+            listed_chart = (yield source.get_charts())['charts_list'][0]
+            assert_equals(listed_chart['DATE'], record['DATE'])
+
+            assert_equals((yield target.import_charts([record])), 1)
+            assert_equals(target_couchdb.docs[chart_model['CHARTID']]['DATE'], int(chart_model['DATE']))
+        finally:
+            source_server.stop()
+            target_server.stop()
+    #the round trip must not depend on the timezone of the host
+    tz = os.environ.get("TZ")
+    os.environ["TZ"] = "America/New_York"
+    time.tzset()
+    try:
+        IOLoop.current().run_sync(do_export_import_dates)
+    finally:
+        if tz is None:
+            del os.environ["TZ"]
+        else:
+            os.environ["TZ"] = tz
+        time.tzset()
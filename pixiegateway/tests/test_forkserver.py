@@ -0,0 +1,72 @@
+# -------------------------------------------------------------------------------
+# Copyright IBM Corp. 2017
+# 
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+# http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -------------------------------------------------------------------------------
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+from jupyter_client.kernelspec import KernelSpecManager
+from nose import SkipTest
+from nose.tools import assert_equals, assert_true
+from pixiegateway.kernel.local import FORK_SERVER_SCRIPT, ForkServer, LocalKernelManager, fork_server_supported
+
+def launch(socket_path, *kernel_args):
+    return subprocess.call(
+        [sys.executable, FORK_SERVER_SCRIPT, "launch", "--socket", socket_path, "--timeout", "30", "--"] + list(kernel_args),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+def test_fork_server_launch():
+    if not fork_server_supported():
+        raise SkipTest("The kernel fork server is only supported on Linux with Python 3")
+    work_dir = tempfile.mkdtemp()
+    socket_path = os.path.join(work_dir, "server.sock")
+    server = subprocess.Popen(
+        [sys.executable, FORK_SERVER_SCRIPT, "serve", "--socket", socket_path, "--preload", "ipykernel.kernelapp",
+         "--request-timeout", "0.5"]
+    )
+    stalled = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        #the launcher exits with the forked kernel
+        assert_equals(launch(socket_path, "--help"), 0)
+        assert_equals(launch(socket_path, "--no-such-option"), 2)
+        #a client that never sends its request doesn't block the launches
+        stalled.connect(socket_path)
+        assert_equals(launch(socket_path, "--help"), 0)
+        assert_equals(server.poll(), None)
+    finally:
+        stalled.close()
+        server.terminate()
+        server.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+class StubKernelManager(object):
+    default_kernel_name = "python3"
+    def __init__(self):
+        self.kernel_spec_manager = KernelSpecManager()
+
+def test_fork_server_spec_not_listed():
+    if not fork_server_supported():
+        raise SkipTest("The kernel fork server is only supported on Linux with Python 3")
+    manager = LocalKernelManager(StubKernelManager(), fork_server_preload=[])
+    try:
+        #the launches still find the spec
+        kernel_spec_manager = manager.kernel_manager.kernel_spec_manager
+        assert_equals(kernel_spec_manager.get_kernel_spec(ForkServer.KERNEL_NAME).argv[2], "launch")
+        assert_true(ForkServer.KERNEL_NAME not in manager.list_kernel_specs())
+    finally:
+        manager.fork_server.stop()
@@ -0,0 +1,186 @@
+# -------------------------------------------------------------------------------
+# Copyright IBM Corp. 2017
+# 
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+# http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -------------------------------------------------------------------------------
+import socket
+import tempfile
+from nose.tools import assert_equals
+from tornado import gen, locks, web
+from tornado.concurrent import Future
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+from tornado.ioloop import IOLoop
+from tornado.testing import bind_unused_port
+from pixiegateway.chartsManager import SingletonChartStorage
+from pixiegateway.handlers import BaseHandler, PixieAppHandler, ChartEmbedHandler
+from pixiegateway.notebookMgr import NotebookMgr
+from pixiegateway.pixieGatewayApp import PixieGatewayApp
+from pixiegateway.session import Session
+
+class StubPixieAppDef(object):
+    name = "CookieApp"
+    title = "Cookie App"
+
+    def validate_security(self, handler):
+        pass
+
+    @gen.coroutine
+    def warmup(self, managed_client):
+        pass
+
+    def get_run_code(self, session, run_id, app_metadata=None):
+        return run_id
+
+class StubManagedClient(object):
+    def __init__(self):
+        self.lock = locks.Lock()
+
+    def execute_code(self, code, result_extractor=None):
+        future = Future()
+        future.set_result("<div>{}</div>".format(code))
+        return future
+
+class StubSession(Session):
+    @gen.coroutine
+    def get_managed_client_by_run_id(self, run_id, pixieapp_def=None, retry=False):
+        raise gen.Return(StubManagedClient())
+
+class StubPixieAppHandler(PixieAppHandler):
+    def prepare(self):
+        self.session = StubSession("cookie-session")
+
+def test_pixieapp_run_id_cookie():
+    @gen.coroutine
+    def do_pixieapp_run_id_cookie():
+        NotebookMgr.instance(notebook_dir=tempfile.mkdtemp()).pixieapps["CookieApp"] = StubPixieAppDef()
+        sock, port = bind_unused_port()
+        server = HTTPServer(web.Application([(r"/pixieapp/(.*)", StubPixieAppHandler)], cookie_secret="secret"))
+        server.add_sockets([sock])
+        try:
+            response = yield AsyncHTTPClient().fetch("http://127.0.0.1:{}/pixieapp/CookieApp".format(port))
+            cookies = response.headers.get_list("Set-Cookie")
+            assert_equals(len([cookie for cookie in cookies if cookie.startswith("pd_runid_CookieApp=")]), 1)
+            #the run id of the cookie is the one the app runs with
+            run_id = web.decode_signed_value("secret", "pd_runid_CookieApp", cookies[0].split(";")[0].split("=", 1)[1])
+            assert_equals("<div>{}</div>".format(run_id.decode("utf-8")) in response.body.decode("utf-8"), True)
+        finally:
+            server.stop()
+    IOLoop.current().run_sync(do_pixieapp_run_id_cookie)
+
+class FailingPixieAppDef(StubPixieAppDef):
+    name = "FailingApp"
+
+    @gen.coroutine
+    def warmup(self, managed_client):
+        raise ValueError("warmup failed")
+
+def test_pixieapp_error_after_head():
+    @gen.coroutine
+    def do_pixieapp_error_after_head():
+        NotebookMgr.instance(notebook_dir=tempfile.mkdtemp()).pixieapps["FailingApp"] = FailingPixieAppDef()
+        sock, port = bind_unused_port()
+        server = HTTPServer(web.Application([(r"/pixieapp/(.*)", StubPixieAppHandler)], cookie_secret="secret"))
+        server.add_sockets([sock])
+        try:
+            response = yield AsyncHTTPClient().fetch("http://127.0.0.1:{}/pixieapp/FailingApp".format(port))
+            body = response.body.decode("utf-8")
+            #the page head was sent, the error is rendered in the body and the page is completed
+            assert_equals("warmup failed" in body, True)
+            assert_equals(body.rstrip().endswith("</html>"), True)
+        finally:
+            server.stop()
+    IOLoop.current().run_sync(do_pixieapp_error_after_head)
+
+class StubChartEmbedHandler(ChartEmbedHandler):
+    def prepare(self):
+        self.session = None
+
+def test_chart_embed_size():
+    @gen.coroutine
+    def do_chart_embed_size():
+        chart_model = SingletonChartStorage.instance().store_chart({
+            'chart': '<script>{"plot_width":600,"plot_height":400}</script>', 'rendererId': "bokeh"
+        })
+        sock, port = bind_unused_port()
+        server = HTTPServer(web.Application([
+            (r"/embed/(?P<chart_id>[^/]*)/(?P<width>[^/]*)/(?P<height>[^/]*)", StubChartEmbedHandler)
+        ], cookie_secret="secret"))
+        server.add_sockets([sock])
+        url = "http://127.0.0.1:{}/embed/{}/{{}}/{{}}".format(port, chart_model['CHARTID'])
+        try:
+            #sizes are clamped to leave room for the padding
+            response = yield AsyncHTTPClient().fetch(url.format(0, 0))
+            assert_equals('"plot_width":75' in response.body.decode("utf-8"), True)
+            assert_equals('"plot_height":60' in response.body.decode("utf-8"), True)
+            response = yield AsyncHTTPClient().fetch(url.format("wide", 0), raise_error=False)
+            assert_equals(response.code, 400)
+        finally:
+            server.stop()
+            SingletonChartStorage.instance().delete_chart(chart_model['CHARTID'])
+    IOLoop.current().run_sync(do_chart_embed_size)
+
+class WorkerHandler(BaseHandler):
+    def get_worker_hint(self):
+        return self.get_query_argument("hint")
+
+    def get(self):
+        self.write("worker {}".format(PixieGatewayApp.instance().worker_id))
+
+class OtherWorkerHandler(web.RequestHandler):
+    def get(self):
+        self.write("worker 1")
+
+def bind_worker_ports():
+    "Bind two consecutive loopback ports, returns the first one and the sockets"
+    while True:
+        sock, port = bind_unused_port()
+        try:
+            return port, [sock] + bind_sockets(port + 1, "127.0.0.1")
+        except socket.error:
+            sock.close()
+
+def test_forwarded_header():
+    app = PixieGatewayApp.instance()
+    worker_settings = app.worker_id, app.workers, app.worker_base_port
+    @gen.coroutine
+    def do_forwarded_header():
+        public_sock, public_port = bind_unused_port()
+        base_port, worker_socks = bind_worker_ports()
+        app.worker_id, app.workers, app.worker_base_port = 0, 2, base_port
+        server = HTTPServer(web.Application([(r"/worker", WorkerHandler)], cookie_secret="secret"))
+        server.add_sockets([public_sock, worker_socks[0]])
+        other_server = HTTPServer(web.Application([(r"/worker", OtherWorkerHandler)]))
+        other_server.add_sockets([worker_socks[1]])
+        url = "http://127.0.0.1:{}/worker?hint=session-w1"
+        try:
+            response = yield AsyncHTTPClient().fetch(url.format(public_port))
+            assert_equals(response.body, b"worker 1")
+            #the header sent by an external client is ignored
+            response = yield AsyncHTTPClient().fetch(
+                url.format(public_port), headers={BaseHandler.FORWARDED_HEADER: "1"}
+            )
+            assert_equals(response.body, b"worker 1")
+            #requests relayed by the other workers on the loopback port are served locally
+            response = yield AsyncHTTPClient().fetch(
+                url.format(base_port), headers={BaseHandler.FORWARDED_HEADER: "1"}
+            )
+            assert_equals(response.body, b"worker 0")
+        finally:
+            server.stop()
+            other_server.stop()
+    try:
+        IOLoop.current().run_sync(do_forwarded_header)
+    finally:
+        app.worker_id, app.workers, app.worker_base_port = worker_settings
@@ -0,0 +1,41 @@
+# -------------------------------------------------------------------------------
+# Copyright IBM Corp. 2017
+# 
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+# http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -------------------------------------------------------------------------------
+import contextlib
+import io
+import json
+from nose.tools import assert_equals
+from pixiegateway.managedClient import ENVIRONMENT_FINGERPRINT_CODE, INSTALLED_MODULES_CODE, parse_json_output
+
+def run_kernel_code(code):
+    output = io.StringIO()
+    namespace = {}
+    with contextlib.redirect_stdout(output):
+        exec(code, namespace)
+    #nothing is left in the user namespace
+    assert_equals([name for name in namespace if name != "__builtins__"], [])
+    return output.getvalue()
+
+def test_installed_modules():
+    output = run_kernel_code(INSTALLED_MODULES_CODE.format(json.dumps(["tornado", "jupyter-client", "no-such-module"])))
+    assert_equals(
+        parse_json_output("not json\n" + output, "installed_modules"),
+        {"tornado": True, "jupyter-client": True, "no-such-module": False}
+    )
+
+    fingerprint = parse_json_output(run_kernel_code(ENVIRONMENT_FINGERPRINT_CODE), "environment")
+    assert_equals(len(fingerprint), 40)
+    assert_equals(parse_json_output(run_kernel_code(ENVIRONMENT_FINGERPRINT_CODE), "environment"), fingerprint)
+    assert_equals(parse_json_output(output, "environment"), None)
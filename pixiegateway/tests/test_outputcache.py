@@ -0,0 +1,93 @@
+# -------------------------------------------------------------------------------
+# Copyright IBM Corp. 2017
+# 
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+# http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -------------------------------------------------------------------------------
+from collections import namedtuple
+from nose.tools import assert_equals
+from tornado import gen
+from tornado.ioloop import IOLoop
+from pixiegateway.outputCache import OutputCache
+
+AppDef = namedtuple("AppDef", ["name", "cache"])
+
+def test_output_cache():
+    output_cache = OutputCache.instance()
+    app_def = AppDef("CacheApp", {"ttl": 60, "routes": [{"options": {"state": "summary"}}]})
+    def get_code(session, prefix, state="summary"):
+        return "display(inst_{0}_app,nostore_pixieapp='inst_{0}_app',gateway='run{0}',prefix='{1}',state='{2}')".format(
+            session, prefix, state
+        )
+    def get_output(session, prefix):
+        #the prefix is also part of a longer id that must not be rewritten
+        return '[{{"content": "<div id={1} pd_target=inst_{0}_app>run{0}</div><p id={1}77>"}}]'.format(session, prefix)
+    @gen.coroutine
+    def execute(output):
+        yield gen.moment
+        raise gen.Return(output)
+
+    assert_equals(output_cache.get_route(app_def, get_code("sess1", "pfx001", "details"), "inst_sess1"), None)
+    assert_equals(output_cache.get_route(app_def, "print(1)", "inst_sess1"), None)
+    assert_equals(output_cache.get_route(AppDef("NoCacheApp", None), get_code("sess1", "pfx001"), "inst_sess1"), None)
+    #session values too short to be replaced safely
+    assert_equals(output_cache.get_route(app_def, get_code("sess1", "p1"), "inst_sess1"), None)
+
+    @gen.coroutine
+    def do_output_cache():
+        route = output_cache.get_route(app_def, get_code("sess1", "pfx001"), "inst_sess1")
+        assert_equals(route.ttl, 60)
+        output = yield output_cache.fetch(route, "kernel1", lambda: execute(get_output("sess1", "pfx001")))
+        assert_equals(output, get_output("sess1", "pfx001"))
+
+        #another session gets the output with its own values
+        other_route = output_cache.get_route(app_def, get_code("sess2", "pfx002"), "inst_sess2")
+        assert_equals(other_route.key, route.key)
+        assert_equals(
+            output_cache.get(other_route),
+            '[{"content": "<div id=pfx002 pd_target=inst_sess2_app>runsess2</div><p id=pfx00177>"}]'
+        )
+
+        output_cache.invalidate("CacheApp")
+        assert_equals(output_cache.get(other_route), None)
+
+        #outputs holding an error are not cached
+        error_output = '[{"header": {"msg_type": "error"}, "content": {"ename": "ValueError", "traceback": []}}]'
+        assert_equals((yield output_cache.fetch(route, "kernel1", lambda: execute(error_output))), error_output)
+        assert_equals(output_cache.get(route), None)
+    IOLoop.current().run_sync(do_output_cache)
+
+def test_output_cache_single_flight():
+    output_cache = OutputCache.instance()
+    app_def = AppDef("FlightApp", {"routes": [{"options": {}}]})
+    executions = []
+    @gen.coroutine
+    def execute(session):
+        executions.append(session)
+        yield gen.sleep(0.05)
+        raise gen.Return("output of inst_{}_app".format(session))
+
+    @gen.coroutine
+    def do_single_flight():
+        routes = [
+            output_cache.get_route(app_def, "display(inst_{0}_app,prefix='prefix{0}')".format(session), "inst_" + session)
+            for session in ["s1", "s2", "s3"]
+        ]
+        #s1 and s2 share a kernel, s3 runs in its own
+        outputs = yield [
+            output_cache.fetch(route, kernel_id, lambda session=session: execute(session))
+            for route, session, kernel_id in zip(routes, ["s1", "s2", "s3"], ["kernel1", "kernel1", "kernel2"])
+        ]
+        assert_equals(executions, ["s1", "s3"])
+        assert_equals(outputs, ["output of inst_s1_app", "output of inst_s2_app", "output of inst_s3_app"])
+        output_cache.invalidate("FlightApp")
+    IOLoop.current().run_sync(do_single_flight)
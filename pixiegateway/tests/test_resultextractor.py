@@ -0,0 +1,128 @@
+# -------------------------------------------------------------------------------
+# Copyright IBM Corp. 2017
+# 
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+# http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -------------------------------------------------------------------------------
+import base64
+import json
+import struct
+from datetime import datetime
+from uuid import uuid4
+from nose.tools import assert_equals, assert_true
+from pixiegateway.resultExtractor import JSONMessagesExtractor, TextOutputExtractor
+from pixiegateway.outputBlobStore import OutputBlobStore
+from pixiegateway.kernel.remote import deserialize_binary_message
+
+def kernel_message(msg_type, content, parent_msg_id):
+    "Message as received from the kernel manager for a PixieApp route execution"
+    header = {
+        "msg_id": uuid4().hex, "msg_type": msg_type, "username": "username", "session": uuid4().hex,
+        "date": datetime(2017, 10, 1, 12, 0, 0), "version": "5.2"
+    }
+    return {
+        "header": header, "msg_id": header["msg_id"], "msg_type": msg_type,
+        "parent_header": {"msg_id": parent_msg_id, "msg_type": "execute_request", "username": "username",
+                          "session": uuid4().hex, "date": datetime(2017, 10, 1, 12, 0, 0), "version": "5.2"},
+        "metadata": {}, "content": content, "buffers": [], "channel": "iopub"
+    }
+
+def route_interaction():
+    parent_msg_id = uuid4().hex
+    return [
+        kernel_message("status", {"execution_state": "busy"}, parent_msg_id),
+        kernel_message("execute_input", {"code": "display(inst_app, prefix='abc')", "execution_count": 3}, parent_msg_id),
+        kernel_message("stream", {"name": "stdout", "text": "Loading data"}, parent_msg_id),
+        kernel_message("display_data", {
+            "data": {"text/html": "<div>route output</div>", "text/plain": "<IPython.core.display.HTML object>"},
+            "metadata": {"pixieapp_metadata": {"title": "app"}}, "transient": {}
+        }, parent_msg_id),
+        kernel_message("status", {"execution_state": "idle"}, parent_msg_id)
+    ]
+
+def extract(extractor, messages):
+    for msg in messages:
+        extractor.add(msg)
+    return extractor.result()
+
+def test_compact_execute_response():
+    messages = route_interaction()
+    compacted = json.loads(extract(JSONMessagesExtractor(compact=True), messages))
+
+    #fields read by pixiedust.js are preserved
+    assert_equals([msg["header"]["msg_type"] for msg in compacted], ["stream", "display_data", "status"])
+    assert_equals([msg["channel"] for msg in compacted], ["iopub"] * 3)
+    assert_equals(compacted[1]["content"], messages[3]["content"])
+    assert_equals(compacted[2]["content"], {"execution_state": "idle"})
+
+    #bytes per interaction
+    full_size = len(extract(JSONMessagesExtractor(compact=False), messages))
+    compact_size = len(extract(JSONMessagesExtractor(compact=True), messages))
+    assert_true(compact_size * 3 < full_size, "compact {} bytes, full {} bytes".format(compact_size, full_size))
+
+def test_output_blobs():
+    blob_store = OutputBlobStore.instance()
+    png = b"\x89PNG" + b"\x00" * blob_store.min_size
+    encoded_png = base64.b64encode(png).decode("ascii")
+    parent_msg_id = uuid4().hex
+    messages = [
+        kernel_message("display_data", {"data": {"image/png": encoded_png, "text/plain": "<Figure>"}, "metadata": {}}, parent_msg_id),
+        kernel_message("display_data", {"data": {
+            "text/html": "<img src='data:image/png;base64,{}'><img src='data:image/png;base64,iVBO'>".format(encoded_png)
+        }, "metadata": {}}, parent_msg_id),
+        dict(kernel_message("comm_msg", {"data": {}}, parent_msg_id), buffers=[memoryview(b"widget buffer")]),
+        kernel_message("status", {"execution_state": "idle"}, parent_msg_id)
+    ]
+    response = extract(JSONMessagesExtractor(compact=True), messages)
+    assert_true(encoded_png not in response)
+    compacted = json.loads(response)
+
+    #large images are replaced by blob urls, small ones stay inline
+    url = compacted[0]["content"]["metadata"]["image/png"]["url"]
+    assert_equals(compacted[0]["content"]["data"], {"text/plain": "<Figure>", "text/html": "<img src='{}'></img>".format(url)})
+    assert_equals(compacted[1]["content"]["data"]["text/html"], "<img src='{}'><img src='data:image/png;base64,iVBO'>".format(url))
+    assert_equals(blob_store.get(url.split("/")[-1]), ("image/png", png))
+    assert_equals(blob_store.get(compacted[2]["buffers"][0].split("/")[-1])[1], b"widget buffer")
+    assert_true(blob_store.has_blobs(response))
+
+def test_output_truncation():
+    parent_msg_id = uuid4().hex
+    def stream(text):
+        return kernel_message("stream", {"name": "stdout", "text": text}, parent_msg_id)
+    idle = kernel_message("status", {"execution_state": "idle"}, parent_msg_id)
+
+    #concatenated outputs keep the beginning
+    text_extractor = TextOutputExtractor(max_size=10)
+    assert_equals(
+        extract(text_extractor, [stream("12345"), stream("67890"), stream("overflow"), stream("1")]),
+        "1234567890<div class='pd_output_truncated'>Output truncated: 9 bytes over the 10 bytes limit</div>"
+    )
+
+    #pixiedust.js only shows the last output message, the oldest are dropped
+    json_extractor = JSONMessagesExtractor(compact=True, max_size=400)
+    response = json.loads(extract(json_extractor, [stream("line {}".format(i)) for i in range(100)] + [idle]))
+    assert_true(len(response) < 100 and json_extractor.size <= 400)
+    assert_equals([msg["content"].get("text") for msg in response[-2:]], ["line 99", None])
+
+    #oversized messages are replaced by a notice
+    response = json.loads(extract(JSONMessagesExtractor(compact=False, max_size=400), [stream("x" * 1000), idle]))
+    assert_equals(response[0]["header"]["msg_type"], "display_data")
+    assert_true("over the 400 bytes limit" in response[0]["content"]["data"]["text/html"])
+
+def test_deserialize_binary_message():
+    frames = [json.dumps({"header": {"msg_type": "comm_msg"}}).encode("utf-8"), b"buffer 1", b"buffer 2"]
+    offsets = [4 * (len(frames) + 1)]
+    for frame in frames[:-1]:
+        offsets.append(offsets[-1] + len(frame))
+    msg = deserialize_binary_message(struct.pack("!i" + "I" * len(frames), len(frames), *offsets) + b"".join(frames))
+    assert_equals(msg["header"]["msg_type"], "comm_msg")
+    assert_equals([bytes(buffer) for buffer in msg["buffers"]], [b"buffer 1", b"buffer 2"])
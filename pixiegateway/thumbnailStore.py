@@ -0,0 +1,147 @@
+# -------------------------------------------------------------------------------
+# Copyright IBM Corp. 2017
+# 
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+# http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# -------------------------------------------------------------------------------
+import io
+import os
+import uuid
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from tornado.concurrent import run_on_executor
+from tornado.log import app_log
+from traitlets.config.configurable import SingletonConfigurable
+from traitlets import Unicode, default
+from pixiedust.utils import storage
+from .pixieGatewayApp import PixieGatewayApp
+
+def has_pillow():
+    try:
+        import PIL
+        return True
+    except ImportError:
+        return False
+
+def downscale_png(png, max_width, max_height):
+    """
+    Downscale a png to fit the given bounds. Requires Pillow, the png is returned untouched otherwise
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return png
+    image = Image.open(io.BytesIO(png))
+    if image.size[0] <= max_width and image.size[1] <= max_height:
+        return png
+    image.thumbnail((max_width, max_height), Image.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+class ThumbnailStore(SingletonConfigurable):
+    """
+    Store the chart thumbnails as raw png files, one per preset size, so that they can be served
+    straight from disk without touching the chart storage. The files are local to each gateway, the other
+    replicas of a deployment sharing the same chart storage generate their own thumbnails on demand.
+    Downscaling requires Pillow (pip install pixiegateway[thumbnails]), a single full size png is stored otherwise
+    """
+
+    #preset size name -> (max width, max height)
+    SIZES = {
+        "small": (240, 240),
+        "medium": (480, 480),
+        "large": (800, 800)
+    }
+    #size under which the png is stored as is when it can't be downscaled
+    FULL_SIZE = "large"
+
+    thumbnail_dir = Unicode(None, config=True, help="Directory where the chart thumbnails are stored")
+    default_size = Unicode("large", config=True, help="Thumbnail size served when the request doesn't specify one")
+    sendfile_header = Unicode("", config=True,
+                              help="""Header used to delegate the file transfer to the front-end server,
+                              e.g. X-Accel-Redirect for nginx or X-Sendfile for apache. Disabled if empty""")
+    sendfile_prefix = Unicode("", config=True,
+                              help="""Prefix that replaces thumbnail_dir in the sendfile header value,
+                              e.g. the nginx internal location mapped to thumbnail_dir""")
+
+    @default('thumbnail_dir')
+    def thumbnail_dir_default(self):
+        return os.getenv(
+            "PG_THUMBNAIL_DIR",
+            os.path.join(os.path.dirname(storage.SQLITE_DB_NAME_PATH), "gateway", "thumbnails")
+        )
+
+    @default('default_size')
+    def default_size_default(self):
+        return os.getenv("PG_THUMBNAIL_DEFAULT_SIZE", "large")
+
+    @default('sendfile_header')
+    def sendfile_header_default(self):
+        return os.getenv("PG_THUMBNAIL_SENDFILE_HEADER", "")
+
+    @default('sendfile_prefix')
+    def sendfile_prefix_default(self):
+        return os.getenv("PG_THUMBNAIL_SENDFILE_PREFIX", "")
+
+    def __init__(self, **kwargs):
+        kwargs['parent'] = PixieGatewayApp.instance()
+        super(ThumbnailStore, self).__init__(**kwargs)
+        if self.default_size not in ThumbnailStore.SIZES:
+            raise ValueError("Invalid default thumbnail size: {}".format(self.default_size))
+        self.downscale = has_pillow()
+        if not self.downscale:
+            app_log.warning("Pillow is not installed, the chart thumbnails are stored in a single size")
+        for size in ThumbnailStore.SIZES:
+            size_dir = os.path.join(self.thumbnail_dir, size)
+            if not os.path.isdir(size_dir):
+                os.makedirs(size_dir)
+        self.executor = ThreadPoolExecutor(max_workers=2)
+
+    def get_path(self, chart_id, size=None):
+        """
+        Return the path of the thumbnail file for the chart. Raises ValueError if the chart id or size are invalid
+        """
+        size = size or self.default_size
+        if size not in ThumbnailStore.SIZES:
+            raise ValueError("Invalid thumbnail size: {}".format(size))
+        if not self.downscale:
+            size = ThumbnailStore.FULL_SIZE
+        #chart ids come from the url, make sure they can't escape the thumbnail directory
+        return os.path.join(self.thumbnail_dir, size, "{}.png".format(uuid.UUID(chart_id)))
+
+    def get_sendfile_value(self, path):
+        "Value of the sendfile header for the given thumbnail path"
+        if not self.sendfile_prefix:
+            return path
+        return self.sendfile_prefix.rstrip("/") + "/" + os.path.relpath(path, self.thumbnail_dir).replace(os.sep, "/")
+
+    def exists(self, chart_id, size=None):
+        return os.path.isfile(self.get_path(chart_id, size))
+
+    @run_on_executor
+    def save(self, chart_id, png):
+        "Save the png in every preset size"
+        sizes = ThumbnailStore.SIZES if self.downscale else {ThumbnailStore.FULL_SIZE: None}
+        for size, bounds in sizes.items():
+            path = self.get_path(chart_id, size)
+            #write to a temp file first so that concurrent readers never see a partial thumbnail
+            fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(downscale_png(png, bounds[0], bounds[1]) if bounds is not None else png)
+            os.rename(temp_path, path)
+
+    def delete(self, chart_id):
+        for size in ThumbnailStore.SIZES:
+            path = self.get_path(chart_id, size)
+            if os.path.isfile(path):
+                os.remove(path)
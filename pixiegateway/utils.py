@@ -13,7 +13,37 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # -------------------------------------------------------------------------------
+import json
 import re
+import zlib
+from collections import OrderedDict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+#zlib window bits producing and reading the gzip format, gzip.compress is not available on python 2
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+def gzip_compress(data, level=6):
+    "Compress bytes in the gzip format, suitable for a gzip Content-Encoding"
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+def gzip_decompress(data):
+    return zlib.decompress(data, GZIP_WBITS)
+
+def json_dumps(obj, default=None):
+    "Serialize obj to a compact JSON string, uses orjson when installed"
+    if orjson is not None:
+        try:
+            #datetimes are left to default so that both codecs produce the same output
+            return orjson.dumps(obj, default=default, option=orjson.OPT_PASSTHROUGH_DATETIME).decode("utf-8")
+        except TypeError:
+            #e.g. non string keys or integers larger than 64 bits, not supported by orjson
+            pass
+    return json.dumps(obj, default=default, separators=(",", ":"))
 
 def sanitize_traceback(data):
     """
@@ -59,3 +89,84 @@ def sanitize_traceback(data):
             div.append("<div style='display: inline-flex;'>{}</div>".format("\n".join(spans)))
 
     return "<div style='border: 1px solid chartreuse;background: aliceblue'>{}</div>".format("\n".join(div))
+
+class LRUCache(object):
+    """
+    Least recently used cache bounded by the total size of its values
+    Parameters
+    ----------
+    max_size: int
+        Max total size of the values, least recently used entries are evicted beyond it
+    sizeof: function [Optional]
+        Returns the size of a value, defaults to len
+    """
+    def __init__(self, max_size, sizeof=len):
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.size = 0
+        self.entries = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def keys(self):
+        return list(self.entries.keys())
+
+    def get(self, key, default=None):
+        if key not in self.entries:
+            return default
+        #move the entry to the most recently used end
+        entry = self.entries.pop(key)
+        self.entries[key] = entry
+        return entry[0]
+
+    def set(self, key, value):
+        self.pop(key)
+        size = self.sizeof(value)
+        if size > self.max_size:
+            return
+        self.entries[key] = (value, size)
+        self.size += size
+        while self.size > self.max_size:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def pop(self, key, default=None):
+        if key not in self.entries:
+            return default
+        value, size = self.entries.pop(key)
+        self.size -= size
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+class SingleFlight(object):
+    """
+    Coalesce the concurrent calls made with the same key into a single execution, every caller
+    gets the result, or the exception, of that execution
+    """
+    def __init__(self):
+        #key -> Future of the execution in flight
+        self.in_flight = {}
+
+    def __contains__(self, key):
+        return key in self.in_flight
+
+    def __len__(self):
+        return len(self.in_flight)
+
+    def do(self, key, execute):
+        """
+        Return the Future of the execution in flight for the key, execute is called to start
+        one if there is none. execute must return a Future
+        """
+        future = self.in_flight.get(key)
+        if future is None:
+            future = self.in_flight[key] = execute()
+            future.add_done_callback(lambda f: self.in_flight.pop(key, None))
+        return future
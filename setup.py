@@ -4,6 +4,7 @@ setup(name='pixiegateway',
       description='Server for sharing PixieDust chart and running PixieApps',
       url='https://github.com/pixiedust/pixiegateway',
       install_requires=['pixiedust', 'jupyter_kernel_gateway', 'astunparse', 'selenium'],
+      extras_require={'thumbnails': ['Pillow']},
       author='David Taieb',
       author_email='data38777@gmail.com',
       license='Apache 2.0',
@@ -12,7 +13,8 @@ setup(name='pixiegateway',
       zip_safe=False,
       entry_points={
           'console_scripts': [
-              'jupyter-pixiegateway = pixiegateway:main'
+              'jupyter-pixiegateway = pixiegateway:main',
+              'jupyter-pixiegateway-charts = pixiegateway.chartsMigration:main'
           ]
       }
      )